@@ -0,0 +1,640 @@
+# /// script
+# requires-python = ">=3.10"
+# description = "Load generator: simulates a fleet of ESP32 devices against the API in one asyncio process."
+# dependencies = ["httpx>=0.27", "pycryptodome>=3.20"]
+# ///
+"""
+Virtual Device Fleet Load Generator.
+
+Runs thousands of simulated ESP32 devices in a single asyncio process and
+drives the same lifecycle as Device.py against the real API:
+
+    login (puzzle) -> reading every interval -> 401: re-auth + retry once
+    login 409 (stale session) -> logout cached token + re-login, or
+    retry with backoff when the token was lost (reboot)
+
+Puzzles are built by the firmware's own puzzle_auth.py / aes256.py /
+hmac_sha256.py (AES provided by host_shims.install_crypto), so the server
+sees exactly what a real device sends.
+
+Scenarios:
+    steady        Constant interval with jitter.
+    reboot-storm  At --event-at, a fraction of devices reboot at once
+                  (token lost, immediate re-login -> 409 stampede).
+    wifi-drop     At --event-at, a fraction of devices go offline for
+                  --event-duration seconds and reconnect together.
+
+Reports p50/p90/p99 latency per operation, status codes and sustained
+readings/sec (measured after the ramp-up).
+
+Soak mode (--soak, admin credentials required): while the fleet runs, the
+API's GET /api/v1/diagnostics/runtime is polled every --soak-sample seconds
+over fresh connections so every uvicorn worker is reached. Per worker it
+records RSS, open fds/sockets, threads, threadpool usage, GC objects,
+tracemalloc totals and internal structure sizes, and at the end flags
+metrics whose floor grows in every window (exit code 2). With
+RUNTIME_TRACEMALLOC=true on the server, a baseline is set per worker at
+the start and the top growing allocation sites are included. The admin
+token is renewed on 401 (it expires after ACCESS_TOKEN_EXPIRE_MINUTES) and
+polls that collect no sample are counted in the report.
+
+Note: nginx rate-limits per client IP (api_limit 10 r/s, auth_limit 5 r/m).
+Point --base-url at the FastAPI container (port 5000) to measure the
+application itself; 503s through nginx are reported as "rate_limited".
+
+Usage:
+    # Create 500 devices and save their credentials
+    uv run fleet_simulator.py --provision 500 --devices fleet.json \\
+        --admin-email admin@example.com --admin-password '...'
+
+    # Run 500 devices for 10 minutes, 5 s interval
+    uv run fleet_simulator.py --devices fleet.json --interval 5 --duration 600
+
+    # Reboot storm: 30% of the fleet reboots 120 s into the run
+    uv run fleet_simulator.py --devices fleet.json --scenario reboot-storm \\
+        --event-at 120 --event-fraction 0.3
+
+    # 6-hour soak test with leak detection on both workers
+    uv run fleet_simulator.py --devices fleet.json --duration 21600 --soak \\
+        --admin-email admin@example.com --admin-password '...' --json-out soak.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+import httpx
+
+from host_shims import install_crypto
+
+install_crypto()
+
+from puzzle_auth import PuzzleAuth, _LOGIN_PATH, _LOGOUT_PATH, _STALE_SESSION_RETRIES  # noqa: E402
+from compute_server_key import SECRETS_PATH, compute_server_key, parse_secrets  # noqa: E402
+
+_READING_PATH = "/api/v1/device/reading"
+_ADMIN_LOGIN_PATH = "/api/v1/auth/login/admin"
+_DEVICES_PATH = "/api/v1/devices/"
+_RUNTIME_PATH = "/api/v1/diagnostics/runtime"
+
+# Soak: metrics compared per worker, and minimum growth to flag (relative, absolute)
+_SOAK_METRICS = {
+    "rss_bytes": (0.10, 16 * 1024 * 1024),
+    "traced_bytes": (0.10, 8 * 1024 * 1024),
+    "open_fds": (0.25, 10),
+    "sockets": (0.25, 10),
+    "threads": (0.25, 4),
+    "gc_objects": (0.10, 50000),
+}
+_SOAK_WINDOWS = 6
+
+# Latency samples kept per operation (reservoir sampling beyond this)
+_MAX_SAMPLES = 200_000
+
+SCENARIOS = ("steady", "reboot-storm", "wifi-drop")
+
+
+# =============================================================================
+# Statistics
+# =============================================================================
+
+class Stats:
+    """Latency samples and status counters per operation."""
+
+    def __init__(self):
+        self.samples: dict[str, list[float]] = {}
+        self.seen: Counter = Counter()
+        self.status: Counter = Counter()
+        self.readings_ok = 0
+        self.window_readings = 0
+        self.window_latencies: list[float] = []
+
+    def record(self, op: str, status: int | str, latency: float) -> None:
+        self.status[(op, status)] += 1
+        self.seen[op] += 1
+        samples = self.samples.setdefault(op, [])
+        if len(samples) < _MAX_SAMPLES:
+            samples.append(latency)
+        else:
+            j = random.randrange(self.seen[op])
+            if j < _MAX_SAMPLES:
+                samples[j] = latency
+        if op == "reading":
+            self.window_latencies.append(latency)
+            if status == 201:
+                self.readings_ok += 1
+                self.window_readings += 1
+
+    def take_window(self) -> tuple[int, list[float]]:
+        """Return and reset readings/latencies since the last call."""
+        count, lat = self.window_readings, self.window_latencies
+        self.window_readings, self.window_latencies = 0, []
+        return count, lat
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+# =============================================================================
+# Virtual device
+# =============================================================================
+
+class VirtualDevice:
+    """One simulated ESP32: puzzle auth, telemetry loop, recovery paths."""
+
+    def __init__(self, creds: dict, server_key: bytes, client: httpx.AsyncClient,
+                 stats: Stats, args: argparse.Namespace):
+        config = {
+            "device_id": int(creds["device_id"]),
+            "api_key": creds["api_key"],
+            "device_key": bytes.fromhex(creds["encryption_key_hex"]),
+            "server_key": server_key,
+        }
+        # Only _build_puzzle() is used: HTTP goes through the async client
+        self.puzzle = PuzzleAuth(config, http_client=None)
+        self.device_id = config["device_id"]
+        self.api_key = config["api_key"]
+        self.client = client
+        self.stats = stats
+        self.args = args
+        self.token: str | None = None
+        self.cached_token: str | None = None
+        self.online = True
+        self.disabled = False
+        self.reboot_requested = False
+
+    async def _post(self, op: str, path: str, payload: dict | None, token: str | None):
+        headers = {"Authorization": "Bearer {}".format(token)} if token else None
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=payload, headers=headers)
+            status: int | str = response.status_code
+        except httpx.HTTPError as exc:
+            response, status = None, type(exc).__name__
+        latency = time.perf_counter() - start
+        if status == 503:
+            status = "rate_limited"
+        self.stats.record(op, status, latency)
+        return status, response
+
+    async def login(self) -> bool:
+        payload = {
+            "device_id": self.device_id,
+            "api_key": self.api_key,
+            "puzzle_response": self.puzzle._build_puzzle(),
+        }
+        status, response = await self._post("login", _LOGIN_PATH, payload, None)
+        if status == 200:
+            self.token = self.cached_token = response.json().get("access_token")
+            return self.token is not None
+        if status == 409:
+            return await self._recover_stale_session()
+        if status == 401:
+            print("[fleet] device {}: 401 on login, disabling".format(self.device_id))
+            self.disabled = True
+        return False
+
+    async def _recover_stale_session(self) -> bool:
+        """Mirror PuzzleAuth._recover_stale_session with async sleeps."""
+        if self.cached_token:
+            status, _ = await self._post("logout", _LOGOUT_PATH, None, self.cached_token)
+            self.cached_token = None
+            if status in (204, 401):
+                await asyncio.sleep(1)
+                return await self.login()
+
+        for _ in range(_STALE_SESSION_RETRIES):
+            await asyncio.sleep(self.args.stale_retry_delay)
+            payload = {
+                "device_id": self.device_id,
+                "api_key": self.api_key,
+                "puzzle_response": self.puzzle._build_puzzle(),
+            }
+            status, response = await self._post("login_retry", _LOGIN_PATH, payload, None)
+            if status == 200:
+                self.token = self.cached_token = response.json().get("access_token")
+                return self.token is not None
+            if status != 409:
+                break
+        return False
+
+    async def send_reading(self) -> None:
+        payload = {
+            "device_id": self.device_id,
+            "temperature": round(random.uniform(18.0, 32.0), 2),
+            "humidity": random.randint(30, 80),
+            "battery": random.randint(20, 100),
+            "location": "sim-{}".format(self.device_id % 100),
+        }
+        status, _ = await self._post("reading", _READING_PATH, payload, self.token)
+        if status == 401:
+            if await self.login():
+                await self._post("reading", _READING_PATH, payload, self.token)
+
+    def reboot(self) -> None:
+        """Lose RAM state: token and cached token (as after a power cycle)."""
+        self.token = None
+        self.cached_token = None
+        self.reboot_requested = True
+
+    async def run(self, stop_at: float) -> None:
+        # Boot stagger: spread the initial logins over the ramp-up
+        await asyncio.sleep(random.uniform(0, self.args.ramp))
+        while time.monotonic() < stop_at and not self.disabled:
+            if not self.online:
+                await asyncio.sleep(0.5)
+                continue
+            if self.token is None or self.reboot_requested:
+                self.reboot_requested = False
+                if not await self.login():
+                    await asyncio.sleep(self.args.interval)
+                    continue
+            await self.send_reading()
+            jitter = random.uniform(-self.args.jitter, self.args.jitter)
+            await asyncio.sleep(max(0.05, self.args.interval + jitter))
+
+
+# =============================================================================
+# Scenarios and reporting
+# =============================================================================
+
+async def run_scenario(devices: list[VirtualDevice], args: argparse.Namespace, started: float) -> None:
+    if args.scenario == "steady":
+        return
+    await asyncio.sleep(max(0.0, started + args.event_at - time.monotonic()))
+    affected = random.sample(devices, int(len(devices) * args.event_fraction))
+    if args.scenario == "reboot-storm":
+        print("[fleet] reboot-storm: {} devices rebooting".format(len(affected)))
+        for device in affected:
+            device.reboot()
+    elif args.scenario == "wifi-drop":
+        print("[fleet] wifi-drop: {} devices offline for {}s".format(len(affected), args.event_duration))
+        for device in affected:
+            device.online = False
+        await asyncio.sleep(args.event_duration)
+        for device in affected:
+            device.online = True
+        print("[fleet] wifi-drop: devices back online")
+
+
+async def report_progress(stats: Stats, devices: list[VirtualDevice], every: float) -> None:
+    while True:
+        await asyncio.sleep(every)
+        count, latencies = stats.take_window()
+        online = sum(1 for d in devices if d.token and d.online)
+        print("[fleet] online={:5d}  readings/s={:8.1f}  p50={:7.1f} ms  p99={:7.1f} ms".format(
+            online, count / every, percentile(latencies, 50) * 1000, percentile(latencies, 99) * 1000))
+
+
+def summarize(stats: Stats, measured_readings: int, measured_seconds: float, n_devices: int) -> dict:
+    ops = {}
+    for op, samples in sorted(stats.samples.items()):
+        ops[op] = {
+            "count": stats.seen[op],
+            "p50_ms": round(percentile(samples, 50) * 1000, 2),
+            "p90_ms": round(percentile(samples, 90) * 1000, 2),
+            "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            "max_ms": round(max(samples) * 1000, 2) if samples else 0.0,
+        }
+    return {
+        "devices": n_devices,
+        "operations": ops,
+        "status": {"{} {}".format(op, status): n for (op, status), n in sorted(stats.status.items(), key=str)},
+        "readings_ok": stats.readings_ok,
+        "sustained_readings_per_sec": round(measured_readings / measured_seconds, 2) if measured_seconds > 0 else 0.0,
+    }
+
+
+def print_summary(summary: dict) -> None:
+    print()
+    print("=" * 64)
+    print("Devices: {}   readings OK: {}   sustained: {} readings/s".format(
+        summary["devices"], summary["readings_ok"], summary["sustained_readings_per_sec"]))
+    print("-" * 64)
+    print("{:<12} {:>8} {:>10} {:>10} {:>10} {:>10}".format("op", "count", "p50 ms", "p90 ms", "p99 ms", "max ms"))
+    for op, row in summary["operations"].items():
+        print("{:<12} {:>8} {:>10} {:>10} {:>10} {:>10}".format(
+            op, row["count"], row["p50_ms"], row["p90_ms"], row["p99_ms"], row["max_ms"]))
+    print("-" * 64)
+    for key, n in summary["status"].items():
+        print("  {:<28} {}".format(key, n))
+    print("=" * 64)
+
+
+# =============================================================================
+# Soak test
+# =============================================================================
+
+def growth_trend(values: list, relative: float, absolute: float, windows: int = _SOAK_WINDOWS) -> dict:
+    """Window floors (the level left after GC) and whether they grow in every window."""
+    points = [v for v in values if v is not None]
+    if len(points) < windows * 2:
+        return {"samples": len(points), "suspect": False}
+    size = len(points) // windows
+    floors = [min(points[i * size:(i + 1) * size]) for i in range(windows)]
+    growth = floors[-1] - floors[0]
+    monotonic = all(b > a for a, b in zip(floors, floors[1:]))
+    significant = growth >= absolute and (floors[0] <= 0 or growth / floors[0] >= relative)
+    return {"samples": len(points), "first": floors[0], "last": floors[-1], "growth": growth,
+            "monotonic": monotonic, "suspect": monotonic and significant}
+
+
+class SoakMonitor:
+    """Polls the runtime diagnostics endpoint and keeps a series per worker PID."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.token = None
+        self.failed_polls = 0
+        self.relogins = 0
+        self.series: dict[int, list[dict]] = {}
+        self.reports: dict[int, dict] = {}
+        # No keep-alive: every request may land on a different uvicorn worker
+        self.client = httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout,
+                                        limits=httpx.Limits(max_keepalive_connections=0))
+
+    @property
+    def headers(self) -> dict:
+        return {"Authorization": "Bearer {}".format(self.token)}
+
+    async def login(self) -> httpx.Response:
+        """Admin login; on 409 (session still active) log the cached token out and retry once."""
+        payload = {"email": self.args.admin_email, "password": self.args.admin_password}
+        response = await self.client.post(_ADMIN_LOGIN_PATH, json=payload)
+        if response.status_code == 409 and self.token:
+            await self.client.post(_LOGOUT_PATH, headers=self.headers)
+            response = await self.client.post(_ADMIN_LOGIN_PATH, json=payload)
+        if response.status_code == 200:
+            self.token = response.json()["access_token"]
+        return response
+
+    async def start(self) -> None:
+        response = await self.login()
+        if response.status_code != 200:
+            sys.exit("[soak] admin login failed: HTTP {} {}".format(response.status_code, response.text))
+
+        baselines = set()
+        for _ in range(self.args.soak_workers * 5):
+            response = await self.client.post(_RUNTIME_PATH + "/baseline", headers=self.headers)
+            if response.status_code == 409:
+                print("[soak] tracemalloc disabled on the server (RUNTIME_TRACEMALLOC=false)")
+                break
+            if response.status_code == 200:
+                baselines.add(response.json()["pid"])
+            if len(baselines) >= self.args.soak_workers:
+                break
+        if baselines:
+            print("[soak] tracemalloc baseline set on workers {}".format(sorted(baselines)))
+
+    async def poll(self) -> None:
+        seen = set()
+        reauthenticated = False
+        for _ in range(self.args.soak_workers * 3):
+            try:
+                response = await self.client.get(_RUNTIME_PATH, headers=self.headers, params={"top": 10})
+                if response.status_code == 401 and not reauthenticated:
+                    # Token expired (ACCESS_TOKEN_EXPIRE_MINUTES): re-auth + retry, like the devices
+                    reauthenticated = True
+                    login = await self.login()
+                    if login.status_code != 200:
+                        print("[soak] admin re-login failed: HTTP {}".format(login.status_code))
+                        break
+                    self.relogins += 1
+                    response = await self.client.get(_RUNTIME_PATH, headers=self.headers, params={"top": 10})
+            except httpx.HTTPError:
+                continue
+            if response.status_code != 200:
+                print("[soak] runtime endpoint returned HTTP {}".format(response.status_code))
+                break
+            report = response.json()
+            pid = report["pid"]
+            if pid in seen:
+                continue
+            seen.add(pid)
+            self.reports[pid] = report
+            current = report.get("current") or {}
+            point = {k: current.get(k) for k in _SOAK_METRICS}
+            point["threadpool_busy"] = current.get("threadpool_busy")
+            point.update({"tracked." + k: v for k, v in (current.get("tracked") or {}).items()})
+            point["t"] = time.time()
+            self.series.setdefault(pid, []).append(point)
+            if len(seen) >= self.args.soak_workers:
+                break
+        if not seen:
+            self.failed_polls += 1
+
+    async def run(self) -> None:
+        while True:
+            await self.poll()
+            await asyncio.sleep(self.args.soak_sample)
+
+    async def close(self) -> dict:
+        await self.poll()
+        if self.token:
+            await self.client.post(_LOGOUT_PATH, headers=self.headers)
+        await self.client.aclose()
+        return self.summarize()
+
+    def summarize(self) -> dict:
+        workers = {}
+        for pid, points in sorted(self.series.items()):
+            keys = sorted({k for p in points for k in p if k != "t"})
+            trends = {}
+            for key in keys:
+                relative, absolute = _SOAK_METRICS.get(key, (0.25, 100))
+                trends[key] = growth_trend([p.get(key) for p in points], relative, absolute)
+            report = self.reports.get(pid, {})
+            workers[str(pid)] = {
+                "samples": len(points),
+                "trends": trends,
+                "suspects": sorted(k for k, t in trends.items() if t["suspect"]),
+                "server_suspects": report.get("suspects", []),
+                "top_growth": report.get("top_growth", []),
+                "max_threadpool_busy": max((p["threadpool_busy"] or 0) for p in points),
+            }
+        return {"workers": workers,
+                "failed_polls": self.failed_polls,
+                "relogins": self.relogins,
+                "suspect": any(w["suspects"] or w["server_suspects"] for w in workers.values())}
+
+
+def print_soak_summary(soak: dict) -> None:
+    print()
+    print("Soak test: {}".format("GROWTH DETECTED" if soak["suspect"] else "no sustained growth"))
+    print("failed polls: {}  admin re-logins: {}".format(soak["failed_polls"], soak["relogins"]))
+    for pid, worker in soak["workers"].items():
+        print("-" * 64)
+        print("worker pid {}  samples={}  max threadpool busy={}".format(
+            pid, worker["samples"], worker["max_threadpool_busy"]))
+        for key, trend in worker["trends"].items():
+            if "first" not in trend:
+                continue
+            print("  {:<32} {:>14} -> {:<14} {}".format(
+                key, trend["first"], trend["last"], "SUSPECT" if trend["suspect"] else ""))
+        if worker["server_suspects"]:
+            print("  server-side suspects: {}".format(", ".join(worker["server_suspects"])))
+        for entry in worker["top_growth"][:5]:
+            print("  +{:>10} B  {}".format(entry["size_diff_bytes"], entry["location"]))
+    print("=" * 64)
+
+
+# =============================================================================
+# Credentials and provisioning
+# =============================================================================
+
+def load_server_key(args: argparse.Namespace) -> bytes:
+    secret_key = args.secret_key or os.environ.get("SECRET_KEY", "")
+    if not secret_key and SECRETS_PATH.exists():
+        secret_key = parse_secrets(SECRETS_PATH).get("SECRET_KEY", "")
+    if not secret_key:
+        sys.exit("[fleet] SECRET_KEY not found (use --secret-key, $SECRET_KEY or {})".format(SECRETS_PATH))
+    return bytes.fromhex(compute_server_key(secret_key))
+
+
+async def provision(args: argparse.Namespace) -> None:
+    """Create N devices through the admin API and write their credentials."""
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout) as client:
+        response = await client.post(_ADMIN_LOGIN_PATH, json={
+            "email": args.admin_email, "password": args.admin_password})
+        if response.status_code != 200:
+            sys.exit("[fleet] admin login failed: HTTP {} {}".format(response.status_code, response.text))
+        body = response.json()
+        token, admin_id = body["access_token"], body.get("user_id")
+        headers = {"Authorization": "Bearer {}".format(token)}
+
+        fleet = []
+        try:
+            for i in range(args.provision):
+                response = await client.post(_DEVICES_PATH, headers=headers, json={
+                    "nombre": "sim-{:05d}".format(i),
+                    "device_type": "esp32-sim",
+                    "is_active": True,
+                    "admin_id": admin_id,
+                })
+                data = response.json().get("data") if response.status_code == 200 else None
+                if not data:
+                    sys.exit("[fleet] device creation failed: HTTP {} {}".format(
+                        response.status_code, response.text))
+                fleet.append({k: data[k] for k in ("device_id", "api_key", "encryption_key_hex")})
+                if (i + 1) % 100 == 0:
+                    print("[fleet] provisioned {}/{}".format(i + 1, args.provision))
+        finally:
+            await client.post(_LOGOUT_PATH, headers=headers)
+
+    Path(args.devices).write_text(json.dumps(fleet, indent=2))
+    print("[fleet] {} devices written to {}".format(len(fleet), args.devices))
+
+
+async def simulate(args: argparse.Namespace) -> dict:
+    creds = json.loads(Path(args.devices).read_text())
+    if args.count:
+        creds = creds[:args.count]
+    server_key = load_server_key(args)
+
+    limits = httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections)
+    stats = Stats()
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        devices = [VirtualDevice(c, server_key, client, stats, args) for c in creds]
+        print("[fleet] {} devices, scenario={}, interval={}s +/- {}s, duration={}s".format(
+            len(devices), args.scenario, args.interval, args.jitter, args.duration))
+
+        soak = SoakMonitor(args) if args.soak else None
+        if soak is not None:
+            await soak.start()
+
+        started = time.monotonic()
+        stop_at = started + args.duration
+        reporter = asyncio.create_task(report_progress(stats, devices, args.report_every))
+        scenario = asyncio.create_task(run_scenario(devices, args, started))
+        soak_task = asyncio.create_task(soak.run()) if soak is not None else None
+
+        # Sustained throughput is measured after the ramp-up
+        window = {"readings": 0, "start": started}
+
+        def mark_measurement_start():
+            window["readings"], window["start"] = stats.readings_ok, time.monotonic()
+
+        marker = asyncio.get_running_loop().call_later(min(args.ramp, args.duration), mark_measurement_start)
+
+        await asyncio.gather(*(d.run(stop_at) for d in devices))
+        for task in (reporter, scenario, soak_task):
+            if task is not None:
+                task.cancel()
+        marker.cancel()
+
+        measured = stats.readings_ok - window["readings"]
+        summary = summarize(stats, measured, time.monotonic() - window["start"], len(devices))
+
+        if args.logout:
+            await asyncio.gather(*(
+                client.post(_LOGOUT_PATH, headers={"Authorization": "Bearer {}".format(d.token)})
+                for d in devices if d.token), return_exceptions=True)
+
+        if soak is not None:
+            summary["soak"] = await soak.close()
+
+    print_summary(summary)
+    if "soak" in summary:
+        print_soak_summary(summary["soak"])
+    return summary
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Simulated ESP32 fleet load generator")
+    parser.add_argument("--base-url", default="http://localhost:5000", help="API base URL")
+    parser.add_argument("--devices", default="fleet.json", help="Credentials file (JSON list)")
+    parser.add_argument("--count", type=int, default=0, help="Use only the first N devices")
+    parser.add_argument("--secret-key", default="", help="Server SECRET_KEY (default: $SECRET_KEY or .secrets)")
+    parser.add_argument("--scenario", choices=SCENARIOS, default="steady")
+    parser.add_argument("--interval", type=float, default=30.0, help="Seconds between readings")
+    parser.add_argument("--jitter", type=float, default=2.0, help="+/- seconds added to each interval")
+    parser.add_argument("--duration", type=float, default=300.0, help="Test duration in seconds")
+    parser.add_argument("--ramp", type=float, default=30.0, help="Spread initial logins over N seconds")
+    parser.add_argument("--event-at", type=float, default=120.0, help="Scenario event time (s)")
+    parser.add_argument("--event-fraction", type=float, default=0.3, help="Fraction of devices affected")
+    parser.add_argument("--event-duration", type=float, default=60.0, help="wifi-drop offline time (s)")
+    parser.add_argument("--stale-retry-delay", type=float, default=60.0, help="Backoff between 409 retries (s)")
+    parser.add_argument("--connections", type=int, default=200, help="Max concurrent HTTP connections")
+    parser.add_argument("--timeout", type=float, default=30.0, help="HTTP timeout (s)")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Progress interval (s)")
+    parser.add_argument("--json-out", default="", help="Write the summary as JSON to this file")
+    parser.add_argument("--no-logout", dest="logout", action="store_false",
+                        help="Keep sessions open at the end (default: log out every device)")
+    parser.add_argument("--provision", type=int, default=0, help="Create N devices and exit")
+    parser.add_argument("--admin-email", default="", help="Admin email (provisioning, soak)")
+    parser.add_argument("--admin-password", default="", help="Admin password (provisioning, soak)")
+    parser.add_argument("--soak", action="store_true", help="Poll worker runtime stats and flag sustained growth")
+    parser.add_argument("--soak-sample", type=float, default=60.0, help="Seconds between runtime polls")
+    parser.add_argument("--soak-workers", type=int, default=2, help="uvicorn workers to reach on each poll")
+    args = parser.parse_args(argv)
+    if args.soak and not (args.admin_email and args.admin_password):
+        parser.error("--soak requires --admin-email and --admin-password (view_diagnostics permission)")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    if args.provision:
+        asyncio.run(provision(args))
+        return
+    summary = asyncio.run(simulate(args))
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(summary, indent=2))
+        print("[fleet] summary written to {}".format(args.json_out))
+    if summary.get("soak", {}).get("suspect"):
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+CPython shims for running firmware modules on a host machine.
+
+The firmware targets MicroPython; most modules already fall back to the
+CPython standard library (hashlib, binascii, requests), but aes256.py
+needs `ucryptolib`/`cryptolib`, which has no CPython equivalent.
+install_crypto() registers a `cryptolib` module backed by pycryptodome
+with the same `aes(key, mode, iv)` interface, so host tools can import
+puzzle_auth.py unchanged and produce byte-identical puzzles.
+
+install_hardware() registers `machine`, `network`, `dht`, `ntptime` and
+`utime` stand-ins driven by a VirtualClock, so Device.py can run its
+telemetry loop on the host in accelerated time.
+
+Requires: pycryptodome (declared by the host scripts that import this).
+"""
+
+import sys
+import types
+
+# MicroPython ucryptolib mode constants
+_MODE_ECB = 1
+_MODE_CBC = 2
+
+
+class _Aes:
+    """ucryptolib.aes-compatible wrapper around pycryptodome."""
+
+    def __init__(self, key: bytes, mode: int, iv: bytes = None):
+        from Crypto.Cipher import AES
+
+        if mode == _MODE_CBC:
+            self._cipher = AES.new(key, AES.MODE_CBC, iv=iv)
+        elif mode == _MODE_ECB:
+            self._cipher = AES.new(key, AES.MODE_ECB)
+        else:
+            raise ValueError("Unsupported AES mode: {}".format(mode))
+
+    def encrypt(self, data: bytes) -> bytes:
+        return self._cipher.encrypt(data)
+
+    def decrypt(self, data: bytes) -> bytes:
+        return self._cipher.decrypt(data)
+
+
+def install_crypto() -> None:
+    """Register a pycryptodome-backed `cryptolib` module (idempotent)."""
+    if "cryptolib" in sys.modules:
+        return
+    module = types.ModuleType("cryptolib")
+    module.aes = _Aes
+    module.MODE_ECB = _MODE_ECB
+    module.MODE_CBC = _MODE_CBC
+    sys.modules["cryptolib"] = module
+
+
+# =============================================================================
+# Hardware and clock shims (host_simulator.py)
+# =============================================================================
+
+class VirtualClock:
+    """
+    Accelerated time source for firmware modules.
+
+    Virtual time = real elapsed time + every sleep the firmware requested.
+    With speed=0 sleeps return immediately; with speed=N they really sleep
+    1/N of the requested time. Exposes the subset of `time`/`utime` used by
+    the firmware (time, sleep, sleep_ms, sleep_us, ticks_*, localtime).
+    """
+
+    def __init__(self, speed: float = 0.0, epoch: float = None):
+        import time as _time
+        self._real = _time
+        self.speed = speed
+        self._epoch = _time.time() if epoch is None else epoch
+        self._origin = _time.monotonic()
+        self.skipped = 0.0     # Virtual seconds not spent in real time
+        self.slept = 0.0       # Virtual seconds requested by sleep()
+        self.sleep_wall = 0.0  # Real seconds spent inside sleep()
+
+    def time(self) -> float:
+        return self._epoch + (self._real.monotonic() - self._origin) + self.skipped
+
+    def sleep(self, seconds: float) -> None:
+        if seconds <= 0:
+            return
+        self.slept += seconds
+        if self.speed > 0:
+            started = self._real.monotonic()
+            self._real.sleep(seconds / self.speed)
+            real = self._real.monotonic() - started
+            self.sleep_wall += real
+            self.skipped += max(0.0, seconds - real)
+        else:
+            self.skipped += seconds
+
+    def sleep_ms(self, ms: int) -> None:
+        self.sleep(ms / 1000)
+
+    def sleep_us(self, us: int) -> None:
+        self.sleep(us / 1_000_000)
+
+    def ticks_ms(self) -> int:
+        return int(self.time() * 1000) & 0x3FFFFFFF
+
+    def ticks_us(self) -> int:
+        return int(self.time() * 1_000_000) & 0x3FFFFFFF
+
+    @staticmethod
+    def ticks_diff(a: int, b: int) -> int:
+        return ((a - b + 0x20000000) & 0x3FFFFFFF) - 0x20000000
+
+    @staticmethod
+    def ticks_add(ticks: int, delta: int) -> int:
+        return (ticks + delta) & 0x3FFFFFFF
+
+    def localtime(self, secs: float = None) -> tuple:
+        """MicroPython 8-tuple (UTC, as after ntptime.settime())."""
+        return tuple(self._real.gmtime(self.time() if secs is None else secs))[:8]
+
+    gmtime = localtime
+
+    def module(self, name: str = "utime") -> types.ModuleType:
+        """Module object exposing this clock with the `time` API."""
+        module = types.ModuleType(name)
+        for attr in ("time", "sleep", "sleep_ms", "sleep_us", "ticks_ms", "ticks_us",
+                     "ticks_diff", "ticks_add", "localtime", "gmtime"):
+            setattr(module, attr, getattr(self, attr))
+        return module
+
+
+class _Pin:
+    """machine.Pin: keeps the output value and the IRQ handler."""
+
+    IN = 1
+    OUT = 3
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 2
+    IRQ_RISING = 1
+
+    def __init__(self, pin_id, mode=None, pull=None, value=None):
+        self.id = pin_id
+        self._value = value or 0
+        self.handler = None
+
+    def value(self, v=None):
+        if v is None:
+            return self._value
+        self._value = v
+
+    def irq(self, trigger=None, handler=None):
+        self.handler = handler
+
+
+class _ADC:
+    """machine.ADC: noise-like readings around mid scale."""
+
+    ATTN_11DB = 3
+    WIDTH_12BIT = 3
+
+    def __init__(self, pin):
+        import random
+        self._rng = random.Random(getattr(pin, "id", 0))
+
+    def atten(self, value):
+        pass
+
+    def width(self, value):
+        pass
+
+    def read(self) -> int:
+        return max(0, min(4095, int(self._rng.gauss(2100, 400))))
+
+
+class _PWM:
+    """machine.PWM: stores frequency and duty only."""
+
+    def __init__(self, pin, freq=0, duty=0):
+        self._freq = freq
+        self._duty = duty
+
+    def freq(self, value=None):
+        if value is None:
+            return self._freq
+        self._freq = value
+
+    def duty(self, value=None):
+        if value is None:
+            return self._duty
+        self._duty = value
+
+
+class _WLAN:
+    """network.WLAN: the access point is down until `outage_until` (virtual time)."""
+
+    clock = None
+    outage_until = 0.0
+
+    def __init__(self, interface=0):
+        self._active = False
+        self._connected = False
+        self._pending = False
+
+    @classmethod
+    def _link_up(cls) -> bool:
+        return cls.clock is None or cls.clock.time() >= cls.outage_until
+
+    def active(self, value=None):
+        if value is None:
+            return self._active
+        self._active = value
+        if not value:
+            self._connected = False
+
+    def connect(self, ssid=None, password=None):
+        if not self._active:
+            raise OSError("Wifi Not Started")
+        self._pending = True
+
+    def disconnect(self):
+        self._connected = False
+        self._pending = False
+
+    def isconnected(self) -> bool:
+        if not self._link_up():
+            self._connected = False
+        elif self._pending:
+            self._connected = True
+            self._pending = False
+        return self._connected
+
+    def ifconfig(self):
+        return ("10.0.0.2", "255.255.255.0", "10.0.0.1", "10.0.0.1")
+
+
+def _make_dht(clock: VirtualClock, present: bool):
+    import math
+    import random
+
+    rng = random.Random(11)
+
+    class DHT11:
+        """dht.DHT11: diurnal temperature/humidity driven by the virtual clock."""
+
+        def __init__(self, pin):
+            self._t = 0
+            self._h = 0
+
+        def measure(self):
+            if not present:
+                raise OSError(116)  # ETIMEDOUT, as with the sensor unplugged
+            hour = (clock.time() % 86400) / 3600
+            diurnal = math.cos(2 * math.pi * (hour - 15) / 24)
+            self._t = int(round(24 + 5 * diurnal + rng.gauss(0, 0.5)))
+            self._h = int(round(55 - 12 * diurnal + rng.gauss(0, 2)))
+
+        def temperature(self):
+            return self._t
+
+        def humidity(self):
+            return self._h
+
+    return DHT11
+
+
+def install_hardware(clock: VirtualClock, sensors_present: bool = True) -> None:
+    """
+    Register machine, network, dht, ntptime and utime modules.
+
+    Must run before importing the firmware modules. Modules that do
+    `import time` still get CPython's clock; host_simulator rebinds their
+    `time` attribute to clock.module() after import.
+    """
+    machine = types.ModuleType("machine")
+    machine.Pin = _Pin
+    machine.ADC = _ADC
+    machine.PWM = _PWM
+    machine.reset = lambda: None
+    sys.modules["machine"] = machine
+
+    network = types.ModuleType("network")
+    network.STA_IF = 0
+    network.AP_IF = 1
+    network.WLAN = _WLAN
+    _WLAN.clock = clock
+    sys.modules["network"] = network
+
+    dht = types.ModuleType("dht")
+    dht.DHT11 = _make_dht(clock, sensors_present)
+    dht.DHT22 = dht.DHT11
+    sys.modules["dht"] = dht
+
+    ntptime = types.ModuleType("ntptime")
+    ntptime.settime = lambda: None  # The virtual clock is already UTC
+    sys.modules["ntptime"] = ntptime
+
+    sys.modules["utime"] = clock.module("utime")
+
+
+def drop_wifi(seconds: float) -> None:
+    """Take the simulated access point down for `seconds` of virtual time."""
+    _WLAN.outage_until = _WLAN.clock.time() + seconds
@@ -0,0 +1,378 @@
+# /// script
+# requires-python = ">=3.10"
+# description = "Runs the firmware telemetry loop on the host in virtual time with per-cycle accounting."
+# dependencies = ["requests>=2.31", "pycryptodome>=3.20"]
+# ///
+"""
+Host-side Firmware Simulator.
+
+Runs the unmodified DeviceIoT (Device.py) on CPython with stand-ins for
+`machine`, `network`, `dht`, `ntptime` and `utime` (host_shims.py). Every
+firmware sleep (DHT11 delays, sampling, loop interval, backoff) advances a
+virtual clock instead of blocking, so hours of device time run in seconds.
+
+Each telemetry cycle (one pass of DeviceIoT.run) is measured:
+
+    wall_ms       Real time spent in the cycle (CPU + network), sleeps excluded
+    net_ms        Real time inside HTTP calls
+    virtual_s     Device-perceived duration (includes sensor and loop sleeps)
+    http_calls    Requests issued (urequests opens one TCP connection each)
+    bytes_out/in  HTTP/1.0 request and response bytes (headers + body)
+    peak_kb       Python heap high-water mark above the cycle start (tracemalloc)
+    net_blocks    Allocated blocks retained after the cycle (leak indicator)
+
+Allocation figures include CPython's `requests` stack, which is much larger
+than MicroPython's urequests; use --offline (in-process fake API) to isolate
+the firmware's own allocations and CPU cost.
+
+Usage:
+    # Against the API, with a provisioned firmware config
+    uv run host_simulator.py --config config.json --cycles 100
+
+    # Against the bench profile (credentials from bench_devices.json)
+    uv run host_simulator.py --fleet ../templates/fastapi-app/bench_devices.json \\
+        --secret-key "$SECRET_KEY" --server-url http://127.0.0.1 --cycles 200
+
+    # Firmware only, 30 s Wi-Fi outage every 20 cycles, machine-readable summary
+    uv run host_simulator.py --offline --cycles 500 --wifi-drop-every 20 --json-out cycles.json
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import host_shims
+
+_FIRMWARE_MODULES = ("Device", "WifiControl", "temperature_sensor", "IR_send", "button_toggle",
+                     "http_client", "puzzle_auth", "actuator_logic")
+
+
+class StopSimulation(Exception):
+    """Raised from the cycle hook once the requested cycles have run."""
+
+
+# =============================================================================
+# HTTP accounting
+# =============================================================================
+
+class _OfflineResponse:
+    """Minimal urequests.Response returned by the in-process fake API."""
+
+    def __init__(self, status_code: int, body: dict = None):
+        self.status_code = status_code
+        self.content = json.dumps(body).encode() if body is not None else b""
+        self.headers = {"content-type": "application/json", "content-length": str(len(self.content))}
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        pass
+
+
+def _offline_api(url: str, data) -> _OfflineResponse:
+    if url.endswith("/api/v1/auth/device/login"):
+        return _OfflineResponse(200, {"access_token": "offline", "token_type": "bearer", "expires_in": 86400})
+    if url.endswith("/api/v1/auth/logout"):
+        return _OfflineResponse(204)
+    if url.endswith("/api/v1/device/reading"):
+        return _OfflineResponse(201, {"success": True, "readings_count": 2})
+    return _OfflineResponse(404, {"detail": "Not Found"})
+
+
+class CountingTransport:
+    """Stands in for http_client.urequests; counts calls, bytes and network time."""
+
+    def __init__(self, backend, offline: bool):
+        self._backend = backend
+        self._offline = offline
+        self.calls = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+        self.seconds = 0.0
+        self.statuses = {}
+
+    def post(self, url, data=None, headers=None):
+        headers = headers or {}
+        body = data.encode() if isinstance(data, str) else (data or b"")
+        host_path = url.split("://", 1)[-1]
+        host, _, path = host_path.partition("/")
+        # urequests: "POST /path HTTP/1.0", Host, caller headers, Content-Length
+        request_head = "POST /{} HTTP/1.0\r\nHost: {}\r\n".format(path, host)
+        request_head += "".join("{}: {}\r\n".format(k, v) for k, v in headers.items())
+        if body:
+            request_head += "Content-Length: {}\r\n".format(len(body))
+        self.bytes_out += len(request_head) + 2 + len(body)
+        self.calls += 1
+
+        started = time.perf_counter()
+        try:
+            if self._offline:
+                resp = _offline_api(url, data)
+            else:
+                resp = self._backend.post(url, data=data, headers=headers)
+                resp.content  # Read the body inside the timed window
+        finally:
+            self.seconds += time.perf_counter() - started
+
+        response_head = "HTTP/1.1 {} \r\n".format(resp.status_code)
+        response_head += "".join("{}: {}\r\n".format(k, v) for k, v in resp.headers.items())
+        self.bytes_in += len(response_head) + 2 + len(resp.content)
+        self.statuses[resp.status_code] = self.statuses.get(resp.status_code, 0) + 1
+        return resp
+
+
+# =============================================================================
+# Configuration
+# =============================================================================
+
+def load_config(args) -> dict:
+    """Firmware config dict (as config_manager.load() returns it)."""
+    import config_manager
+    from compute_server_key import SECRETS_PATH, THRESHOLDS_DEFAULT, compute_server_key, parse_secrets
+
+    if args.fleet:
+        creds = json.loads(Path(args.fleet).read_text())[args.fleet_index]
+        secret_key = args.secret_key or os.environ.get("SECRET_KEY", "")
+        if not secret_key and SECRETS_PATH.exists():
+            secret_key = parse_secrets(SECRETS_PATH).get("SECRET_KEY", "")
+        if not secret_key and not args.offline:
+            sys.exit("[sim] SECRET_KEY not found (use --secret-key, $SECRET_KEY or {})".format(SECRETS_PATH))
+        config = {
+            "device_id": creds["device_id"],
+            "api_key": creds["api_key"],
+            "device_key_hex": creds["encryption_key_hex"],
+            "server_key_hex": compute_server_key(secret_key),
+            "server_url": "http://localhost",
+            "server_port": 5000,
+            "wifi_ssid": "host-sim",
+            "wifi_pass": "",
+            "read_interval_s": 30,
+            "location": "host-sim",
+            "thresholds": dict(THRESHOLDS_DEFAULT),
+        }
+    elif not args.offline:
+        if not Path(args.config).exists():
+            sys.exit("[sim] Config not found: {} (use --config, --fleet or --offline)".format(args.config))
+        config = json.loads(Path(args.config).read_text())
+    else:
+        # Offline: random keys, nothing leaves the process
+        config = {
+            "device_id": 1, "api_key": "offline", "device_key_hex": os.urandom(32).hex(),
+            "server_key_hex": os.urandom(32).hex(), "server_url": "http://offline", "server_port": 5000,
+            "wifi_ssid": "host-sim", "wifi_pass": "", "read_interval_s": 30, "location": "host-sim",
+            "thresholds": dict(THRESHOLDS_DEFAULT),
+        }
+
+    if args.server_url:
+        config["server_url"] = args.server_url
+    if args.server_port:
+        config["server_port"] = args.server_port
+    if args.interval:
+        config["read_interval_s"] = args.interval
+
+    missing = config_manager._validate(config)
+    if missing:
+        sys.exit("[sim] Config missing fields: {}".format(", ".join(missing)))
+    return config_manager._decode_keys(config)
+
+
+# =============================================================================
+# Simulation
+# =============================================================================
+
+class CycleRecorder:
+    """Closes a cycle every time DeviceIoT.run checks Wi-Fi (once per loop pass)."""
+
+    def __init__(self, clock, transport: CountingTransport, args):
+        self.clock = clock
+        self.transport = transport
+        self.args = args
+        self.cycles = []
+        self._mark = None
+
+    def _snapshot(self) -> dict:
+        return {
+            "perf": time.perf_counter(),
+            "sleep_wall": self.clock.sleep_wall,
+            "virtual": self.clock.time(),
+            "calls": self.transport.calls,
+            "bytes_out": self.transport.bytes_out,
+            "bytes_in": self.transport.bytes_in,
+            "net": self.transport.seconds,
+            "blocks": sys.getallocatedblocks(),
+            "gc0": gc.get_stats()[0]["collections"],
+            "heap": tracemalloc.get_traced_memory()[0],
+        }
+
+    def hook(self, is_connected):
+        """Wrap Wifi.is_connected so each call marks a cycle boundary."""
+        def wrapped():
+            self.boundary()
+            return is_connected()
+        return wrapped
+
+    def boundary(self) -> None:
+        now = self._snapshot()
+        if self._mark is not None:
+            peak = tracemalloc.get_traced_memory()[1]
+            start = self._mark
+            self.cycles.append({
+                "cycle": len(self.cycles) + 1,
+                "wall_ms": round((now["perf"] - start["perf"] - (now["sleep_wall"] - start["sleep_wall"])) * 1000, 3),
+                "net_ms": round((now["net"] - start["net"]) * 1000, 3),
+                "virtual_s": round(now["virtual"] - start["virtual"], 3),
+                "http_calls": now["calls"] - start["calls"],
+                "bytes_out": now["bytes_out"] - start["bytes_out"],
+                "bytes_in": now["bytes_in"] - start["bytes_in"],
+                "peak_kb": round(max(0, peak - start["heap"]) / 1024, 2),
+                "net_blocks": now["blocks"] - start["blocks"],
+                "gc0": now["gc0"] - start["gc0"],
+            })
+            if self.args.verbose:
+                c = self.cycles[-1]
+                print("[sim] cycle {cycle:>5}  wall {wall_ms:>8.2f} ms  net {net_ms:>8.2f} ms  "
+                      "virtual {virtual_s:>7.1f} s  http {http_calls}  out {bytes_out:>5} B  "
+                      "in {bytes_in:>5} B  peak {peak_kb:>7.1f} KB  blocks {net_blocks:+d}".format(**c),
+                      file=sys.__stdout__)
+            if len(self.cycles) >= self.args.cycles:
+                raise StopSimulation()
+
+        n = len(self.cycles) + 1
+        if self.args.wifi_drop_every and n % self.args.wifi_drop_every == 0:
+            host_shims.drop_wifi(self.args.wifi_outage)
+
+        tracemalloc.reset_peak()
+        self._mark = self._snapshot()
+
+
+def _percentile(values: list, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def summarize(cycles: list, transport: CountingTransport, clock, wall_total: float) -> dict:
+    def stats(key):
+        values = [c[key] for c in cycles]
+        return {
+            "mean": round(sum(values) / len(values), 3) if values else 0.0,
+            "p50": _percentile(values, 50),
+            "p95": _percentile(values, 95),
+            "max": max(values) if values else 0,
+        }
+
+    virtual_total = sum(c["virtual_s"] for c in cycles)
+    return {
+        "cycles": len(cycles),
+        "virtual_seconds": round(virtual_total, 1),
+        "wall_seconds": round(wall_total, 3),
+        "acceleration": round(virtual_total / wall_total, 1) if wall_total else 0.0,
+        "http_statuses": {str(k): v for k, v in sorted(transport.statuses.items())},
+        "per_cycle": {key: stats(key) for key in
+                      ("wall_ms", "net_ms", "virtual_s", "http_calls", "bytes_out", "bytes_in",
+                       "peak_kb", "net_blocks", "gc0")},
+        "retained_blocks_total": sum(c["net_blocks"] for c in cycles),
+    }
+
+
+def print_summary(summary: dict) -> None:
+    print("\n=== Host firmware simulation ===")
+    print("cycles: {}  virtual: {:.0f}s  wall: {:.2f}s  acceleration: {}x".format(
+        summary["cycles"], summary["virtual_seconds"], summary["wall_seconds"], summary["acceleration"]))
+    print("HTTP statuses: {}".format(summary["http_statuses"]))
+    print("{:<12} {:>10} {:>10} {:>10} {:>10}".format("per cycle", "mean", "p50", "p95", "max"))
+    for key, s in summary["per_cycle"].items():
+        print("{:<12} {:>10.2f} {:>10.2f} {:>10.2f} {:>10.2f}".format(key, s["mean"], s["p50"], s["p95"], s["max"]))
+    print("retained blocks over run: {:+d}".format(summary["retained_blocks_total"]))
+
+
+def simulate(args) -> dict:
+    clock = host_shims.VirtualClock(speed=args.speed)
+    host_shims.install_crypto()
+    host_shims.install_hardware(clock, sensors_present=not args.no_sensors)
+
+    import Device
+    import http_client
+
+    vtime = clock.module("time")
+    for name in _FIRMWARE_MODULES:
+        module = sys.modules.get(name)
+        if module is not None and hasattr(module, "time"):
+            module.time = vtime
+
+    transport = CountingTransport(http_client.urequests, args.offline)
+    http_client.urequests = transport
+
+    config = load_config(args)
+    recorder = CycleRecorder(clock, transport, args)
+    firmware_out = open(os.devnull, "w") if args.quiet else sys.stdout
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    device = Device.DeviceIoT(config)
+    try:
+        with redirect_stdout(firmware_out):
+            if not device.initialize():
+                sys.exit("[sim] Device initialization failed")
+            device.wifi.is_connected = recorder.hook(device.wifi.is_connected)
+            device.run()
+    except StopSimulation:
+        pass
+    except KeyboardInterrupt:
+        print("[sim] Interrupted after {} cycles".format(len(recorder.cycles)))
+    finally:
+        wall_total = time.perf_counter() - started - clock.sleep_wall
+        tracemalloc.stop()
+        if args.logout and device.auth is not None and not args.offline:
+            with redirect_stdout(firmware_out):
+                device.auth.logout()
+        if firmware_out is not sys.stdout:
+            firmware_out.close()
+
+    summary = summarize(recorder.cycles, transport, clock, wall_total)
+    summary["cycles_detail"] = recorder.cycles
+    return summary
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run the firmware telemetry loop on the host in virtual time")
+    parser.add_argument("--config", default="config.json", help="Provisioned firmware config.json")
+    parser.add_argument("--fleet", default="", help="Credentials file (fleet_simulator / bench format)")
+    parser.add_argument("--fleet-index", type=int, default=0, help="Device entry to use from --fleet")
+    parser.add_argument("--secret-key", default="", help="Server SECRET_KEY (default: $SECRET_KEY or .secrets)")
+    parser.add_argument("--server-url", default="", help="Override config server_url")
+    parser.add_argument("--server-port", type=int, default=0, help="Override config server_port")
+    parser.add_argument("--interval", type=int, default=0, help="Override read_interval_s")
+    parser.add_argument("--cycles", type=int, default=50, help="Telemetry cycles to run")
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="Virtual/real time ratio for sleeps (0 = do not sleep at all)")
+    parser.add_argument("--offline", action="store_true", help="Use an in-process fake API")
+    parser.add_argument("--no-sensors", action="store_true", help="DHT11 times out (simulated-data path)")
+    parser.add_argument("--wifi-drop-every", type=int, default=0, help="Drop Wi-Fi at every Nth cycle")
+    parser.add_argument("--wifi-outage", type=float, default=30.0, help="Seconds the access point stays down")
+    parser.add_argument("--no-logout", dest="logout", action="store_false", help="Keep the session at exit")
+    parser.add_argument("--quiet", action="store_true", help="Hide firmware print() output")
+    parser.add_argument("--verbose", action="store_true", help="Print one line per cycle")
+    parser.add_argument("--json-out", default="", help="Write the summary (with per-cycle data) as JSON")
+    return parser.parse_args(argv)
+
+
+def main() -> None:
+    args = parse_args()
+    summary = simulate(args)
+    print_summary(summary)
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(summary, indent=2))
+        print("[sim] Summary written to {}".format(args.json_out))
+
+
+if __name__ == "__main__":
+    main()
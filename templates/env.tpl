@@ -29,12 +29,57 @@ SECRET_KEY={{SECRET_KEY}}
 ALGORITHM=HS256
 ACCESS_TOKEN_EXPIRE_MINUTES=60
 
+# Argon2id (memoria en KiB); calibrar con: python -m benchmarks.argon2_calibrate
+ARGON2_MEMORY_COST=102400
+ARGON2_TIME_COST=2
+ARGON2_PARALLELISM=8
+
 # Aplicación
 APP_ENV=production
 TZ=America/Mexico_City
 
 # Registro de Logs
 LOGS_DIR=/var/log/fastapi
+LOG_LEVEL=INFO
+LOG_FORMAT=json
+LOG_SAMPLE_RATES=api.v1.routers.sensors.ingest=0.01
+READINGS_STORE_REQUEST_ID=true
+FLEET_MAX_DEVICES=100
+FLEET_QUERY_CONCURRENCY=8
+READINGS_CACHE_ENABLED=true
+READINGS_CACHE_TTL_S=300
+MEMBERSHIP_CACHE_TTL_S=300
+ANOMALY_JOB_ENABLED=true
+ANOMALY_JOB_INTERVAL_S=300
+ANOMALY_JOB_LOOKBACK_H=6
+ANOMALY_MIN_STD=temperature=1.0,humidity=1.0,battery=1.0
+ALERT_RULES_CHECK_S=5
+ALERT_MISSING_SWEEP_S=60
+ALERT_STATE_CHECKPOINT_S=5
+ALERT_GROUP_THRESHOLD=5
+ALERT_GROUP_WINDOW_S=60
+LIVE_STREAM_ENABLED=true
+LIVE_QUEUE_SIZE=100
+LIVE_MAX_SUBSCRIBERS=1000
+LIVE_HEARTBEAT_S=15
+LIVE_TICKET_TTL_S=30
+DEVICE_ONLINE_S=120
+DEVICE_OFFLINE_S=900
+DEVICE_STATUS_SWEEP_S=60
+
+# Diagnóstico de Rendimiento (umbrales de consultas lentas en ms)
+SLOW_QUERY_SQL_MS=100
+SLOW_QUERY_MONGO_MS=100
+LOOP_MONITOR_INTERVAL_MS=100
+LOOP_BLOCK_THRESHOLD_MS=250
+RUNTIME_SAMPLE_INTERVAL_S=60
+RUNTIME_TRACEMALLOC=false
 
 # URL de Base de Datos (construida)
-DATABASE_URL=mysql+pymysql://${MYSQL_USER}:${MYSQL_PASSWORD}@${MYSQL_HOST}:${MYSQL_PORT}/${MYSQL_DATABASE}
\ No newline at end of file
+DATABASE_URL=mysql+pymysql://${MYSQL_USER}:${MYSQL_PASSWORD}@${MYSQL_HOST}:${MYSQL_PORT}/${MYSQL_DATABASE}
+# Pools por worker: async (auth/usuarios/dispositivos, mysql+aiomysql) y síncrono (resto).
+# Conexiones máximas por worker = DB_POOL_SIZE + DB_MAX_OVERFLOW + DB_SYNC_POOL_SIZE + DB_SYNC_MAX_OVERFLOW
+DB_POOL_SIZE=3
+DB_MAX_OVERFLOW=2
+DB_SYNC_POOL_SIZE=5
+DB_SYNC_MAX_OVERFLOW=5
\ No newline at end of file
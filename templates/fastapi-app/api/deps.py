@@ -1,10 +1,13 @@
 """Dependencias de API - Autenticación y Autorización"""
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from typing import Union
 
-from database import get_db
+from database import get_async_db
 from models import User, Device, Admin, Manager, Role
 from models.permission import Permission
 from models.relationships import rol_permiso
@@ -15,13 +18,21 @@ from core.services import SessionService
 security = HTTPBearer()
 
 
-def get_current_user_or_device(
+async def _first(db: AsyncSession, statement):
+    """Primera fila de una consulta (equivalente a Query.first())"""
+    return (await db.execute(statement.limit(1))).scalars().first()
+
+
+async def get_current_user_or_device(
     credentials=Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Validar token JWT y verificar sesión activa en Redis.
-    Retorna dict con claves 'type' y 'data'.
+    Retorna dict con claves 'type', 'data' y 'session' (user_id, user_type, jti, exp).
+
+    La entidad se carga con AsyncSession junto con su rol y credencial
+    (joinedload), así los handlers no disparan cargas perezosas.
     """
     token = credentials.credentials
     credentials_exception = HTTPException(
@@ -58,45 +69,49 @@ def get_current_user_or_device(
             )
         
         # Verificar sesión en Redis
-        if not SessionService.verify_token_session(user_id_for_session, token_type, jti):
+        # Cliente Redis síncrono: en el threadpool para no bloquear el event loop
+        if not await run_in_threadpool(SessionService.verify_token_session, user_id_for_session, token_type, jti):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Sesión inválida o cerrada. Inicia sesión nuevamente.",
                 headers={"WWW-Authenticate": "Bearer"}
             )
         
+        # Datos de la sesión para revalidarla en conexiones largas (telemetría en vivo)
+        session = {"user_id": user_id_for_session, "user_type": token_type, "jti": jti, "exp": payload.get("exp")}
+        
         # Obtener entidad según tipo
         if token_type == "user":
-            user = db.query(User).filter(User.email == sub).first()
+            user = await _first(db, select(User).options(joinedload(User.pasusuario), joinedload(User.rol)).where(User.email == sub))
             if not user or not user.is_active:
                 raise credentials_exception
             if not user.pasusuario:
                 raise credentials_exception
-            return {"type": "user", "data": user}
+            return {"type": "user", "data": user, "session": session}
         
         elif token_type == "admin":
-            admin = db.query(Admin).filter(Admin.email == sub).first()
+            admin = await _first(db, select(Admin).options(joinedload(Admin.pasadmin), joinedload(Admin.rol)).where(Admin.email == sub))
             if not admin:
                 raise credentials_exception
             if not getattr(admin, "pasadmin", None):
                 raise credentials_exception
-            return {"type": "admin", "data": admin}
+            return {"type": "admin", "data": admin, "session": session}
         
         elif token_type == "manager":
-            manager = db.query(Manager).filter(Manager.email == sub).first()
+            manager = await _first(db, select(Manager).options(joinedload(Manager.pasgerente), joinedload(Manager.rol)).where(Manager.email == sub))
             if not manager:
                 raise credentials_exception
             if not getattr(manager, "pasgerente", None):
                 raise credentials_exception
-            return {"type": "manager", "data": manager}
+            return {"type": "manager", "data": manager, "session": session}
         
         elif token_type == "device":
-            device = db.query(Device).filter(Device.id == int(sub)).first()
+            device = await _first(db, select(Device).options(joinedload(Device.pasdispositivo)).where(Device.id == int(sub)))
             if not device or not device.is_active:
                 raise credentials_exception
             if not device.pasdispositivo:
                 raise credentials_exception
-            return {"type": "device", "data": device}
+            return {"type": "device", "data": device, "session": session}
         
         else:
             raise credentials_exception
@@ -107,25 +122,33 @@ def get_current_user_or_device(
         raise credentials_exception
 
 
-def get_current_user(credentials=Depends(security), db: Session = Depends(get_db)):
+async def get_current_user(credentials=Depends(security), db: AsyncSession = Depends(get_async_db)):
     """Obtener usuario autenticado actual"""
-    result = get_current_user_or_device(credentials=credentials, db=db)
+    result = await get_current_user_or_device(credentials=credentials, db=db)
     if result["type"] != "user":
         raise HTTPException(status_code=403, detail="Solo usuarios pueden acceder")
     return result["data"]
 
 
-def get_current_device(credentials=Depends(security), db: Session = Depends(get_db)):
+async def get_current_viewer(credentials=Depends(security), db: AsyncSession = Depends(get_async_db)):
+    """Usuario o gerente autenticado (consultas de lecturas de flota); retorna el dict de principal"""
+    result = await get_current_user_or_device(credentials=credentials, db=db)
+    if result["type"] not in ("user", "manager"):
+        raise HTTPException(status_code=403, detail="Solo usuarios o gerentes pueden acceder")
+    return result
+
+
+async def get_current_device(credentials=Depends(security), db: AsyncSession = Depends(get_async_db)):
     """Obtener dispositivo autenticado actual"""
-    result = get_current_user_or_device(credentials=credentials, db=db)
+    result = await get_current_user_or_device(credentials=credentials, db=db)
     if result["type"] != "device":
         raise HTTPException(status_code=403, detail="Solo dispositivos pueden acceder")
     return result["data"]
 
 
-def get_current_admin(credentials=Depends(security), db: Session = Depends(get_db)):
+async def get_current_admin(credentials=Depends(security), db: AsyncSession = Depends(get_async_db)):
     """Obtener administrador autenticado actual"""
-    result = get_current_user_or_device(credentials=credentials, db=db)
+    result = await get_current_user_or_device(credentials=credentials, db=db)
     if result["type"] != "admin":
         raise HTTPException(status_code=403, detail="Solo administradores pueden acceder")
     return result["data"]
@@ -133,7 +156,7 @@ def get_current_admin(credentials=Depends(security), db: Session = Depends(get_d
 
 def require_role(role_name: str):
     """Requerir rol específico"""
-    def role_checker(current_user=Depends(get_current_user)):
+    async def role_checker(current_user=Depends(get_current_user)):
         if not current_user.rol or current_user.rol.nombre != role_name:
             raise HTTPException(status_code=403, detail=f"Rol requerido: {role_name}")
         return current_user
@@ -142,9 +165,9 @@ def require_role(role_name: str):
 
 def require_permission(permission_name: str):
     """Requerir permiso específico"""
-    def permission_checker(
+    async def permission_checker(
         principal=Depends(get_current_user_or_device),
-        db: Session = Depends(get_db)
+        db: AsyncSession = Depends(get_async_db)
     ):
         principal_type = principal["type"]
         principal_obj = principal["data"]
@@ -156,11 +179,11 @@ def require_permission(permission_name: str):
         if not rol_id:
             raise HTTPException(status_code=403, detail="Sin rol asignado")
         
-        has_perm = (
-            db.query(Permission)
+        has_perm = await _first(
+            db,
+            select(Permission.id)
             .join(rol_permiso, rol_permiso.c.permiso_id == Permission.id)
-            .filter(rol_permiso.c.role_id == rol_id, Permission.name == permission_name)
-            .first()
+            .where(rol_permiso.c.role_id == rol_id, Permission.name == permission_name)
         )
         
         if not has_perm:
@@ -1,4 +1,4 @@
 """Paquete de Routers"""
-from . import auth, users, devices, sensors, alerts
+from . import auth, users, devices, sensors, services, alerts, live, diagnostics
 
-__all__ = ["auth", "users", "devices", "sensors", "alerts"]
+__all__ = ["auth", "users", "devices", "sensors", "services", "alerts", "live", "diagnostics"]
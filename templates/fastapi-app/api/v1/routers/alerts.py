@@ -1,28 +1,253 @@
 """
-Router de Alertas - Placeholder para implementación futura
+Router de Alertas - Consulta de alertas y gestión de reglas
+Alertas en la colección 'alerts' (reglas evaluadas en la ingesta y job de anomalías)
 """
-from fastapi import APIRouter
+import base64
+import binascii
+from datetime import datetime
+from typing import Any, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from database import get_db
+from database.mongo import get_alert_rules_collection, get_alerts_collection
+from api.deps import get_current_viewer, require_permission
+from core.alert_rules import RuleEngine, ensure_sensor_type, rule_to_dict, validate_rule
+from core.readings import timestamp_filter, to_utc_naive
+from core.service_membership import ServiceMembership
+from core.utils import ResponseFormatter
+from schemas.alert import AlertListResponse, AlertResponse, AlertRuleCreate, AlertRuleResponse
 
 router = APIRouter(tags=["Alerts"])
 
 
-@router.get("/")
-def list_alerts():
+def _object_id(value: str, label: str) -> ObjectId:
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"{label} no encontrada")
+
+
+def _encode_cursor(doc: dict) -> str:
+    ms = int((doc["timestamp"] - datetime(1970, 1, 1)).total_seconds() * 1000)
+    return base64.urlsafe_b64encode(f"{ms}:{doc['_id']}".encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> dict:
+    """Condición keyset: alertas posteriores al cursor en orden (timestamp, _id) descendente"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        ms, oid = raw.split(":", 1)
+        timestamp = datetime.utcfromtimestamp(int(ms) / 1000)
+        oid = ObjectId(oid)
+    except (ValueError, InvalidId, binascii.Error, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    return {"$or": [
+        {"timestamp": {"$lt": timestamp}},
+        {"timestamp": timestamp, "_id": {"$lt": oid}},
+    ]}
+
+
+def _alert_to_dict(doc: dict) -> dict:
+    result = {key: value for key, value in doc.items() if key != "_id"}
+    result["id"] = str(doc["_id"])
+    if "device_id" in doc:
+        result["device_id"] = int(doc["device_id"])
+    for field in ("device_ids", "active_device_ids"):
+        if field in doc:
+            result[field] = [int(device_id) for device_id in doc[field]]
+    return result
+
+
+def _alert_devices(doc: dict) -> set:
+    """Dispositivos de una alerta individual o agrupada"""
+    if "device_id" in doc:
+        return {int(doc["device_id"])}
+    return {int(device_id) for device_id in doc.get("device_ids", [])}
+
+
+def _manager_devices(db: Session, principal: dict) -> Optional[set]:
+    """Dispositivos visibles para un gerente; None para usuarios (sin restricción)"""
+    if principal["type"] != "manager":
+        return None
+    return set(ServiceMembership.manager(db, principal["data"].id))
+
+
+def _get_alert(db: Session, principal: dict, alert_id: str) -> dict:
+    doc = get_alerts_collection().find_one({"_id": _object_id(alert_id, "Alerta")})
+    allowed = _manager_devices(db, principal) if doc else None
+    if doc is None or (allowed is not None and not _alert_devices(doc) & allowed):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Alerta no encontrada")
+    return doc
+
+
+@router.get("/", response_model=AlertListResponse)
+def list_alerts(
+    device_id: Optional[int] = None,
+    service_id: Optional[int] = None,
+    sensor_type: Optional[str] = None,
+    severity: Optional[str] = None,
+    type: Optional[str] = Query(None, description="rule, rule_group, anomaly u offline"),
+    resolved: Optional[bool] = None,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    limit: int = Query(50, ge=1, le=200),
+    principal: dict = Depends(get_current_viewer),
+    db: Session = Depends(get_db)
+) -> Any:
     """
-    Listar alertas - Por implementar.
-    
-    Funcionalidad futura:
-    - Consultar alertas de MongoDB
-    - Filtrar por dispositivo, severidad, rango de fechas
-    - Marcar alertas como resueltas
+    Listar alertas, de la más reciente a la más antigua.
+
+    **Autenticación requerida:** JWT de Usuario/Gerente
+
+    Paginación por cursor: pasar `next_cursor` de la respuesta como `cursor`
+    para la página siguiente (null al llegar al final). Un gerente solo ve
+    alertas de los dispositivos de sus servicios.
+    """
+    if device_id is not None and service_id is not None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Indicar device_id o service_id, no ambos")
+    ensure_sensor_type(sensor_type)
+
+    allowed = _manager_devices(db, principal)
+    if service_id is not None:
+        entry = ServiceMembership.service(db, service_id)
+        if entry is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Servicio con ID {service_id} no encontrado")
+        scope = set(entry["devices"])
+    elif device_id is not None:
+        scope = {device_id}
+    else:
+        scope = None
+    if allowed is not None:
+        scope = allowed if scope is None else scope & allowed
+
+    query: dict = {}
+    if scope is not None:
+        devices = [str(d) for d in sorted(scope)]
+        query["$or"] = [{"device_id": {"$in": devices}}, {"device_ids": {"$in": devices}}]
+    for field, value in (("sensor_type", sensor_type), ("severity", severity), ("type", type), ("resolved", resolved)):
+        if value is not None:
+            query[field] = value
+    ts_filter = timestamp_filter(to_utc_naive(start_date), to_utc_naive(end_date))
+    if ts_filter:
+        query["timestamp"] = ts_filter
+    if cursor:
+        query = {"$and": [query, _decode_cursor(cursor)]}
+
+    docs = list(
+        get_alerts_collection()
+        .find(query)
+        .sort([("timestamp", -1), ("_id", -1)])
+        .limit(limit + 1)
+    )
+    next_cursor = _encode_cursor(docs[limit - 1]) if len(docs) > limit else None
+    alerts = [_alert_to_dict(doc) for doc in docs[:limit]]
+    return {"alerts_count": len(alerts), "next_cursor": next_cursor, "alerts": alerts}
+
+
+# =============================================================================
+# Reglas (antes de /{alert_id} para que "rules" no se tome como ID)
+# =============================================================================
+
+@router.get("/rules", response_model=List[AlertRuleResponse])
+def list_alert_rules(
+    current_principal=Depends(require_permission("view_reports"))
+) -> Any:
+    """Listar reglas de alerta"""
+    return [rule_to_dict(doc) for doc in get_alert_rules_collection().find().sort("created_at", 1)]
+
+
+@router.post("/rules", response_model=AlertRuleResponse, status_code=201)
+def create_alert_rule(
+    rule: AlertRuleCreate,
+    current_principal=Depends(require_permission("manage_alerts"))
+) -> Any:
+    """
+    Crear una regla de alerta (requiere permiso `manage_alerts`).
+
+    Todos los workers recompilan sus reglas en unos segundos
+    (ALERT_RULES_CHECK_S).
+    """
+    doc = rule.dict()
+    validate_rule(doc)
+    doc["created_at"] = datetime.utcnow()
+    doc["_id"] = get_alert_rules_collection().insert_one(doc).inserted_id
+    RuleEngine.invalidate()
+    return rule_to_dict(doc)
+
+
+@router.put("/rules/{rule_id}", response_model=AlertRuleResponse)
+def update_alert_rule(
+    rule_id: str,
+    rule: AlertRuleCreate,
+    current_principal=Depends(require_permission("manage_alerts"))
+) -> Any:
+    """Reemplazar una regla de alerta (requiere permiso `manage_alerts`)"""
+    doc = rule.dict()
+    validate_rule(doc)
+    doc["updated_at"] = datetime.utcnow()
+    updated = get_alert_rules_collection().find_one_and_update(
+        {"_id": _object_id(rule_id, "Regla")}, {"$set": doc}, return_document=True
+    )
+    if updated is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Regla no encontrada")
+    RuleEngine.invalidate()
+    return rule_to_dict(updated)
+
+
+@router.delete("/rules/{rule_id}")
+def delete_alert_rule(
+    rule_id: str,
+    current_principal=Depends(require_permission("manage_alerts"))
+):
+    """Eliminar una regla y resolver sus alertas abiertas (requiere permiso `manage_alerts`)"""
+    result = get_alert_rules_collection().delete_one({"_id": _object_id(rule_id, "Regla")})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Regla no encontrada")
+    get_alerts_collection().update_many(
+        {"rule_id": rule_id, "resolved": False},
+        {"$set": {"resolved": True, "resolved_at": datetime.utcnow(), "resolution": "rule_deleted"}}
+    )
+    RuleEngine.invalidate()
+    return ResponseFormatter.success({"rule_id": rule_id}, "Regla eliminada")
+
+
+# =============================================================================
+# Alerta individual
+# =============================================================================
+
+@router.get("/{alert_id}", response_model=AlertResponse)
+def get_alert(
+    alert_id: str,
+    principal: dict = Depends(get_current_viewer),
+    db: Session = Depends(get_db)
+) -> Any:
+    """Obtener una alerta por ID"""
+    return _alert_to_dict(_get_alert(db, principal, alert_id))
+
+
+@router.post("/{alert_id}/resolve", response_model=AlertResponse)
+def resolve_alert(
+    alert_id: str,
+    principal: dict = Depends(get_current_viewer),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Marcar una alerta como resuelta manualmente.
+
+    Si la condición de una regla sigue activa, el worker que la detectó no
+    abre una nueva alerta hasta que la condición se normalice y vuelva a
+    ocurrir.
     """
-    return {
-        "message": "Placeholder de endpoint de alertas",
-        "status": "no_implementado",
-        "future_features": [
-            "Listar alertas por dispositivo",
-            "Filtrar por severidad",
-            "Marcar como resuelta",
-            "Historial de alertas"
-        ]
-    }
+    doc = _get_alert(db, principal, alert_id)
+    if not doc.get("resolved"):
+        doc = get_alerts_collection().find_one_and_update(
+            {"_id": doc["_id"]},
+            {"$set": {"resolved": True, "resolved_at": datetime.utcnow(), "resolution": "manual"}},
+            return_document=True
+        )
+    return _alert_to_dict(doc)
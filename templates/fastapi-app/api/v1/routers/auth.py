@@ -1,9 +1,10 @@
 """Rutas de Autenticación - 4 tipos de login + logout + endpoints de prueba"""
 from fastapi import APIRouter, Depends, HTTPException, status, Header, Request
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import Any, Optional
 
-from database import get_db
+from database import get_async_db, get_db
 from schemas.auth import UserLogin, DeviceLogin, Token
 from models import User, Device, Admin, Manager
 from models.pas_dispositivo import PasDispositivo
@@ -23,15 +24,14 @@ router = APIRouter(tags=["Authentication"])
 @rate_limit(max_requests=10, time_window=300)
 @validate_email_decorator
 @sanitize_input_decorator
-@async_safe
-def login_user(form_data: UserLogin, request: Request, db: Session = Depends(get_db)) -> Any:
+async def login_user(form_data: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)) -> Any:
     """
     Login de usuario - autenticación por contraseña.
     
     SESION UNICA: Retorna 409 Conflict si ya hay sesión activa.
     Debe cerrar sesión primero usando POST /logout.
     """
-    return AuthService.auth_by_password(
+    return await AuthService.auth_by_password(
         User, "user", 
         form_data.email, 
         form_data.password, 
@@ -45,14 +45,13 @@ def login_user(form_data: UserLogin, request: Request, db: Session = Depends(get
 @rate_limit(max_requests=10, time_window=300)
 @validate_email_decorator
 @sanitize_input_decorator
-@async_safe
-def login_admin(form_data: UserLogin, request: Request, db: Session = Depends(get_db)) -> Any:
+async def login_admin(form_data: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)) -> Any:
     """
     Login de administrador - autenticación por contraseña.
     
     SESION UNICA: Retorna 409 Conflict si ya hay sesión activa.
     """
-    return AuthService.auth_by_password(
+    return await AuthService.auth_by_password(
         Admin, "admin", 
         form_data.email, 
         form_data.password, 
@@ -66,14 +65,13 @@ def login_admin(form_data: UserLogin, request: Request, db: Session = Depends(ge
 @rate_limit(max_requests=10, time_window=300)
 @validate_email_decorator
 @sanitize_input_decorator
-@async_safe
-def login_manager(form_data: UserLogin, request: Request, db: Session = Depends(get_db)) -> Any:
+async def login_manager(form_data: UserLogin, request: Request, db: AsyncSession = Depends(get_async_db)) -> Any:
     """
     Login de gerente - autenticación por contraseña.
     
     SESION UNICA: Retorna 409 Conflict si ya hay sesión activa.
     """
-    return AuthService.auth_by_password(
+    return await AuthService.auth_by_password(
         Manager, "manager", 
         form_data.email, 
         form_data.password, 
@@ -85,14 +83,13 @@ def login_manager(form_data: UserLogin, request: Request, db: Session = Depends(
 
 @router.post("/device/login", response_model=Token)
 @sanitize_input_decorator
-@async_safe
-def login_device(device: DeviceLogin, request: Request, db: Session = Depends(get_db)) -> Any:
+async def login_device(device: DeviceLogin, request: Request, db: AsyncSession = Depends(get_async_db)) -> Any:
     """
     Login de dispositivo - Autenticación por rompecabezas criptográfico.
     
     SESION UNICA: Retorna 409 Conflict si ya hay sesión activa.
     """
-    return AuthService.auth_by_puzzle_device(
+    return await AuthService.auth_by_puzzle_device(
         device.device_id, 
         device.api_key, 
         device.puzzle_response, 
@@ -1,22 +1,32 @@
 """Router de Dispositivos"""
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 import secrets
 
-from database import get_db
+from database import SessionLocal, get_async_db
 from api.deps import require_permission
+from core.config import settings
+from core.device_liveness import DeviceLiveness
+from core.listing import keyset_page, parse_fields, prefix_filter
+from core.service_membership import ServiceMembership
 from core.utils import ResponseFormatter
 from models import Device, PasDispositivo, Admin
-from schemas.device import DeviceCreate, DeviceResponse
+from schemas.device import DeviceCreate, DeviceResponse, DeviceStatusResponse
 
 router = APIRouter(tags=["Devices"])
 
+# Columnas seleccionables en el listado (sin credenciales)
+DEVICE_LIST_FIELDS = ("id", "nombre", "device_type", "is_active", "admin_id", "created_at", "updated_at")
+
 
 @router.post("/", response_model=None)
-def create_device(
+async def create_device(
     payload: DeviceCreate,
     current_admin=Depends(require_permission("create_device")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Crear un dispositivo IoT.
@@ -35,7 +45,7 @@ def create_device(
             detail="Solo admin_master puede crear dispositivos"
         )
     
-    admin = db.query(Admin).filter(Admin.id == payload.admin_id).first()
+    admin = await db.get(Admin, payload.admin_id)
     if not admin:
         return ResponseFormatter.error("Administrador no encontrado")
     
@@ -44,7 +54,7 @@ def create_device(
     pas = PasDispositivo()
     pas.encryption_key = secrets.token_bytes(32)  # 32 bytes para AES-256
     db.add(pas)
-    db.flush()
+    await db.flush()
 
     device = Device(
         nombre=payload.nombre,
@@ -54,8 +64,8 @@ def create_device(
         pasdispositivo_id=pas.id
     )
     db.add(device)
-    db.commit()
-    db.refresh(device)
+    await db.commit()
+    await db.refresh(device)
 
     # Incluir credenciales en la respuesta para que el admin pueda provisionar el ESP32.
     # Estas credenciales solo se muestran una vez (al crear el dispositivo).
@@ -71,23 +81,96 @@ def create_device(
 
 
 @router.get("/")
-def list_devices(
+async def list_devices(
+    device_type: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    admin_id: Optional[int] = None,
+    name_prefix: Optional[str] = Query(None, min_length=1, max_length=100, description="Prefijo de nombre"),
+    fields: Optional[str] = Query(None, description=f"Campos separados por comas: {', '.join(DEVICE_LIST_FIELDS)}"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    include_total: bool = Query(False, description="Incluir el total con los mismos filtros (COUNT adicional)"),
     current_admin=Depends(require_permission("view_reports")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Listar todos los dispositivos"""
-    devices = db.query(Device).all()
-    return ResponseFormatter.success(devices, "Dispositivos listados exitosamente")
+    """
+    Listar dispositivos, ordenados por id.
+
+    Paginación por cursor: pasar `next_cursor` de la respuesta como `cursor`
+    para la página siguiente (null al llegar al final). `fields` limita las
+    columnas devueltas (id siempre se incluye).
+    """
+    conditions = []
+    if device_type is not None:
+        conditions.append(Device.device_type == device_type)
+    if is_active is not None:
+        conditions.append(Device.is_active.is_(is_active))
+    if admin_id is not None:
+        conditions.append(Device.admin_id == admin_id)
+    if name_prefix:
+        conditions.append(prefix_filter(Device.nombre, name_prefix))
+    page = await keyset_page(
+        db, Device, parse_fields(fields, DEVICE_LIST_FIELDS), conditions, cursor, limit, include_total
+    )
+    return ResponseFormatter.success(page, "Dispositivos listados exitosamente")
+
+
+def _service_entry(service_id: int):
+    """Membresía del servicio (caché Redis o consulta síncrona), para ejecutar en el threadpool"""
+    db = SessionLocal()
+    try:
+        return ServiceMembership.service(db, service_id)
+    finally:
+        db.close()
+
+
+@router.get("/status", response_model=DeviceStatusResponse)
+async def get_devices_status(
+    service_id: Optional[int] = None,
+    limit: int = Query(100, ge=1, le=1000, description="Dispositivos listados por estado"),
+    offset: int = Query(0, ge=0),
+    current_admin=Depends(require_permission("view_reports")),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Dispositivos online / stale / offline según su última actividad.
+
+    Online: actividad (lectura o login) en los últimos DEVICE_ONLINE_S;
+    offline: sin actividad desde hace más de DEVICE_OFFLINE_S; stale: entre
+    ambos. Cada lista va de la actividad más reciente a la más antigua y se
+    pagina con `limit`/`offset`. `never_seen` cuenta los dispositivos que
+    nunca reportaron. Con `service_id` se limita a los dispositivos del
+    servicio.
+    """
+    try:
+        if service_id is not None:
+            entry = await run_in_threadpool(_service_entry, service_id)
+            if entry is None:
+                raise HTTPException(status_code=404, detail="Servicio no encontrado")
+            result = await run_in_threadpool(DeviceLiveness.scoped_status, entry["devices"], limit, offset)
+        else:
+            result = await run_in_threadpool(DeviceLiveness.fleet_status, limit, offset)
+            active = await db.scalar(select(func.count(Device.id)).where(Device.is_active.is_(True)))
+            result["never_seen"] = max(0, active - sum(result[s]["count"] for s in ("online", "stale", "offline")))
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Índice de actividad no disponible: {e}")
+    return {
+        "online_threshold_s": settings.DEVICE_ONLINE_S,
+        "offline_threshold_s": settings.DEVICE_OFFLINE_S,
+        **result
+    }
 
 
 @router.get("/{device_id}")
-def get_device(
+async def get_device(
     device_id: int,
     current_admin=Depends(require_permission("view_reports")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Obtener dispositivo por ID"""
-    device = db.query(Device).filter(Device.id == device_id).first()
+    device = await db.get(Device, device_id)
     if not device:
         raise HTTPException(status_code=404, detail="Dispositivo no encontrado")
     return ResponseFormatter.success(device, "Dispositivo obtenido exitosamente")
@@ -0,0 +1,238 @@
+"""
+Router de Diagnóstico - Herramientas de análisis de rendimiento en producción
+
+Todos los endpoints requieren el permiso `view_diagnostics`.
+Cada worker de uvicorn mantiene su propio estado: la respuesta incluye el
+PID del worker que atendió la solicitud.
+"""
+import asyncio
+import os
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from api.deps import require_permission
+from core.profiler import (
+    SamplingProfiler,
+    ProfilerManager,
+    ProfilerBusyError,
+    to_speedscope,
+    MAX_PROFILE_SECONDS,
+    MAX_PROFILE_REQUESTS,
+)
+from core.query_monitor import QueryStats
+from core.loop_monitor import LoopMonitor
+from core.runtime_stats import RuntimeStats
+from core.config import settings
+
+router = APIRouter(tags=["Diagnostics"])
+
+VALID_FORMATS = ["speedscope", "collapsed"]
+VALID_BACKENDS = ["sql", "mongo"]
+VALID_QUERY_ORDER = ["total_ms", "max_ms", "avg_ms", "count", "max_per_request", "slow_count", "rows"]
+
+
+def _validate_format(fmt: str) -> None:
+    if fmt not in VALID_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"format debe ser uno de: {', '.join(VALID_FORMATS)}"
+        )
+
+
+def _render(profilers, name: str, fmt: str):
+    if fmt == "collapsed":
+        return PlainTextResponse("".join(p.collapsed() for p in profilers))
+    return to_speedscope(profilers, name)
+
+
+@router.post("/profile")
+async def profile_worker(
+    seconds: float = 10,
+    interval_ms: float = 5,
+    format: str = "speedscope",
+    current_admin=Depends(require_permission("view_diagnostics"))
+):
+    """
+    Perfilar el worker completo durante N segundos.
+
+    Muestrea las pilas de todos los hilos (event loop y threadpool) y
+    devuelve un flamegraph en formato speedscope (abrir en speedscope.app)
+    o collapsed (flamegraph.pl).
+
+    **Parámetros:**
+    - seconds: Duración del muestreo (máx. 60)
+    - interval_ms: Intervalo entre muestras (default: 5 ms)
+    - format: speedscope | collapsed
+    """
+    _validate_format(format)
+    if seconds <= 0 or seconds > MAX_PROFILE_SECONDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"seconds debe estar entre 0 y {MAX_PROFILE_SECONDS}"
+        )
+
+    try:
+        ProfilerManager.acquire()
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    try:
+        profiler = SamplingProfiler(interval_ms=interval_ms, name=f"pid {os.getpid()}")
+        profiler.start()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+    finally:
+        ProfilerManager.release()
+
+    return _render([profiler], f"Worker {os.getpid()} - {seconds}s", format)
+
+
+@router.post("/profile/requests")
+def arm_request_profiling(
+    route: str,
+    count: int = 5,
+    interval_ms: float = 2,
+    current_admin=Depends(require_permission("view_diagnostics"))
+):
+    """
+    Perfilar las siguientes K solicitudes cuyo path empiece por `route`.
+
+    Ejemplo: route=/api/v1/auth/login&count=5
+
+    Consultar el resultado con GET /profile/requests.
+    """
+    if count < 1 or count > MAX_PROFILE_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"count debe estar entre 1 y {MAX_PROFILE_REQUESTS}"
+        )
+    if not route.startswith("/"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="route debe empezar con '/'")
+
+    try:
+        ProfilerManager.arm_requests(route, count, interval_ms)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+    return ProfilerManager.request_status()
+
+
+@router.get("/profile/requests")
+def get_request_profiles(
+    format: str = "speedscope",
+    current_admin=Depends(require_permission("view_diagnostics"))
+):
+    """
+    Obtener el estado o el resultado del perfilado por solicitudes.
+
+    Mientras la captura está en curso devuelve el estado (202).
+    """
+    _validate_format(format)
+    state = ProfilerManager.request_status()
+    captured = ProfilerManager.captured()
+
+    if state["armed"] or not captured:
+        return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=state)
+
+    return _render(captured, f"{len(captured)} solicitudes - pid {state['pid']}", format)
+
+
+@router.delete("/profile/requests", status_code=204)
+def cancel_request_profiling(current_admin=Depends(require_permission("view_diagnostics"))):
+    """Cancelar el perfilado por solicitudes en este worker"""
+    ProfilerManager.cancel_requests()
+
+
+@router.get("/queries")
+def get_query_stats(
+    limit: int = 20,
+    backend: str = None,
+    order_by: str = "total_ms",
+    current_admin=Depends(require_permission("view_diagnostics"))
+):
+    """
+    Resumen top-N de consultas SQL y MongoDB de este worker.
+
+    Cada entrada agrupa por huella normalizada: cantidad, tiempo total,
+    promedio y máximo, filas devueltas, consultas lentas, rutas de origen
+    y el máximo de repeticiones dentro de una misma solicitud
+    (`max_per_request` alto indica un patrón N+1).
+
+    **Parámetros:**
+    - backend: sql | mongo (default: ambos)
+    - order_by: total_ms, max_ms, avg_ms, count, max_per_request, slow_count, rows
+    """
+    if backend is not None and backend not in VALID_BACKENDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"backend debe ser uno de: {', '.join(VALID_BACKENDS)}"
+        )
+    if order_by not in VALID_QUERY_ORDER:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"order_by debe ser uno de: {', '.join(VALID_QUERY_ORDER)}"
+        )
+
+    result = QueryStats.top(limit=max(1, min(limit, 200)), backend=backend, order_by=order_by)
+    result["pid"] = os.getpid()
+    return result
+
+
+@router.delete("/queries", status_code=204)
+def reset_query_stats(current_admin=Depends(require_permission("view_diagnostics"))):
+    """Reiniciar estadísticas de consultas en este worker"""
+    QueryStats.reset()
+
+
+@router.get("/loop")
+def get_loop_blocks(
+    limit: int = 20,
+    current_admin=Depends(require_permission("view_diagnostics"))
+):
+    """
+    Bloqueos recientes del event loop en este worker.
+
+    Cada evento incluye el lag medido, la ruta y el request ID de la
+    solicitud en curso y la pila capturada durante el bloqueo.
+    """
+    result = LoopMonitor.status()
+    result["events"] = LoopMonitor.recent(max(1, min(limit, 50)))
+    return result
+
+
+@router.get("/runtime")
+def get_runtime_stats(
+    samples: int = 0,
+    top: int = 20,
+    current_admin=Depends(require_permission("view_diagnostics"))
+):
+    """
+    Recursos de este worker y detección de crecimiento sostenido.
+
+    Incluye la muestra actual (RSS, descriptores, sockets, hilos, threadpool,
+    objetos del GC, tracemalloc y estructuras internas), el análisis de
+    tendencia por métrica (`suspects` lista las que crecen en todas las
+    ventanas) y, con tracemalloc activo y línea base fijada, las líneas con
+    mayor crecimiento de memoria.
+
+    **Parámetros:**
+    - samples: Incluir las últimas N muestras del historial (default: 0)
+    - top: Líneas de tracemalloc a listar (máx. 100)
+    """
+    result = RuntimeStats.status()
+    if samples > 0:
+        result["samples"] = RuntimeStats.samples(min(samples, settings.RUNTIME_MAX_SAMPLES))
+    result["top_growth"] = RuntimeStats.top_growth(max(1, min(top, 100)))
+    return result
+
+
+@router.post("/runtime/baseline")
+def set_runtime_baseline(current_admin=Depends(require_permission("view_diagnostics"))):
+    """Fijar la instantánea de tracemalloc de este worker como línea base"""
+    try:
+        baseline_at = RuntimeStats.snapshot_baseline()
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return {"pid": os.getpid(), "baseline_at": baseline_at}
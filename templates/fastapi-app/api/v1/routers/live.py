@@ -0,0 +1,209 @@
+"""
+Router de Telemetría en Vivo - Lecturas por Server-Sent Events y WebSocket
+Alternativa al sondeo de GET /devices/{device_id}/readings
+"""
+import asyncio
+import time
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, get_db
+from api.deps import get_current_viewer
+from core.config import settings
+from core.live_stream import LiveHub, Subscriber
+from core.service_membership import ServiceMembership, resolve_fleet_scope
+from models import Manager, User
+
+router = APIRouter(tags=["Live"])
+
+# Código de cierre WebSocket por política (token inválido o alcance no permitido)
+WS_POLICY_VIOLATION = 1008
+
+
+def _live_scope(
+    db: Session,
+    principal: dict,
+    device_ids: Optional[List[str]],
+    service_id: Optional[int],
+    manager_id: Optional[int],
+) -> Optional[List[int]]:
+    """Dispositivos a seguir; None = toda la flota (solo usuarios, un gerente recibe sus servicios)"""
+    if device_ids is None and service_id is None and manager_id is None:
+        if principal["type"] == "manager":
+            return ServiceMembership.manager(db, principal["data"].id)
+        return None
+    return resolve_fleet_scope(db, principal, device_ids, service_id, manager_id, enforce_limit=False)
+
+
+async def _next_message(subscriber: Subscriber) -> Optional[str]:
+    """Siguiente mensaje de la cola; None si no llegó nada en LIVE_HEARTBEAT_S"""
+    try:
+        return await asyncio.wait_for(subscriber.queue.get(), timeout=settings.LIVE_HEARTBEAT_S)
+    except asyncio.TimeoutError:
+        return None
+
+
+class SessionCheck:
+    """Revalidar la sesión del stream cada LIVE_HEARTBEAT_S (también con tráfico continuo)"""
+
+    def __init__(self, session: dict):
+        self.session = session
+        self.next_check = time.monotonic() + settings.LIVE_HEARTBEAT_S
+
+    async def expired(self) -> bool:
+        now = time.monotonic()
+        if now < self.next_check:
+            return False
+        self.next_check = now + settings.LIVE_HEARTBEAT_S
+        # Cliente Redis síncrono: en un hilo para no bloquear el event loop
+        return not await asyncio.to_thread(LiveHub.session_active, self.session)
+
+
+async def _sse_events(devices: Optional[List[int]], session: dict):
+    subscriber = LiveHub.subscribe(devices)
+    check = SessionCheck(session)
+    try:
+        yield "retry: 3000\n\n"
+        while True:
+            payload = await _next_message(subscriber)
+            if await check.expired():
+                yield 'event: session_expired\ndata: {"type": "session_expired"}\n\n'
+                return
+            if payload is None:
+                yield ": ping\n\n"
+                continue
+            dropped = subscriber.take_dropped()
+            if dropped:
+                yield f'event: dropped\ndata: {{"type": "dropped", "count": {dropped}}}\n\n'
+            yield f"event: reading\ndata: {payload}\n\n"
+    finally:
+        LiveHub.unsubscribe(subscriber)
+
+
+@router.get("/readings")
+def stream_readings(
+    device_ids: Optional[List[str]] = Query(None, description="IDs separados por comas o parámetro repetido"),
+    service_id: Optional[int] = None,
+    manager_id: Optional[int] = None,
+    principal: dict = Depends(get_current_viewer),
+    db: Session = Depends(get_db)
+):
+    """
+    Recibir lecturas nuevas en vivo (Server-Sent Events).
+
+    **Autenticación requerida:** JWT de Usuario/Gerente
+
+    **Alcance (a lo sumo uno):** device_ids, service_id o manager_id; sin
+    ninguno, toda la flota (un gerente recibe los dispositivos de sus
+    servicios). Eventos: `reading` con `{device_id, readings}` por cada
+    POST /device/reading y `dropped` con la cantidad de mensajes descartados
+    si el cliente no consume a tiempo. Cada LIVE_HEARTBEAT_S sin lecturas
+    se envía un comentario `: ping`. Si la sesión se cierra o el token
+    expira, se envía `session_expired` y el stream termina.
+    """
+    LiveHub.ensure_capacity()
+    devices = _live_scope(db, principal, device_ids, service_id, manager_id)
+    # El stream puede durar horas: liberar la conexión MySQL antes de empezar
+    db.close()
+    return StreamingResponse(
+        _sse_events(devices, principal["session"]),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/ticket")
+def create_ws_ticket(principal: dict = Depends(get_current_viewer)):
+    """
+    Ticket de un solo uso para abrir GET /live/ws.
+
+    **Autenticación requerida:** JWT de Usuario/Gerente
+
+    El ticket vence a los LIVE_TICKET_TTL_S segundos y se invalida al
+    usarlo, así el JWT nunca viaja en la URL del WebSocket.
+    """
+    LiveHub.ensure_capacity()
+    return {"ticket": LiveHub.issue_ticket(principal), "expires_in": settings.LIVE_TICKET_TTL_S}
+
+
+def _authenticate_ws(
+    ticket: str, device_ids: Optional[List[str]], service_id: Optional[int], manager_id: Optional[int]
+):
+    """Canjear el ticket y resolver el alcance; devuelve (dispositivos, sesión)"""
+    data = LiveHub.redeem_ticket(ticket)
+    if data is None or not LiveHub.session_active(data["session"]):
+        raise HTTPException(status_code=401, detail="Ticket inválido o expirado")
+    model = User if data["type"] == "user" else Manager
+    db = SessionLocal()
+    try:
+        entity = db.get(model, data["id"])
+        if entity is None or not getattr(entity, "is_active", True):
+            raise HTTPException(status_code=401, detail="Ticket inválido o expirado")
+        principal = {"type": data["type"], "data": entity}
+        return _live_scope(db, principal, device_ids, service_id, manager_id), data["session"]
+    finally:
+        db.close()
+
+
+@router.websocket("/ws")
+async def websocket_readings(
+    websocket: WebSocket,
+    ticket: str = Query(..., description="Ticket de POST /live/ticket (un solo uso)"),
+    device_ids: Optional[List[str]] = Query(None),
+    service_id: Optional[int] = None,
+    manager_id: Optional[int] = None
+):
+    """
+    Recibir lecturas nuevas en vivo por WebSocket.
+
+    Mismo alcance y mensajes que GET /live/readings, como texto JSON con
+    `type` reading o dropped. Ticket inválido, alcance no permitido o
+    sesión cerrada/expirada durante el stream cierran la conexión con
+    código 1008.
+    """
+    try:
+        LiveHub.ensure_capacity()
+        devices, session = await run_in_threadpool(_authenticate_ws, ticket, device_ids, service_id, manager_id)
+    except HTTPException as e:
+        await websocket.close(code=WS_POLICY_VIOLATION, reason=str(e.detail)[:120])
+        return
+
+    await websocket.accept()
+    subscriber = LiveHub.subscribe(devices)
+    check = SessionCheck(session)
+
+    async def drain_client():
+        # Los mensajes del cliente se ignoran; sirve para detectar la desconexión
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+    receiver = asyncio.create_task(drain_client())
+    try:
+        while not receiver.done():
+            getter = asyncio.ensure_future(_next_message(subscriber))
+            await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                break
+            if await check.expired():
+                await websocket.close(code=WS_POLICY_VIOLATION, reason="Sesión cerrada o expirada")
+                break
+            payload = getter.result()
+            if payload is None:
+                continue
+            dropped = subscriber.take_dropped()
+            if dropped:
+                await websocket.send_text(f'{{"type": "dropped", "count": {dropped}}}')
+            await websocket.send_text(payload)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        LiveHub.unsubscribe(subscriber)
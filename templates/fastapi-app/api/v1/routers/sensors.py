@@ -2,24 +2,49 @@
 Router de Sensores - Gestión de Datos de Sensores IoT
 Endpoints para recibir y consultar lecturas de sensores (MongoDB)
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from sqlalchemy.orm import Session
-from typing import Any
-from datetime import datetime
+from typing import Any, List, Optional
+from datetime import datetime, timedelta
 
 from database import get_db
-from api.deps import get_current_device, get_current_user
+from api.deps import get_current_device, get_current_user, get_current_viewer
 from schemas.sensor import (
     SensorReading,
     SensorReadingResponse,
     SensorReadingsHistoryResponse,
-    SensorReadingItem
+    SensorReadingsAggregateResponse,
+    FleetReadingsResponse,
+    FleetLatestResponse,
+    FleetAggregateResponse,
+    FleetAnomaliesResponse
 )
 from models import Device, User
-from database.mongo import get_sensor_readings_collection
+from database.mongo import get_sensor_readings_collection, query_comment
+from core.config import settings
+from core.context import current_request_id
+from core import anomalies
+from core.alert_rules import RuleEngine
+from core.live_stream import LiveHub
+from core.device_liveness import DeviceLiveness
+from core.readings_cache import ReadingsCache
+from core.service_membership import resolve_fleet_scope
+from core.readings import (
+    aggregate_devices_readings,
+    aggregate_readings,
+    fetch_devices_readings,
+    find_readings,
+    latest_readings,
+    reading_rows,
+    readings_filter,
+    to_utc_naive,
+    validate_sensor_type
+)
 import logging
 
 logger = logging.getLogger(__name__)
+# Logger de ingesta exitosa: muestreado por LOG_SAMPLE_RATES (ruta caliente)
+ingest_logger = logging.getLogger(f"{__name__}.ingest")
 
 router = APIRouter(tags=["Sensors"])
 
@@ -39,6 +64,8 @@ def send_sensor_readings(
     1. Valida que device_id del body coincida con el token
     2. Normaliza lecturas (1 documento por tipo de sensor)
     3. Inserta en colección 'sensor_readings' de MongoDB
+    4. Evalúa las reglas de alerta (solo los cambios de estado escriben en 'alerts')
+    5. Publica el lote para los suscriptores en vivo (/live/readings)
     
     **Normalización:**
     - temperature → documento tipo "temperature"
@@ -94,15 +121,24 @@ def send_sensor_readings(
             "timestamp": timestamp
         })
     
+    request_id = current_request_id()
+    if request_id and settings.READINGS_STORE_REQUEST_ID:
+        for document in documents:
+            document["request_id"] = request_id
+    
     try:
         collection = get_sensor_readings_collection()
-        result = collection.insert_many(documents)
+        result = collection.insert_many(documents, **query_comment())
         
         inserted_ids = [str(oid) for oid in result.inserted_ids]
+        ReadingsCache.mark_ingest(reading.device_id)
+        DeviceLiveness.touch(reading.device_id)
+        RuleEngine.evaluate(reading.device_id, documents)
+        LiveHub.publish(reading.device_id, documents)
         
-        logger.info(
-            f"Dispositivo {reading.device_id} envio {len(documents)} lecturas. "
-            f"IDs: {inserted_ids[:3]}..."
+        ingest_logger.info(
+            "Dispositivo %s envio %d lecturas. IDs: %s...",
+            reading.device_id, len(documents), inserted_ids[:3]
         )
         
         return SensorReadingResponse(
@@ -114,7 +150,7 @@ def send_sensor_readings(
         )
         
     except Exception as e:
-        logger.error(f"Error al insertar lecturas en MongoDB: {e}")
+        logger.error("Error al insertar lecturas en MongoDB: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al guardar lecturas: {str(e)}"
@@ -123,6 +159,7 @@ def send_sensor_readings(
 
 @router.get("/devices/{device_id}/readings", response_model=SensorReadingsHistoryResponse)
 def get_device_readings(
+    request: Request,
     device_id: int,
     sensor_type: str = None,
     start_date: datetime = None,
@@ -141,6 +178,9 @@ def get_device_readings(
     - start_date: Fecha de inicio (ISO 8601)
     - end_date: Fecha de fin (ISO 8601)
     - limit: Máximo de registros (default: 100, max: 1000)
+    
+    Responde con ETag/Last-Modified; con If-None-Match vigente devuelve 304
+    sin consultar MongoDB.
     """
     
     device = db.query(Device).filter(Device.id == device_id).first()
@@ -150,56 +190,362 @@ def get_device_readings(
             detail=f"Dispositivo con ID {device_id} no encontrado"
         )
     
-    if limit > 1000:
-        limit = 1000
+    limit = max(1, min(limit, 1000))
     
-    query_filter = {"device_id": str(device_id)}
+    validate_sensor_type(sensor_type)
+    start_date, end_date = to_utc_naive(start_date), to_utc_naive(end_date)
     
-    if sensor_type:
-        valid_types = ["temperature", "humidity", "battery"]
-        if sensor_type not in valid_types:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"sensor_type debe ser uno de: {', '.join(valid_types)}"
-            )
-        query_filter["sensor_type"] = sensor_type
+    cached, validators = ReadingsCache.lookup(request, [device_id], {
+        "sensor_type": sensor_type, "start_date": start_date, "end_date": end_date, "limit": limit
+    })
+    if cached is not None:
+        return cached
     
-    if start_date or end_date:
-        query_filter["timestamp"] = {}
-        if start_date:
-            query_filter["timestamp"]["$gte"] = start_date
-        if end_date:
-            query_filter["timestamp"]["$lte"] = end_date
+    query_filter = readings_filter(device_id, sensor_type, start_date, end_date)
     
     try:
         collection = get_sensor_readings_collection()
-        
-        cursor = collection.find(query_filter).sort("timestamp", -1).limit(limit)
-        
-        readings = []
-        for doc in cursor:
-            readings.append(SensorReadingItem(
-                sensor_type=doc.get("sensor_type"),
-                value=doc.get("value"),
-                unit=doc.get("unit"),
-                location=doc.get("location"),
-                timestamp=doc.get("timestamp")
-            ))
+        readings = reading_rows(find_readings(collection, query_filter, limit))
         
         logger.info(
-            f"Usuario {current_user.id} consulto {len(readings)} lecturas "
-            f"para dispositivo {device_id}"
+            "Usuario %s consulto %d lecturas para dispositivo %s",
+            current_user.id, len(readings), device_id
         )
         
-        return SensorReadingsHistoryResponse(
-            device_id=device_id,
-            readings_count=len(readings),
-            readings=readings
-        )
+        # Serialización directa con orjson (mismo formato que SensorReadingsHistoryResponse)
+        payload = {
+            "device_id": device_id,
+            "readings_count": len(readings),
+            "readings": readings
+        }
         
     except Exception as e:
-        logger.error(f"Error al consultar lecturas en MongoDB: {e}")
+        logger.error("Error al consultar lecturas en MongoDB: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al consultar lecturas: {str(e)}"
+        )
+    
+    return ReadingsCache.respond(payload, validators)
+
+
+@router.get("/devices/{device_id}/readings/aggregate", response_model=SensorReadingsAggregateResponse)
+def get_device_readings_aggregate(
+    request: Request,
+    device_id: int,
+    sensor_type: str,
+    bucket: str = "1h",
+    start_date: datetime = None,
+    end_date: datetime = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Estadísticas de lecturas por ventana de tiempo, calculadas en MongoDB.
+    
+    **Autenticación requerida:** JWT de Usuario/Admin/Gerente
+    
+    Cada ventana incluye count, min, max, mean, stddev (poblacional), p50 y
+    p95 (aproximados). Las ventanas sin lecturas se omiten.
+    
+    **Parámetros de consulta:**
+    - sensor_type: temperature, humidity o battery
+    - bucket: Tamaño de ventana <n><unidad>, unidad s, m, h, d o w (default: 1h)
+    - start_date: Fecha de inicio (ISO 8601, default: end_date - 24h)
+    - end_date: Fecha de fin (ISO 8601, default: ahora, redondeado al minuto siguiente)
+    
+    Responde con ETag/Last-Modified; con If-None-Match vigente devuelve 304
+    sin consultar MongoDB.
+    """
+    device = db.query(Device).filter(Device.id == device_id).first()
+    if not device:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Dispositivo con ID {device_id} no encontrado"
+        )
+    
+    validate_sensor_type(sensor_type)
+    # Ventana abierta alineada al minuto: el ETag se mantiene entre refrescos cercanos
+    end_date = to_utc_naive(end_date) or datetime.utcnow().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    start_date = to_utc_naive(start_date) or end_date - timedelta(hours=24)
+    
+    cached, validators = ReadingsCache.lookup(request, [device_id], {
+        "sensor_type": sensor_type, "bucket": bucket, "start_date": start_date, "end_date": end_date
+    })
+    if cached is not None:
+        return cached
+    
+    try:
+        buckets = aggregate_readings(device_id, sensor_type, bucket, start_date, end_date)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error al agregar lecturas en MongoDB: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al agregar lecturas: {str(e)}"
+        )
+    
+    return ReadingsCache.respond({
+        "device_id": device_id,
+        "sensor_type": sensor_type,
+        "bucket": bucket,
+        "start_date": start_date,
+        "end_date": end_date,
+        "buckets_count": len(buckets),
+        "buckets": buckets
+    }, validators)
+
+
+@router.get("/fleet/readings", response_model=FleetReadingsResponse)
+def get_fleet_readings(
+    request: Request,
+    device_ids: Optional[List[str]] = Query(None, description="IDs separados por comas o parámetro repetido"),
+    service_id: Optional[int] = None,
+    manager_id: Optional[int] = None,
+    sensor_type: str = None,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    limit: int = 100,
+    principal: dict = Depends(get_current_viewer),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Consultar historial de varios dispositivos en una sola solicitud.
+    
+    **Autenticación requerida:** JWT de Usuario/Gerente
+    
+    Los dispositivos se resuelven con una sola consulta SQL (o desde la caché
+    de membresía) y las lecturas se obtienen con un cursor por dispositivo en
+    paralelo. Resultados agrupados por dispositivo.
+    
+    **Alcance (exactamente uno):** device_ids (ej. 1,2,3), service_id o
+    manager_id (todos los servicios del gerente). Máximo FLEET_MAX_DEVICES
+    dispositivos; un gerente solo consulta sus propios servicios.
+    
+    **Parámetros de consulta:**
+    - sensor_type: Filtrar por tipo (temperature, humidity, battery)
+    - start_date / end_date: Rango de fechas (ISO 8601)
+    - limit: Máximo de registros por dispositivo (default: 100, max: 1000)
+    
+    El ETag combina las marcas de ingesta de todos los dispositivos.
+    """
+    ids = resolve_fleet_scope(db, principal, device_ids, service_id, manager_id)
+    validate_sensor_type(sensor_type)
+    limit = max(1, min(limit, 1000))
+    
+    start_date, end_date = to_utc_naive(start_date), to_utc_naive(end_date)
+    cached, validators = ReadingsCache.lookup(request, ids, {
+        "sensor_type": sensor_type, "start_date": start_date, "end_date": end_date, "limit": limit
+    })
+    if cached is not None:
+        return cached
+    
+    try:
+        results = fetch_devices_readings(ids, sensor_type, start_date, end_date, limit)
+    except Exception as e:
+        logger.error("Error al consultar lecturas de flota en MongoDB: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error al consultar lecturas: {str(e)}"
         )
+    
+    devices = [
+        {"device_id": device_id, "readings_count": len(results[device_id]), "readings": results[device_id]}
+        for device_id in ids
+    ]
+    
+    logger.info(
+        "%s %s consulto lecturas de %d dispositivos",
+        principal["type"], principal["data"].id, len(ids)
+    )
+    
+    return ReadingsCache.respond({
+        "devices_count": len(devices),
+        "readings_count": sum(d["readings_count"] for d in devices),
+        "devices": devices
+    }, validators)
+
+
+@router.get("/fleet/readings/latest", response_model=FleetLatestResponse)
+def get_fleet_latest_readings(
+    request: Request,
+    device_ids: Optional[List[str]] = Query(None, description="IDs separados por comas o parámetro repetido"),
+    service_id: Optional[int] = None,
+    manager_id: Optional[int] = None,
+    sensor_type: str = None,
+    principal: dict = Depends(get_current_viewer),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Último valor de cada tipo de sensor de varios dispositivos (tablero).
+    
+    **Autenticación requerida:** JWT de Usuario/Gerente
+    
+    Una sola agregación en MongoDB para todo el alcance. Los dispositivos sin
+    lecturas aparecen con `sensors` vacío.
+    
+    **Alcance (exactamente uno):** device_ids (ej. 1,2,3), service_id o
+    manager_id (todos los servicios del gerente). Máximo FLEET_MAX_DEVICES
+    dispositivos; un gerente solo consulta sus propios servicios.
+    
+    **Parámetros de consulta:**
+    - sensor_type: Limitar a un tipo (temperature, humidity, battery)
+    """
+    ids = resolve_fleet_scope(db, principal, device_ids, service_id, manager_id)
+    validate_sensor_type(sensor_type)
+    
+    cached, validators = ReadingsCache.lookup(request, ids, {"sensor_type": sensor_type})
+    if cached is not None:
+        return cached
+    
+    try:
+        latest = latest_readings(ids, sensor_type)
+    except Exception as e:
+        logger.error("Error al consultar últimas lecturas en MongoDB: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al consultar lecturas: {str(e)}"
+        )
+    
+    return ReadingsCache.respond({
+        "devices_count": len(ids),
+        "devices": [{"device_id": device_id, "sensors": latest[device_id]} for device_id in ids]
+    }, validators)
+
+
+@router.get("/fleet/readings/aggregate", response_model=FleetAggregateResponse)
+def get_fleet_readings_aggregate(
+    request: Request,
+    sensor_type: str,
+    device_ids: Optional[List[str]] = Query(None, description="IDs separados por comas o parámetro repetido"),
+    service_id: Optional[int] = None,
+    manager_id: Optional[int] = None,
+    bucket: str = "1h",
+    start_date: datetime = None,
+    end_date: datetime = None,
+    principal: dict = Depends(get_current_viewer),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Estadísticas por ventana de varios dispositivos en una sola agregación.
+    
+    **Autenticación requerida:** JWT de Usuario/Gerente
+    
+    Mismos parámetros y estadísticas que /devices/{device_id}/readings/aggregate,
+    agrupadas por dispositivo.
+    
+    **Alcance (exactamente uno):** device_ids (ej. 1,2,3), service_id o
+    manager_id (todos los servicios del gerente). Máximo FLEET_MAX_DEVICES
+    dispositivos; un gerente solo consulta sus propios servicios.
+    """
+    ids = resolve_fleet_scope(db, principal, device_ids, service_id, manager_id)
+    validate_sensor_type(sensor_type)
+    end_date = to_utc_naive(end_date) or datetime.utcnow().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    start_date = to_utc_naive(start_date) or end_date - timedelta(hours=24)
+    
+    cached, validators = ReadingsCache.lookup(request, ids, {
+        "sensor_type": sensor_type, "bucket": bucket, "start_date": start_date, "end_date": end_date
+    })
+    if cached is not None:
+        return cached
+    
+    try:
+        results = aggregate_devices_readings(ids, sensor_type, bucket, start_date, end_date)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Error al agregar lecturas de flota en MongoDB: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al agregar lecturas: {str(e)}"
+        )
+    
+    return ReadingsCache.respond({
+        "sensor_type": sensor_type,
+        "bucket": bucket,
+        "start_date": start_date,
+        "end_date": end_date,
+        "devices_count": len(ids),
+        "devices": [
+            {"device_id": device_id, "buckets_count": len(results[device_id]), "buckets": results[device_id]}
+            for device_id in ids
+        ]
+    }, validators)
+
+
+@router.get("/fleet/readings/anomalies", response_model=FleetAnomaliesResponse)
+def get_fleet_readings_anomalies(
+    request: Request,
+    sensor_type: str,
+    device_ids: Optional[List[str]] = Query(None, description="IDs separados por comas o parámetro repetido"),
+    service_id: Optional[int] = None,
+    manager_id: Optional[int] = None,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    window: int = Query(anomalies.ZSCORE_WINDOW, ge=2, le=10000),
+    z_threshold: float = Query(anomalies.ZSCORE_THRESHOLD, gt=0),
+    alpha: float = Query(anomalies.EWMA_ALPHA, gt=0, lt=1),
+    ewma_threshold: float = Query(anomalies.EWMA_THRESHOLD, gt=0),
+    stuck_min_run: int = Query(anomalies.STUCK_MIN_RUN, ge=2),
+    principal: dict = Depends(get_current_viewer),
+    db: Session = Depends(get_db)
+) -> Any:
+    """
+    Detectar anomalías en el historial de varios dispositivos (NumPy, vectorizado).
+    
+    **Autenticación requerida:** JWT de Usuario/Gerente
+    
+    Métodos: `zscore` (contra los `window` puntos anteriores), `ewma`
+    (desviación respecto a la media exponencial con factor `alpha`) y `stuck`
+    (al menos `stuck_min_run` valores idénticos seguidos; solo temperature y
+    humidity). Rango por defecto: últimas 24 horas; se analizan hasta 20000
+    puntos por dispositivo.
+    
+    **Alcance (exactamente uno):** device_ids (ej. 1,2,3), service_id o
+    manager_id (todos los servicios del gerente). Máximo FLEET_MAX_DEVICES
+    dispositivos; un gerente solo consulta sus propios servicios.
+    """
+    ids = resolve_fleet_scope(db, principal, device_ids, service_id, manager_id)
+    validate_sensor_type(sensor_type)
+    end_date = to_utc_naive(end_date) or datetime.utcnow().replace(second=0, microsecond=0) + timedelta(minutes=1)
+    start_date = to_utc_naive(start_date) or end_date - timedelta(hours=24)
+    if end_date <= start_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_date debe ser posterior a start_date")
+    
+    cached, validators = ReadingsCache.lookup(request, ids, {
+        "sensor_type": sensor_type, "start_date": start_date, "end_date": end_date, "window": window,
+        "z_threshold": z_threshold, "alpha": alpha, "ewma_threshold": ewma_threshold, "stuck_min_run": stuck_min_run
+    })
+    if cached is not None:
+        return cached
+    
+    try:
+        series = anomalies.load_series(ids, sensor_type, start_date, end_date)
+        found = anomalies.detect_anomalies(
+            series, sensor_type, window, z_threshold, alpha, ewma_threshold, stuck_min_run
+        )
+    except Exception as e:
+        logger.error("Error al detectar anomalías: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error al detectar anomalías: {str(e)}"
+        )
+    
+    devices = [
+        {
+            "device_id": device_id,
+            "points_analyzed": int(series["lengths"][row]),
+            "anomalies_count": len(found[device_id]),
+            "anomalies": found[device_id]
+        }
+        for row, device_id in enumerate(ids)
+    ]
+    return ReadingsCache.respond({
+        "sensor_type": sensor_type,
+        "start_date": start_date,
+        "end_date": end_date,
+        "devices_count": len(devices),
+        "anomalies_count": sum(d["anomalies_count"] for d in devices),
+        "devices": devices
+    }, validators)
@@ -0,0 +1,77 @@
+"""Router de Servicios - Asignación de dispositivos"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from database import get_db
+from api.deps import require_permission
+from core.service_membership import ServiceMembership
+from core.utils import ResponseFormatter
+from models import Device, Service
+
+router = APIRouter(tags=["Services"])
+
+
+def _get_service_and_device(db: Session, service_id: int, device_id: int):
+    service = db.query(Service).filter(Service.id == service_id).first()
+    if not service:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Servicio no encontrado")
+    device = db.query(Device).filter(Device.id == device_id).first()
+    if not device:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Dispositivo no encontrado")
+    return service, device
+
+
+@router.get("/{service_id}/devices")
+def list_service_devices(
+    service_id: int,
+    current_principal=Depends(require_permission("view_reports")),
+    db: Session = Depends(get_db)
+):
+    """Listar IDs de dispositivos asignados al servicio"""
+    entry = ServiceMembership.service(db, service_id)
+    if entry is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Servicio no encontrado")
+    return ResponseFormatter.success(
+        {"service_id": service_id, "gerente_id": entry["gerente_id"], "device_ids": entry["devices"]},
+        "Dispositivos del servicio listados exitosamente"
+    )
+
+
+@router.put("/{service_id}/devices/{device_id}")
+def assign_device(
+    service_id: int,
+    device_id: int,
+    current_principal=Depends(require_permission("assign_device")),
+    db: Session = Depends(get_db)
+):
+    """
+    Asignar un dispositivo a un servicio.
+
+    Requiere permiso `assign_device`. Al confirmar se invalida la caché de
+    membresía usada por las consultas de lecturas por servicio/gerente.
+    """
+    service, device = _get_service_and_device(db, service_id, device_id)
+    if device not in service.dispositivos:
+        service.dispositivos.append(device)
+        db.commit()
+    return ResponseFormatter.success(
+        {"service_id": service_id, "device_id": device_id}, "Dispositivo asignado al servicio"
+    )
+
+
+@router.delete("/{service_id}/devices/{device_id}")
+def unassign_device(
+    service_id: int,
+    device_id: int,
+    current_principal=Depends(require_permission("assign_device")),
+    db: Session = Depends(get_db)
+):
+    """Quitar un dispositivo de un servicio (requiere permiso `assign_device`)"""
+    service, device = _get_service_and_device(db, service_id, device_id)
+    if device not in service.dispositivos:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="El dispositivo no está asignado al servicio")
+    service.dispositivos.remove(device)
+    db.commit()
+    return ResponseFormatter.success(
+        {"service_id": service_id, "device_id": device_id}, "Dispositivo quitado del servicio"
+    )
@@ -1,46 +1,69 @@
 """Router de Usuarios"""
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
-from database import get_db
+from database import get_async_db
 from api.deps import get_current_user, require_permission
 from schemas.user import UserCreate, UserResponse, ManagerCreate, ManagerResponse
 from models import User, Role, PasUsuario, Manager, PasGerente, Admin
 from core.security import get_password_hash
-from core.decorators import validate_email_decorator, sanitize_input_decorator, async_safe, validate_password_decorator
+from core.decorators import validate_email_decorator, sanitize_input_decorator, validate_password_decorator
+from core.listing import keyset_page, parse_fields, prefix_filter
 from core.utils import ResponseFormatter
 
 router = APIRouter(tags=["Users"])
 
+# Columnas seleccionables en el listado (sin credenciales)
+USER_LIST_FIELDS = ("id", "nombre", "email", "is_active", "rol_id", "created_at", "updated_at")
+
 
 @router.get("/me")
-@async_safe
-def read_users_me(current_user=Depends(get_current_user)):
+async def read_users_me(current_user=Depends(get_current_user)):
     """Obtener perfil del usuario actual"""
     return ResponseFormatter.success(current_user, "Perfil obtenido exitosamente")
 
 
 @router.get("/")
-@async_safe
-def list_users(
+async def list_users(
+    is_active: Optional[bool] = None,
+    rol_id: Optional[int] = None,
+    name_prefix: Optional[str] = Query(None, min_length=1, max_length=50, description="Prefijo de nombre"),
+    fields: Optional[str] = Query(None, description=f"Campos separados por comas: {', '.join(USER_LIST_FIELDS)}"),
+    cursor: Optional[str] = Query(None, description="next_cursor de la página anterior"),
+    limit: int = Query(100, ge=1, le=1000),
+    include_total: bool = Query(False, description="Incluir el total con los mismos filtros (COUNT adicional)"),
     current_user=Depends(require_permission("view_all_users")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Listar todos los usuarios (requiere permiso view_all_users)"""
-    users = db.query(User).all()
-    return ResponseFormatter.success(users, "Usuarios listados exitosamente")
+    """
+    Listar usuarios, ordenados por id (requiere permiso view_all_users).
+
+    Misma paginación por cursor y selección de campos que GET /devices.
+    """
+    conditions = []
+    if is_active is not None:
+        conditions.append(User.is_active.is_(is_active))
+    if rol_id is not None:
+        conditions.append(User.rol_id == rol_id)
+    if name_prefix:
+        conditions.append(prefix_filter(User.nombre, name_prefix))
+    page = await keyset_page(
+        db, User, parse_fields(fields, USER_LIST_FIELDS), conditions, cursor, limit, include_total
+    )
+    return ResponseFormatter.success(page, "Usuarios listados exitosamente")
 
 
 @router.post("/")
 @validate_email_decorator
 @validate_password_decorator
 @sanitize_input_decorator
-@async_safe
-def create_user(
+async def create_user(
     user: UserCreate,
     current_user=Depends(require_permission("create_user")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Crear un nuevo usuario.
@@ -49,17 +72,18 @@ def create_user(
     
     La contraseña se hashea con **Argon2**.
     """
-    if db.query(User).filter(User.email == user.email).first():
+    if (await db.execute(select(User.id).where(User.email == user.email).limit(1))).first():
         return ResponseFormatter.error("Email ya registrado")
     
-    role = db.query(Role).filter(Role.id == user.rol_id).first()
+    role = await db.get(Role, user.rol_id)
     if not role:
         return ResponseFormatter.error("Rol no encontrado")
     
-    hashed_password = get_password_hash(user.password)
+    # Argon2 fuera del event loop
+    hashed_password = await run_in_threadpool(get_password_hash, user.password)
     new_pasusuario = PasUsuario(hashed_password=hashed_password)
     db.add(new_pasusuario)
-    db.flush()
+    await db.flush()
     
     new_user = User(
         nombre=user.nombre,
@@ -69,8 +93,8 @@ def create_user(
         pasusuario_id=new_pasusuario.id
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     
     return ResponseFormatter.success(new_user, "Usuario creado exitosamente con Argon2")
 
@@ -79,11 +103,10 @@ def create_user(
 @validate_email_decorator
 @validate_password_decorator
 @sanitize_input_decorator
-@async_safe
-def create_manager(
+async def create_manager(
     manager: ManagerCreate,
     current_user=Depends(require_permission("create_manager")),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Crear un nuevo gerente.
@@ -92,19 +115,21 @@ def create_manager(
     
     La contraseña se hashea con **Argon2**.
     """
-    if db.query(Manager).filter(Manager.email == manager.email).first():
+    if (await db.execute(select(Manager.id).where(Manager.email == manager.email).limit(1))).first():
         return ResponseFormatter.error("Email ya registrado para gerente")
     
-    admin = db.query(Admin).filter(Admin.id == manager.admin_id).first()
+    admin = await db.get(Admin, manager.admin_id)
     if not admin:
         return ResponseFormatter.error("Administrador no encontrado")
     
-    hashed_password = get_password_hash(manager.password)
+    hashed_password = await run_in_threadpool(get_password_hash, manager.password)
     new_pasgerente = PasGerente(hashed_password=hashed_password)
     db.add(new_pasgerente)
-    db.flush()
+    await db.flush()
     
-    default_manager_role = db.query(Role).filter(Role.nombre == 'manager').first()
+    default_manager_role = (
+        await db.execute(select(Role).where(Role.nombre == 'manager').limit(1))
+    ).scalars().first()
     
     new_manager = Manager(
         nombre=manager.nombre,
@@ -116,7 +141,7 @@ def create_manager(
         new_manager.rol_id = default_manager_role.id
     
     db.add(new_manager)
-    db.commit()
-    db.refresh(new_manager)
+    await db.commit()
+    await db.refresh(new_manager)
     
     return ResponseFormatter.success(new_manager, "Gerente creado exitosamente con Argon2")
@@ -2,14 +2,27 @@
 Plataforma IoT - Aplicación Principal
 FastAPI con MongoDB para datos de sensores
 """
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import PlainTextResponse
 from contextlib import asynccontextmanager
-from api.v1.routers import auth, users, devices, sensors, alerts
+from api.v1.routers import auth, users, devices, sensors, services, alerts, live, diagnostics
+from database import async_engine
 from database.mongo import MongoDBManager, create_indexes
+from core.config import settings
+from core.profiler import ProfilerMiddleware
+from core.context import RequestContextMiddleware
+from core.metrics import REGISTRY, OPENMETRICS_CONTENT_TYPE, PROMETHEUS_CONTENT_TYPE
+from core.logging_config import setup_logging, shutdown_logging
+from core.loop_monitor import LoopMonitor
+from core.runtime_stats import RuntimeStats
+from core.anomalies import AnomalyJob
+from core.alert_rules import RuleEngine
+from core.live_stream import LiveHub
+from core.device_liveness import DeviceLiveness
 import logging
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
 
@@ -19,8 +32,17 @@ async def lifespan(app: FastAPI):
     # Inicio
     try:
         logger.info("Iniciando aplicacion...")
+        if settings.APP_PROFILE == "bench":
+            from database.seed import init_bench_database
+            init_bench_database()
         MongoDBManager.get_client()
         create_indexes()
+        LoopMonitor.start()
+        RuntimeStats.start()
+        AnomalyJob.start()
+        RuleEngine.start()
+        LiveHub.start()
+        DeviceLiveness.start()
         logger.info("Aplicacion iniciada exitosamente")
     except Exception as e:
         logger.error(f"Error de inicio: {e}")
@@ -30,10 +52,19 @@ async def lifespan(app: FastAPI):
     # Cierre
     try:
         logger.info("Cerrando conexiones...")
+        await LoopMonitor.stop()
+        await RuntimeStats.stop()
+        await AnomalyJob.stop()
+        await RuleEngine.stop()
+        await LiveHub.stop()
+        await DeviceLiveness.stop()
+        await async_engine.dispose()
         MongoDBManager.close_connection()
         logger.info("Aplicacion detenida")
     except Exception as e:
         logger.error(f"Error de cierre: {e}")
+    finally:
+        shutdown_logging()
 
 
 app = FastAPI(
@@ -43,12 +74,19 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Middleware
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(RequestContextMiddleware)
+
 # Incluir routers
 app.include_router(auth.router, prefix="/api/v1/auth")
 app.include_router(users.router, prefix="/api/v1/users")
 app.include_router(devices.router, prefix="/api/v1/devices")
 app.include_router(sensors.router, prefix="/api/v1")
+app.include_router(services.router, prefix="/api/v1/services")
 app.include_router(alerts.router, prefix="/api/v1/alerts")
+app.include_router(live.router, prefix="/api/v1/live")
+app.include_router(diagnostics.router, prefix="/api/v1/diagnostics")
 
 
 def custom_openapi():
@@ -79,7 +117,7 @@ def custom_openapi():
     
     no_auth_endpoints = [
         "login_user", "login_admin", "login_manager", "login_device",
-        "root", "health_check", "generate_puzzle_for_testing",
+        "root", "health_check", "metrics", "generate_puzzle_for_testing",
         "init_device_encryption_key"
     ]
     
@@ -114,3 +152,13 @@ def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics(request: Request):
+    """Métricas del worker (OpenMetrics con exemplars si el cliente lo acepta)"""
+    openmetrics = "application/openmetrics-text" in request.headers.get("accept", "")
+    return PlainTextResponse(
+        REGISTRY.render(openmetrics=openmetrics),
+        media_type=OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+    )
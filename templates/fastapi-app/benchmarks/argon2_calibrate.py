@@ -0,0 +1,205 @@
+"""
+Calibración de parámetros Argon2id para el hardware de destino
+
+Mide, en el contenedor o máquina donde corre la API, el tiempo de hash y
+la memoria pico de N logins concurrentes para combinaciones de
+memory_cost / time_cost / parallelism, y propone la más fuerte que cumple:
+
+- p95 de latencia con --concurrency hashes simultáneos <= --target-ms
+- memoria pico de esos hashes <= --memory-fraction del límite del contenedor
+
+Los límites de CPU y memoria se leen del cgroup (docker deploy.resources);
+se pueden forzar con --cpus y --memory-mib. Cada combinación corre en un
+proceso nuevo para que la memoria pico (ru_maxrss) sea la de esa prueba.
+
+Las líneas ARGON2_* resultantes van al .env; los hashes existentes se
+actualizan solos en el siguiente login (verify_and_update_password).
+
+Uso (dentro del contenedor fastapi):
+    python -m benchmarks.argon2_calibrate --target-ms 300 --concurrency 8
+    python -m benchmarks.argon2_calibrate --json
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import resource
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from core.config import settings
+
+PASSWORD = "Calibration-Passw0rd"
+OWASP_MIN_MEMORY_KIB = 19 * 1024  # Mínimo recomendado por OWASP para Argon2id
+
+
+def cgroup_cpus() -> Optional[float]:
+    """CPUs disponibles según cgroup v2/v1 (None si no hay límite)"""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def cgroup_memory_mib() -> Optional[float]:
+    """Límite de memoria según cgroup v2/v1 (None si no hay límite)"""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            raw = Path(path).read_text().strip()
+        except OSError:
+            continue
+        if raw != "max" and int(raw) < 1 << 60:
+            return int(raw) / (1024 * 1024)
+    return None
+
+
+def _trial(memory_cost: int, time_cost: int, parallelism: int, concurrency: int, rounds: int) -> dict:
+    """Hashes concurrentes en un proceso nuevo: latencias y memoria pico"""
+    from passlib.hash import argon2
+
+    handler = argon2.using(memory_cost=memory_cost, rounds=time_cost, parallelism=parallelism)
+    baseline_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies: List[float] = []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(rounds):
+            start = time.perf_counter()
+            handler.hash(PASSWORD)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    return {
+        "latencies": latencies,
+        "peak_mib": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kib) / 1024,
+        "hashes_per_sec": len(latencies) / wall,
+    }
+
+
+def run_trial(memory_cost: int, time_cost: int, parallelism: int, concurrency: int, rounds: int) -> dict:
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        result = pool.apply(_trial, (memory_cost, time_cost, parallelism, concurrency, rounds))
+    latencies = sorted(result["latencies"])
+    return {
+        "memory_cost": memory_cost,
+        "time_cost": time_cost,
+        "parallelism": parallelism,
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))] * 1000, 1),
+        "peak_mib": round(result["peak_mib"], 1),
+        "hashes_per_sec": round(result["hashes_per_sec"], 2),
+    }
+
+
+def _memory_steps(max_kib: int) -> List[int]:
+    steps = []
+    kib = 8 * 1024
+    while kib <= max_kib:
+        steps.append(kib)
+        kib *= 2
+    if max_kib >= 8 * 1024 and (not steps or steps[-1] != max_kib):
+        steps.append(max_kib)
+    return steps
+
+
+def calibrate(args) -> Tuple[Optional[dict], List[dict]]:
+    """Buscar la combinación más fuerte (memoria x iteraciones) dentro del presupuesto"""
+    memory_budget_mib = args.memory_mib * args.memory_fraction
+    # Cota teórica por hash; la medición de memoria pico confirma cada candidato
+    max_kib = int(memory_budget_mib * 1024 / args.concurrency)
+    parallelisms = sorted({1, 2, max(1, math.ceil(args.cpus))})
+
+    trials: List[dict] = []
+    best: Optional[dict] = None
+    for parallelism in parallelisms:
+        for memory_cost in _memory_steps(max_kib):
+            fitted = None
+            for time_cost in range(1, args.max_time_cost + 1):
+                trial = run_trial(memory_cost, time_cost, parallelism, args.concurrency, args.rounds)
+                trial["fits"] = trial["p95_ms"] <= args.target_ms and trial["peak_mib"] <= memory_budget_mib
+                trials.append(trial)
+                print(f"  m={memory_cost // 1024:>5} MiB t={time_cost} p={parallelism}  "
+                      f"p50 {trial['p50_ms']:>8.1f} ms  p95 {trial['p95_ms']:>8.1f} ms  "
+                      f"pico {trial['peak_mib']:>7.1f} MiB  {trial['hashes_per_sec']:>6.2f} h/s"
+                      f"{'' if trial['fits'] else '  (fuera de presupuesto)'}", file=sys.stderr)
+                if not trial["fits"]:
+                    break
+                fitted = trial
+            if fitted is None:
+                break  # Más memoria tampoco cabe con t=1
+            strength = fitted["memory_cost"] * fitted["time_cost"]
+            if best is None or strength > best["memory_cost"] * best["time_cost"] or (
+                strength == best["memory_cost"] * best["time_cost"] and fitted["p95_ms"] < best["p95_ms"]
+            ):
+                best = fitted
+    return best, trials
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Calibración de parámetros Argon2id")
+    parser.add_argument("--target-ms", type=float, default=300.0,
+                        help="p95 máximo de un hash con --concurrency hashes simultáneos")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Logins simultáneos a soportar (todos los workers)")
+    parser.add_argument("--cpus", type=float, default=cgroup_cpus() or os.cpu_count(),
+                        help="CPUs disponibles (default: límite del cgroup)")
+    parser.add_argument("--memory-mib", type=float, default=cgroup_memory_mib() or 1024,
+                        help="Memoria del contenedor en MiB (default: límite del cgroup)")
+    parser.add_argument("--memory-fraction", type=float, default=0.4,
+                        help="Fracción de la memoria reservada para hashes concurrentes")
+    parser.add_argument("--max-time-cost", type=int, default=6)
+    parser.add_argument("--rounds", type=int, default=3, help="Hashes por hilo en cada prueba")
+    parser.add_argument("--json", action="store_true", help="Imprimir resultado como JSON")
+    args = parser.parse_args(argv)
+
+    print(f"Calibrando: {args.cpus:g} CPUs, {args.memory_mib:.0f} MiB "
+          f"(presupuesto {args.memory_mib * args.memory_fraction:.0f} MiB), "
+          f"{args.concurrency} logins simultáneos, p95 <= {args.target_ms:g} ms", file=sys.stderr)
+    print(f"Actual: m={settings.ARGON2_MEMORY_COST // 1024} MiB t={settings.ARGON2_TIME_COST} "
+          f"p={settings.ARGON2_PARALLELISM}", file=sys.stderr)
+
+    best, trials = calibrate(args)
+
+    if args.json:
+        print(json.dumps({"recommended": best, "trials": trials}, indent=2))
+    if best is None:
+        print("Ninguna combinación cumple el presupuesto: reducir --concurrency, "
+              "aumentar --target-ms o asignar más CPU/memoria al contenedor", file=sys.stderr)
+        return 1
+    if best["memory_cost"] < OWASP_MIN_MEMORY_KIB:
+        print(f"[aviso] memory_cost por debajo del mínimo OWASP ({OWASP_MIN_MEMORY_KIB // 1024} MiB)",
+              file=sys.stderr)
+    if not args.json:
+        print(f"\n# p50 {best['p50_ms']} ms, p95 {best['p95_ms']} ms, pico {best['peak_mib']} MiB "
+              f"con {args.concurrency} logins simultáneos")
+        print(f"ARGON2_MEMORY_COST={best['memory_cost']}")
+        print(f"ARGON2_TIME_COST={best['time_cost']}")
+        print(f"ARGON2_PARALLELISM={best['parallelism']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
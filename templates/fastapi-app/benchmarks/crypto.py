@@ -0,0 +1,105 @@
+"""
+Microbenchmarks de criptografía, hash de contraseñas y tokens
+
+Cubre las funciones presentes en cada login y cada solicitud autenticada:
+- CryptoManager.verificar_rompecabezas_dispositivo (sin la consulta a BD)
+- cifrar_aes256 / descifrar_aes256
+- verify_password / get_password_hash con los parámetros Argon2 configurados
+- create_access_token / decode_token
+
+Uso (desde templates/fastapi-app o dentro del contenedor):
+    python -m benchmarks.crypto                  # comparar con la línea base
+    python -m benchmarks.crypto --save-baseline  # registrar nueva línea base
+"""
+import hashlib
+import hmac
+import os
+import sys
+from base64 import b64encode
+
+from benchmarks.harness import Suite, main
+from core.crypto_new import CryptoManager
+from core.security import pwd_context, verify_password, get_password_hash, create_access_token, decode_token
+
+suite = Suite("crypto")
+
+_argon2 = pwd_context.handler("argon2")
+suite.context = {
+    "argon2_memory_cost": _argon2.memory_cost,
+    "argon2_time_cost": _argon2.rounds,
+    "argon2_parallelism": _argon2.parallelism,
+}
+
+DEVICE_ID = 1
+DEVICE_KEY = os.urandom(32)
+PASSWORD = "Benchmark-Passw0rd"
+
+
+class _FixedKeyCryptoManager(CryptoManager):
+    """CryptoManager con clave fija: aísla el costo criptográfico de la consulta a MySQL"""
+
+    def __init__(self):
+        super().__init__(db=None)
+
+    def get_key_by_id(self, device_id: int) -> bytes:
+        return DEVICE_KEY
+
+
+def _device_puzzle(manager: CryptoManager) -> dict:
+    """Construir el rompecabezas como lo hace el firmware (puzzle_auth.py)"""
+    r2 = os.urandom(32)
+    p2 = hmac.new(DEVICE_KEY + manager.server_key, r2, hashlib.sha256).digest()
+    return {
+        "id_origen": DEVICE_ID,
+        "Random dispositivo": b64encode(r2).decode("utf-8"),
+        "Parametro de identidad cifrado": manager.cifrar_aes256(p2, DEVICE_KEY)
+    }
+
+
+@suite.benchmark("puzzle.verificar_rompecabezas_dispositivo")
+def bench_verify_puzzle():
+    manager = _FixedKeyCryptoManager()
+    puzzle = _device_puzzle(manager)
+    assert manager.verificar_rompecabezas_dispositivo(puzzle)["valido"]
+    return lambda: manager.verificar_rompecabezas_dispositivo(puzzle)
+
+
+@suite.benchmark("aes256.cifrar_aes256")
+def bench_encrypt():
+    manager = _FixedKeyCryptoManager()
+    data = os.urandom(32)
+    return lambda: manager.cifrar_aes256(data, DEVICE_KEY)
+
+
+@suite.benchmark("aes256.descifrar_aes256")
+def bench_decrypt():
+    manager = _FixedKeyCryptoManager()
+    encrypted = manager.cifrar_aes256(os.urandom(32), DEVICE_KEY)
+    return lambda: manager.descifrar_aes256(encrypted, DEVICE_KEY)
+
+
+@suite.benchmark("password.get_password_hash")
+def bench_hash_password():
+    return lambda: get_password_hash(PASSWORD)
+
+
+@suite.benchmark("password.verify_password")
+def bench_verify_password():
+    hashed = get_password_hash(PASSWORD)
+    return lambda: verify_password(PASSWORD, hashed)
+
+
+@suite.benchmark("token.create_access_token")
+def bench_create_token():
+    claims = {"sub": "1", "type": "device"}
+    return lambda: create_access_token(claims)
+
+
+@suite.benchmark("token.decode_token")
+def bench_decode_token():
+    token = create_access_token({"sub": "1", "type": "device"})
+    return lambda: decode_token(token)
+
+
+if __name__ == "__main__":
+    sys.exit(main(suite))
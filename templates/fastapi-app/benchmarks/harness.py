@@ -0,0 +1,170 @@
+"""
+Harness de microbenchmarks con línea base y detección de regresiones
+
+Cada suite registra funciones de preparación que devuelven un callable sin
+argumentos. El harness calibra el número de iteraciones para que cada
+repetición dure al menos `min_time`, toma la mediana de operaciones por
+segundo y la compara con la línea base guardada en JSON.
+
+Las líneas base guardan también un "contexto" (p. ej. parámetros Argon2):
+si difiere del actual, la comparación se omite en lugar de reportar una
+regresión falsa.
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+DEFAULT_TOLERANCE = 0.15
+
+
+class Suite:
+    """Conjunto de benchmarks con contexto compartido"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.benchmarks: Dict[str, Callable[[], Callable[[], object]]] = {}
+        self.context: Dict[str, object] = {}
+
+    def benchmark(self, name: str):
+        """Registrar una función de preparación que devuelve el callable a medir"""
+        def decorator(setup: Callable[[], Callable[[], object]]):
+            self.benchmarks[name] = setup
+            return setup
+        return decorator
+
+
+def measure(func: Callable[[], object], min_time: float = 0.2, repeat: int = 5) -> dict:
+    """Medir ops/s: calibra iteraciones y toma la mediana de `repeat` repeticiones"""
+    func()  # Calentamiento (imports perezosos, cachés)
+
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or loops >= 1_000_000:
+            break
+        loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9)))
+
+    rates: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        elapsed = time.perf_counter() - start
+        rates.append(loops / elapsed)
+
+    median = statistics.median(rates)
+    return {
+        "ops_per_sec": round(median, 2),
+        "mean_us": round(1e6 / median, 3),
+        "stdev_pct": round(100 * statistics.pstdev(rates) / median, 2) if median else 0.0,
+        "loops": loops,
+        "repeat": repeat
+    }
+
+
+def run_suite(suite: Suite, only: Optional[str] = None, min_time: float = 0.2, repeat: int = 5) -> dict:
+    """Ejecutar todos los benchmarks de la suite (o los que contengan `only`)"""
+    results = {}
+    for name, setup in suite.benchmarks.items():
+        if only and only not in name:
+            continue
+        results[name] = measure(setup(), min_time=min_time, repeat=repeat)
+        print(f"  {name:<40} {results[name]['ops_per_sec']:>14,.1f} ops/s  "
+              f"{results[name]['mean_us']:>12,.1f} us/op  ±{results[name]['stdev_pct']}%")
+    return {
+        "suite": suite.name,
+        "context": suite.context,
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor() or platform.machine(),
+        },
+        "created_at": datetime.utcnow().isoformat(),
+        "results": results
+    }
+
+
+def baseline_path(suite_name: str, baseline_dir: Path = BASELINE_DIR) -> Path:
+    return baseline_dir / f"{suite_name}.json"
+
+
+def save_baseline(report: dict, baseline_dir: Path = BASELINE_DIR) -> Path:
+    baseline_dir.mkdir(parents=True, exist_ok=True)
+    path = baseline_path(report["suite"], baseline_dir)
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    return path
+
+
+def load_baseline(suite_name: str, baseline_dir: Path = BASELINE_DIR) -> Optional[dict]:
+    path = baseline_path(suite_name, baseline_dir)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def compare(report: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[str]:
+    """Devolver las regresiones (throughput por debajo de base * (1 - tolerancia))"""
+    if baseline.get("context") != report.get("context"):
+        print(f"  [aviso] Contexto distinto a la línea base ({baseline.get('context')} != "
+              f"{report.get('context')}); comparación omitida")
+        return []
+
+    regressions = []
+    for name, result in report["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        ratio = result["ops_per_sec"] / base["ops_per_sec"] if base["ops_per_sec"] else 1.0
+        marker = "REGRESIÓN" if ratio < 1 - tolerance else "ok"
+        print(f"  {name:<40} {ratio:>7.2%} de la línea base  [{marker}]")
+        if ratio < 1 - tolerance:
+            regressions.append(f"{name}: {result['ops_per_sec']:,.1f} ops/s vs base "
+                               f"{base['ops_per_sec']:,.1f} ({ratio:.1%})")
+    return regressions
+
+
+def main(suite: Suite, argv: Optional[List[str]] = None) -> int:
+    """CLI común: ejecutar, guardar línea base o comparar (código 1 si hay regresiones)"""
+    parser = argparse.ArgumentParser(description=f"Benchmarks: {suite.name}")
+    parser.add_argument("--filter", default=None, help="Ejecutar solo benchmarks que contengan este texto")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Duración mínima por repetición (s)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por benchmark")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Caída de throughput tolerada (0.15 = 15%%)")
+    parser.add_argument("--baseline-dir", type=Path, default=BASELINE_DIR, help="Directorio de líneas base")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar resultados como nueva línea base")
+    parser.add_argument("--json", type=Path, default=None, help="Escribir el reporte en este archivo")
+    args = parser.parse_args(argv)
+
+    print(f"Suite {suite.name} (contexto: {suite.context})")
+    report = run_suite(suite, only=args.filter, min_time=args.min_time, repeat=args.repeat)
+
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    if args.save_baseline:
+        print(f"Línea base guardada en {save_baseline(report, args.baseline_dir)}")
+        return 0
+
+    baseline = load_baseline(suite.name, args.baseline_dir)
+    if baseline is None:
+        print("Sin línea base: ejecutar con --save-baseline para crearla")
+        return 0
+
+    print(f"Comparación con línea base ({baseline.get('created_at')}, tolerancia {args.tolerance:.0%}):")
+    regressions = compare(report, baseline, args.tolerance)
+    if regressions:
+        print("Regresiones detectadas:")
+        for line in regressions:
+            print(f"  - {line}")
+        return 1
+    return 0
@@ -0,0 +1,409 @@
+"""
+Generador de historial sintético y benchmark de consultas de lecturas
+
+generate: carga meses de lecturas para N dispositivos en la colección
+configurada (sensor_readings), con curvas diarias de temperatura/humedad,
+descarga y recarga de batería y huecos aleatorios (dispositivo sin
+conexión). Se paraleliza por dispositivo con multiprocessing: cada proceso
+tiene su propio MongoClient y escribe lotes sin orden con w:1, j:false.
+Con --defer-indexes los índices secundarios se eliminan durante la carga
+y se reconstruyen al final (mucho más rápido para cientos de millones).
+Requiere MONGO_BACKEND=mongodb: con mongomock (perfil bench) cada proceso
+tendría su propia base en memoria y el historial se perdería.
+
+query: ejecuta las combinaciones de filtros de GET /devices/{id}/readings
+(sensor_type, rango de fechas, limit) contra la API (--mode api) o
+directamente contra MongoDB con la misma consulta del router (--mode mongo)
+y reporta percentiles de latencia por combinación. En modo api cada
+petición lleva Cache-Control: no-cache para medir consultas reales (la
+caché de lecturas en Redis se salta); --use-cache lo desactiva. Se
+reportan los aciertos/fallos de caché (cabecera X-Cache).
+
+clean: elimina los documentos generados (source = "synthetic").
+
+Uso:
+    python -m benchmarks.history generate --devices 1000 --days 90 --workers 8 --defer-indexes
+    python -m benchmarks.history query --mode mongo --devices 1000 --requests 200
+    python -m benchmarks.history query --mode api --base-url http://localhost:5000 \\
+        --email user@example.com --password '...'
+"""
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from pymongo.write_concern import WriteConcern
+
+from benchmarks.harness import DEFAULT_TOLERANCE, compare, load_baseline, save_baseline
+from core.config import settings
+from core.readings import find_readings, reading_rows, readings_filter
+from database.mongo import MongoDBManager, create_indexes, get_sensor_readings_collection
+
+SYNTHETIC_SOURCE = "synthetic"
+SECONDARY_INDEXES = [
+    "device_id_1_timestamp_-1", "device_id_1_sensor_type_1_timestamp_-1", "sensor_type_1", "timestamp_-1"
+]
+
+
+# =============================================================================
+# Generación
+# =============================================================================
+
+class DeviceProfile:
+    """Parámetros de clima y batería de un dispositivo (deterministas por semilla)"""
+
+    def __init__(self, device_id: int, seed: int, start: datetime, end: datetime, gap_rate: float):
+        rng = random.Random(seed * 1_000_003 + device_id)
+        self.rng = rng
+        self.device_id = str(device_id)
+        self.location = f"zona-{device_id % 50}"
+        self.temp_base = rng.uniform(18, 26)
+        self.temp_amplitude = rng.uniform(2, 6)
+        self.humidity_base = rng.uniform(40, 70)
+        self.phase_h = rng.uniform(13, 16)  # Hora del máximo de temperatura
+        self.battery_drain_h = rng.uniform(0.2, 0.8)
+        self.gaps = self._gaps(start, end, gap_rate)
+
+    def _gaps(self, start: datetime, end: datetime, gap_rate: float) -> List[Tuple[datetime, datetime]]:
+        gaps = []
+        day = start
+        while day < end:
+            if self.rng.random() < gap_rate:
+                gap_start = day + timedelta(seconds=self.rng.randint(0, 86399))
+                gaps.append((gap_start, gap_start + timedelta(minutes=self.rng.randint(10, 720))))
+            day += timedelta(days=1)
+        return gaps
+
+    def values(self, ts: datetime) -> Tuple[float, int]:
+        hour = ts.hour + ts.minute / 60
+        diurnal = math.cos(2 * math.pi * (hour - self.phase_h) / 24)
+        temperature = self.temp_base + self.temp_amplitude * diurnal + self.rng.gauss(0, 0.4)
+        humidity = self.humidity_base - 1.8 * self.temp_amplitude * diurnal + self.rng.gauss(0, 1.5)
+        return round(temperature, 2), int(min(100, max(0, humidity)))
+
+
+def _generate_device(task: Tuple[int, dict]) -> int:
+    """Generar e insertar el historial de un dispositivo (ejecutado en un proceso hijo)"""
+    device_id, opts = task
+    start = datetime.fromisoformat(opts["start"])
+    end = datetime.fromisoformat(opts["end"])
+    interval = timedelta(seconds=opts["interval"])
+    profile = DeviceProfile(device_id, opts["seed"], start, end, opts["gap_rate"])
+    collection = get_sensor_readings_collection().with_options(write_concern=WriteConcern(w=1, j=False))
+
+    gaps = profile.gaps
+    gap_index = 0
+    battery = 100.0
+    batch: List[dict] = []
+    inserted = 0
+    ts = start
+    while ts < end:
+        while gap_index < len(gaps) and gaps[gap_index][1] <= ts:
+            gap_index += 1
+        if gap_index < len(gaps) and gaps[gap_index][0] <= ts:
+            ts = gaps[gap_index][1]
+            continue
+
+        battery -= profile.battery_drain_h * opts["interval"] / 3600
+        if battery < 15:
+            battery = 100.0
+        temperature, humidity = profile.values(ts)
+        base = {"device_id": profile.device_id, "location": profile.location,
+                "timestamp": ts, "source": SYNTHETIC_SOURCE}
+        batch.append(dict(base, sensor_type="temperature", value=temperature, unit="°C"))
+        batch.append(dict(base, sensor_type="humidity", value=humidity, unit="%"))
+        batch.append(dict(base, sensor_type="battery", value=int(battery), unit="%"))
+
+        if len(batch) >= opts["batch"]:
+            collection.insert_many(batch, ordered=False)
+            inserted += len(batch)
+            batch = []
+        ts += interval
+
+    if batch:
+        collection.insert_many(batch, ordered=False)
+        inserted += len(batch)
+    return inserted
+
+
+def generate(args) -> int:
+    if settings.MONGO_BACKEND != "mongodb":
+        # mongomock vive en memoria de cada proceso: lo escrito por los hijos se perdería
+        print(f"generate requiere un MongoDB real (mongodb://{settings.MONGO_HOST}:{settings.MONGO_PORT}); "
+              f"MONGO_BACKEND={settings.MONGO_BACKEND}", file=sys.stderr)
+        return 2
+    end = datetime.fromisoformat(args.end) if args.end else datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=args.days)
+    per_device = int(args.days * 86400 / args.interval) * 3
+    print(f"Generando ~{per_device * args.devices:,} documentos: {args.devices} dispositivos, "
+          f"{args.days} días ({start:%Y-%m-%d} a {end:%Y-%m-%d}), cada {args.interval}s, "
+          f"{args.workers} procesos")
+
+    if args.defer_indexes:
+        collection = get_sensor_readings_collection()
+        existing = set(collection.index_information())
+        for name in SECONDARY_INDEXES:
+            if name in existing:
+                collection.drop_index(name)
+        print("Índices secundarios eliminados durante la carga")
+    # Cada proceso hijo abre su propio cliente (PyMongo no es fork-safe)
+    MongoDBManager.close_connection()
+
+    opts = {"start": start.isoformat(), "end": end.isoformat(), "interval": args.interval,
+            "seed": args.seed, "gap_rate": args.gap_rate, "batch": args.batch}
+    tasks = [(device_id, opts) for device_id in range(args.first_device, args.first_device + args.devices)]
+
+    started = time.perf_counter()
+    total = 0
+    with multiprocessing.get_context("spawn").Pool(args.workers) as pool:
+        for done, inserted in enumerate(pool.imap_unordered(_generate_device, tasks), start=1):
+            total += inserted
+            if done % max(1, args.devices // 20) == 0 or done == args.devices:
+                elapsed = time.perf_counter() - started
+                print(f"  {done}/{args.devices} dispositivos  {total:,} docs  {total / elapsed:,.0f} docs/s")
+
+    load_elapsed = time.perf_counter() - started
+    if args.defer_indexes:
+        print("Reconstruyendo índices...")
+        index_started = time.perf_counter()
+        create_indexes()
+        print(f"Índices reconstruidos en {time.perf_counter() - index_started:.1f}s")
+
+    print(f"Carga completa: {total:,} documentos en {load_elapsed:.1f}s ({total / load_elapsed:,.0f} docs/s)")
+    return 0
+
+
+def clean(args) -> int:
+    result = get_sensor_readings_collection().delete_many({"source": SYNTHETIC_SOURCE})
+    print(f"Eliminados {result.deleted_count:,} documentos sintéticos")
+    return 0
+
+
+# =============================================================================
+# Consultas
+# =============================================================================
+
+def query_cases(end: datetime) -> Dict[str, dict]:
+    """Combinaciones de filtros de GET /devices/{id}/readings"""
+    return {
+        "latest_100": {"limit": 100},
+        "sensor_type_100": {"sensor_type": "temperature", "limit": 100},
+        "range_1d": {"start_date": end - timedelta(days=1), "end_date": end, "limit": 1000},
+        "range_7d_sensor": {"sensor_type": "humidity", "start_date": end - timedelta(days=7),
+                            "end_date": end, "limit": 1000},
+        "range_30d_1000": {"start_date": end - timedelta(days=30), "end_date": end, "limit": 1000},
+        "old_range_sensor": {"sensor_type": "battery", "start_date": end - timedelta(days=60),
+                             "end_date": end - timedelta(days=59), "limit": 1000},
+        "start_only_sensor": {"sensor_type": "temperature", "start_date": end - timedelta(days=3), "limit": 500},
+    }
+
+
+def _mongo_query(device_id: int, params: dict) -> Tuple[int, Optional[str]]:
+    """Misma consulta que el router get_device_readings (filtro, proyección, orden y lote)"""
+    query_filter = readings_filter(
+        device_id, params.get("sensor_type"), params.get("start_date"), params.get("end_date")
+    )
+    return len(reading_rows(find_readings(get_sensor_readings_collection(), query_filter, params["limit"]))), None
+
+
+class ApiClient:
+    """Cliente HTTP mínimo (urllib) con token de usuario"""
+
+    def __init__(self, base_url: str, token: Optional[str] = None, use_cache: bool = False):
+        self.base_url = base_url.rstrip("/")
+        self.token = token
+        self.use_cache = use_cache
+        self.logged_in = False
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None,
+                 headers: Optional[dict] = None) -> Tuple[int, dict, Mapping[str, str]]:
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method)
+        request.add_header("Content-Type", "application/json")
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        for name, value in (headers or {}).items():
+            request.add_header(name, value)
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                raw = response.read()
+                return response.status, json.loads(raw) if raw else {}, response.headers
+        except urllib.error.HTTPError as e:
+            return e.code, {}, e.headers or {}
+
+    def login(self, email: str, password: str) -> None:
+        status, body, _ = self._request("POST", "/api/v1/auth/login/user", {"email": email, "password": password})
+        if status != 200:
+            raise SystemExit(f"Login fallido: HTTP {status}")
+        self.token = body["access_token"]
+        self.logged_in = True
+
+    def logout(self) -> None:
+        if self.logged_in:
+            self._request("POST", "/api/v1/auth/logout")
+
+    def readings(self, device_id: int, params: dict) -> Tuple[int, Optional[str]]:
+        """(lecturas devueltas, X-Cache de la respuesta)"""
+        query = {k: (v.isoformat() if isinstance(v, datetime) else v) for k, v in params.items()}
+        status, body, headers = self._request(
+            "GET", f"/api/v1/devices/{device_id}/readings?{urllib.parse.urlencode(query)}",
+            headers=None if self.use_cache else {"Cache-Control": "no-cache"}
+        )
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}")
+        return body.get("readings_count", 0), headers.get("X-Cache")
+
+
+def _detect_end() -> datetime:
+    latest = get_sensor_readings_collection().find_one(
+        {"source": SYNTHETIC_SOURCE}, sort=[("timestamp", -1)], projection={"timestamp": 1}
+    )
+    return latest["timestamp"] if latest else datetime.utcnow()
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def query(args) -> int:
+    end = datetime.fromisoformat(args.end) if args.end else _detect_end()
+    cases = query_cases(end)
+    if args.cases:
+        cases = {k: v for k, v in cases.items() if k in args.cases.split(",")}
+
+    api: Optional[ApiClient] = None
+    if args.mode == "api":
+        api = ApiClient(args.base_url, args.token, use_cache=args.use_cache)
+        if not args.token:
+            api.login(args.email, args.password)
+        run = api.readings
+    else:
+        run = _mongo_query
+
+    rng = random.Random(args.seed)
+    results = {}
+    print(f"Consultas ({args.mode}): {args.requests} por combinación, concurrencia {args.concurrency}, fin {end:%Y-%m-%d %H:%M}")
+    print(f"{'combinación':<20} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'docs prom.':>11} {'req/s':>8}")
+    try:
+        for name, params in cases.items():
+            device_ids = [rng.randint(args.first_device, args.first_device + args.devices - 1)
+                          for _ in range(args.requests)]
+            latencies: List[float] = []
+            counts: List[int] = []
+            cache: Dict[str, int] = {"hits": 0, "misses": 0}
+            errors = 0
+
+            def one(device_id: int):
+                start = time.perf_counter()
+                count, cache_status = run(device_id, params)
+                return time.perf_counter() - start, count, cache_status
+
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                for future in [executor.submit(one, d) for d in device_ids]:
+                    try:
+                        latency, count, cache_status = future.result()
+                        latencies.append(latency)
+                        counts.append(count)
+                        if cache_status is not None:
+                            cache["hits" if cache_status == "HIT" else "misses"] += 1
+                    except Exception:
+                        errors += 1
+            wall = time.perf_counter() - started
+
+            results[name] = {
+                "ops_per_sec": round(len(latencies) / wall, 2) if wall else 0.0,
+                "p50_ms": round(_percentile(latencies, 50) * 1000, 2),
+                "p90_ms": round(_percentile(latencies, 90) * 1000, 2),
+                "p99_ms": round(_percentile(latencies, 99) * 1000, 2),
+                "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+                "avg_docs": round(sum(counts) / len(counts), 1) if counts else 0.0,
+                "errors": errors,
+            }
+            if api is not None:
+                results[name].update(cache_hits=cache["hits"], cache_misses=cache["misses"])
+            r = results[name]
+            print(f"{name:<20} {r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f} "
+                  f"{r['avg_docs']:>11.1f} {r['ops_per_sec']:>8.1f}"
+                  + (f"  caché={cache['hits']}/{cache['hits'] + cache['misses']}" if api is not None else "")
+                  + (f"  errores={errors}" if errors else ""))
+    finally:
+        if api is not None:
+            api.logout()
+
+    report = {
+        "suite": f"history_{args.mode}",
+        "context": {"devices": args.devices, "requests": args.requests, "concurrency": args.concurrency,
+                    "use_cache": args.mode == "api" and args.use_cache},
+        "created_at": datetime.utcnow().isoformat(),
+        "results": results
+    }
+    if args.save_baseline:
+        print(f"Línea base guardada en {save_baseline(report)}")
+        return 0
+    baseline = load_baseline(report["suite"])
+    if baseline is None:
+        return 0
+    regressions = compare(report, baseline, args.tolerance)
+    for line in regressions:
+        print(f"  - {line}")
+    return 1 if regressions else 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Historial sintético y benchmark de consultas")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    gen = sub.add_parser("generate", help="Cargar historial sintético")
+    gen.add_argument("--devices", type=int, default=100)
+    gen.add_argument("--first-device", type=int, default=1, help="ID del primer dispositivo")
+    gen.add_argument("--days", type=float, default=90)
+    gen.add_argument("--interval", type=int, default=60, help="Segundos entre lecturas")
+    gen.add_argument("--end", default=None, help="Fin del historial (ISO 8601, default: ahora)")
+    gen.add_argument("--gap-rate", type=float, default=0.05, help="Probabilidad diaria de un hueco por dispositivo")
+    gen.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    gen.add_argument("--batch", type=int, default=10000, help="Documentos por insert_many")
+    gen.add_argument("--seed", type=int, default=42)
+    gen.add_argument("--defer-indexes", action="store_true", help="Eliminar índices durante la carga")
+    gen.set_defaults(func=generate)
+
+    qry = sub.add_parser("query", help="Benchmark de consultas de historial")
+    qry.add_argument("--mode", choices=["api", "mongo"], default="mongo")
+    qry.add_argument("--devices", type=int, default=100)
+    qry.add_argument("--first-device", type=int, default=1)
+    qry.add_argument("--requests", type=int, default=200, help="Solicitudes por combinación")
+    qry.add_argument("--concurrency", type=int, default=8)
+    qry.add_argument("--cases", default="", help="Combinaciones separadas por comas (default: todas)")
+    qry.add_argument("--end", default=None, help="Fin del historial (default: detectado)")
+    qry.add_argument("--seed", type=int, default=7)
+    qry.add_argument("--base-url", default="http://localhost:5000")
+    qry.add_argument("--token", default=None, help="JWT de usuario (evita login/logout)")
+    qry.add_argument("--email", default="user@example.com")
+    qry.add_argument("--password", default="")
+    qry.add_argument("--use-cache", action="store_true",
+                     help="Modo api: no enviar Cache-Control: no-cache (mide también aciertos de caché)")
+    qry.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    qry.add_argument("--save-baseline", action="store_true")
+    qry.set_defaults(func=query)
+
+    cln = sub.add_parser("clean", help="Eliminar documentos sintéticos")
+    cln.set_defaults(func=clean)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
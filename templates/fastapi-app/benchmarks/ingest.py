@@ -0,0 +1,263 @@
+"""
+Benchmark de estrategias de escritura para la ingesta de lecturas
+
+Reproduce un flujo sintético de telemetría (semilla fija) con el mismo
+formato de documentos que POST /device/reading y lo escribe en MongoDB con
+distintas estrategias, cada una en una colección nueva con sus índices:
+
+- per_request:  insert_many por solicitud (comportamiento actual)
+- buffered:     insert_many por lotes de --batch documentos
+- unordered_w1: lotes sin orden con write concern w:1, j:false
+- timeseries:   colección time-series (metaField device/sensor)
+- bucketed:     un documento por dispositivo y hora con arreglo de lecturas
+
+Reporta documentos/s, latencia p50/p99 por operación de escritura, tamaño
+en disco y tamaño de índices ($collStats). Requiere un MongoDB real
+(5.0+ para time-series); usa una base de datos separada que se elimina
+al terminar salvo con --keep.
+
+Uso:
+    python -m benchmarks.ingest --devices 500 --readings 100
+    python -m benchmarks.ingest --strategies buffered,timeseries --save-baseline
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.write_concern import WriteConcern
+
+from benchmarks.harness import BASELINE_DIR, DEFAULT_TOLERANCE, compare, load_baseline, save_baseline
+from database.mongo import MongoDBManager
+
+STRATEGIES = ["per_request", "buffered", "unordered_w1", "timeseries", "bucketed"]
+SENSORS = [("temperature", "°C"), ("humidity", "%"), ("battery", "%")]
+
+
+def synthetic_stream(devices: int, readings: int, interval_s: int, seed: int) -> Iterator[List[dict]]:
+    """Solicitudes de ingesta (3 documentos cada una) intercaladas entre dispositivos"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    for n in range(readings):
+        for device_id in range(1, devices + 1):
+            timestamp = start + timedelta(seconds=n * interval_s + rng.randint(0, interval_s - 1))
+            values = (round(rng.gauss(24, 3), 2), rng.randint(30, 80), max(0, 100 - n // 10))
+            yield [
+                {
+                    "device_id": str(device_id),
+                    "sensor_type": sensor_type,
+                    "value": value,
+                    "unit": unit,
+                    "location": f"zona-{device_id % 20}",
+                    "timestamp": timestamp
+                }
+                for (sensor_type, unit), value in zip(SENSORS, values)
+            ]
+
+
+def _batches(stream: Iterator[List[dict]], batch: int) -> Iterator[List[dict]]:
+    buffer: List[dict] = []
+    for docs in stream:
+        buffer.extend(docs)
+        if len(buffer) >= batch:
+            yield buffer
+            buffer = []
+    if buffer:
+        yield buffer
+
+
+def _timed(op: Callable[[], object], latencies: List[float]) -> None:
+    start = time.perf_counter()
+    op()
+    latencies.append(time.perf_counter() - start)
+
+
+def _setup_plain(db, name: str):
+    collection = db[name]
+    collection.create_index([("device_id", ASCENDING), ("timestamp", DESCENDING)])
+    collection.create_index([("sensor_type", ASCENDING)])
+    collection.create_index([("timestamp", DESCENDING)])
+    return collection
+
+
+def run_per_request(db, name, stream, args, latencies):
+    collection = _setup_plain(db, name)
+    for docs in stream:
+        _timed(lambda: collection.insert_many(docs), latencies)
+
+
+def run_buffered(db, name, stream, args, latencies):
+    collection = _setup_plain(db, name)
+    for batch in _batches(stream, args.batch):
+        _timed(lambda: collection.insert_many(batch), latencies)
+
+
+def run_unordered_w1(db, name, stream, args, latencies):
+    collection = _setup_plain(db, name).with_options(write_concern=WriteConcern(w=1, j=False))
+    for batch in _batches(stream, args.batch):
+        _timed(lambda: collection.insert_many(batch, ordered=False), latencies)
+
+
+def run_timeseries(db, name, stream, args, latencies):
+    db.create_collection(name, timeseries={
+        "timeField": "timestamp", "metaField": "meta", "granularity": "seconds"
+    })
+    collection = db[name]
+    collection.create_index([("meta.device_id", ASCENDING), ("timestamp", DESCENDING)])
+
+    def to_measurement(doc: dict) -> dict:
+        return {
+            "timestamp": doc["timestamp"],
+            "meta": {"device_id": doc["device_id"], "sensor_type": doc["sensor_type"],
+                     "unit": doc["unit"], "location": doc["location"]},
+            "value": doc["value"]
+        }
+
+    for batch in _batches(stream, args.batch):
+        measurements = [to_measurement(d) for d in batch]
+        _timed(lambda: collection.insert_many(measurements, ordered=False), latencies)
+
+
+def run_bucketed(db, name, stream, args, latencies):
+    collection = db[name]
+    collection.create_index([("device_id", ASCENDING), ("bucket_start", DESCENDING)], unique=True)
+
+    def to_update(doc: dict) -> UpdateOne:
+        bucket_start = doc["timestamp"].replace(minute=0, second=0, microsecond=0)
+        return UpdateOne(
+            {"device_id": doc["device_id"], "bucket_start": bucket_start},
+            {
+                "$push": {"readings": {"t": doc["timestamp"], "s": doc["sensor_type"], "v": doc["value"]}},
+                "$inc": {"count": 1},
+                "$setOnInsert": {"location": doc["location"]}
+            },
+            upsert=True
+        )
+
+    for batch in _batches(stream, args.batch):
+        ops = [to_update(d) for d in batch]
+        _timed(lambda: collection.bulk_write(ops, ordered=False), latencies)
+
+
+RUNNERS: Dict[str, Callable] = {
+    "per_request": run_per_request,
+    "buffered": run_buffered,
+    "unordered_w1": run_unordered_w1,
+    "timeseries": run_timeseries,
+    "bucketed": run_bucketed,
+}
+
+
+def storage_stats(db, name: str) -> dict:
+    """Tamaños de almacenamiento vía $collStats (incluye colecciones time-series)"""
+    try:
+        stats = next(db[name].aggregate([{"$collStats": {"storageStats": {}}}]))["storageStats"]
+    except Exception as e:
+        return {"error": str(e)}
+    return {
+        "data_bytes": stats.get("size", 0),
+        "storage_bytes": stats.get("storageSize", 0),
+        "index_bytes": stats.get("totalIndexSize", 0),
+    }
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+def run_strategy(db, strategy: str, args) -> dict:
+    name = f"readings_{strategy}"
+    db.drop_collection(name)
+    stream = synthetic_stream(args.devices, args.readings, args.interval, args.seed)
+    latencies: List[float] = []
+
+    start = time.perf_counter()
+    RUNNERS[strategy](db, name, stream, args, latencies)
+    elapsed = time.perf_counter() - start
+
+    docs = args.devices * args.readings * len(SENSORS)
+    try:
+        MongoDBManager.get_client().admin.command("fsync")  # Actualiza storageSize tras checkpoint
+    except Exception:
+        pass
+
+    result = {
+        "ops_per_sec": round(docs / elapsed, 1),
+        "documents": docs,
+        "writes": len(latencies),
+        "elapsed_s": round(elapsed, 3),
+        "p50_write_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p99_write_ms": round(_percentile(latencies, 99) * 1000, 3),
+        "mean_write_ms": round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+    }
+    result.update(storage_stats(db, name))
+    if not args.keep:
+        db.drop_collection(name)
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de estrategias de escritura de lecturas")
+    parser.add_argument("--devices", type=int, default=200, help="Dispositivos simulados")
+    parser.add_argument("--readings", type=int, default=100, help="Solicitudes por dispositivo")
+    parser.add_argument("--interval", type=int, default=30, help="Segundos entre lecturas (timestamps)")
+    parser.add_argument("--batch", type=int, default=500, help="Documentos por lote (estrategias con buffer)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--strategies", default=",".join(STRATEGIES),
+                        help=f"Lista separada por comas: {', '.join(STRATEGIES)}")
+    parser.add_argument("--database", default="iot_bench_ingest", help="Base de datos de pruebas")
+    parser.add_argument("--keep", action="store_true", help="No eliminar las colecciones al terminar")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    strategies = [s.strip() for s in args.strategies.split(",") if s.strip()]
+    unknown = [s for s in strategies if s not in RUNNERS]
+    if unknown:
+        parser.error(f"Estrategias desconocidas: {', '.join(unknown)}")
+
+    client = MongoDBManager.get_client()
+    db = client[args.database]
+    server_version = client.server_info().get("version", "?")
+
+    print(f"MongoDB {server_version}: {args.devices} dispositivos x {args.readings} solicitudes "
+          f"x {len(SENSORS)} sensores, lote {args.batch}")
+    print(f"{'estrategia':<14} {'docs/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'datos MB':>9} "
+          f"{'disco MB':>9} {'índices MB':>11}")
+
+    results = {}
+    for strategy in strategies:
+        r = results[strategy] = run_strategy(db, strategy, args)
+        print(f"{strategy:<14} {r['ops_per_sec']:>10,.0f} {r['p50_write_ms']:>9.2f} {r['p99_write_ms']:>9.2f} "
+              f"{r.get('data_bytes', 0) / 1e6:>9.2f} {r.get('storage_bytes', 0) / 1e6:>9.2f} "
+              f"{r.get('index_bytes', 0) / 1e6:>11.2f}")
+
+    report = {
+        "suite": "ingest",
+        "context": {"devices": args.devices, "readings": args.readings, "batch": args.batch,
+                    "mongodb": server_version},
+        "created_at": datetime.utcnow().isoformat(),
+        "results": results
+    }
+
+    if args.save_baseline:
+        print(f"Línea base guardada en {save_baseline(report)}")
+        return 0
+    baseline = load_baseline("ingest", BASELINE_DIR)
+    if baseline is None:
+        return 0
+    regressions = compare(report, baseline, args.tolerance)
+    for line in regressions:
+        print(f"  - {line}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,570 @@
+"""
+Motor de reglas de alerta evaluado en la ingesta
+
+Las reglas viven en la colección alert_rules y se compilan en una tabla en
+memoria indexada por (device_id, sensor_type); las reglas por servicio se
+expanden a sus dispositivos (servicio_dispositivo) y las globales usan
+device_id None. Cada lote de POST /device/reading se evalúa contra la tabla
+sin consultar MongoDB; solo las transiciones (regla que empieza o deja de
+cumplirse) escriben en la colección alerts.
+
+Tipos de regla:
+- threshold: value < min_value o value > max_value
+- rate_of_change: |Δvalue| por per_seconds mayor que max_delta, respecto a la
+  lectura anterior vista por este worker
+- missing_data: más de max_gap_s sin lecturas del dispositivo; se revisa
+  periódicamente con la marca de ingesta de Redis (compartida entre workers)
+
+Control de volumen:
+- Estado por (regla, dispositivo) en memoria (abierta, desde, resuelta en),
+  con checkpoint en Redis cada ALERT_STATE_CHECKPOINT_S; cada worker fusiona
+  el estado de los demás (gana la entrada más reciente).
+- Histéresis: una alerta abierta se resuelve solo cuando el valor vuelve
+  `hysteresis` unidades dentro del límite.
+- min_refire_s: tras resolverse, la regla no vuelve a abrir alerta para el
+  dispositivo hasta pasado ese intervalo.
+- Agrupación: si una regla de servicio (o global) abre más de
+  ALERT_GROUP_THRESHOLD alertas en ALERT_GROUP_WINDOW_S, las siguientes se
+  acumulan en una sola alerta type=rule_group por (regla, alcance), escrita
+  en cada checkpoint.
+
+Los cambios de reglas o de membresía incrementan una versión en Redis y cada
+worker recompila al detectarla (como máximo cada ALERT_RULES_CHECK_S, y en
+todo caso cada FULL_RECOMPILE_S).
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+from pymongo import UpdateMany, UpdateOne
+
+from core.config import RedisManager, settings
+from core.metrics import REGISTRY, Counter
+from core.readings import VALID_SENSOR_TYPES, to_utc_naive
+from core.readings_cache import WATERMARK_KEY
+from core.service_membership import MEMBERSHIP_VERSION_KEY, ServiceMembership
+from database import SessionLocal
+from database.mongo import get_alert_rules_collection, get_alerts_collection
+from models import Device
+
+logger = logging.getLogger(__name__)
+
+RULE_KINDS = ["threshold", "rate_of_change", "missing_data"]
+SEVERITIES = ["info", "warning", "critical"]
+RULES_VERSION_KEY = "alert_rules:version"
+STATE_KEY = "alert_rules:state"
+STATE_VERSION_KEY = "alert_rules:state_version"
+SWEEP_LOCK_KEY = "alert_rules:missing_sweep"
+FULL_RECOMPILE_S = 300
+# Estados resueltos que se conservan (además de min_refire_s) para que todos los workers los vean
+STATE_RETENTION_S = 3600
+
+alert_transitions = REGISTRY.register(Counter(
+    "alert_transitions_total",
+    "Transiciones de reglas de alerta (opened, resolved, grouped, suppressed)",
+    ["action"]
+))
+
+
+def validate_rule(rule: dict) -> None:
+    """Validar combinación de campos según el tipo de regla"""
+    def bad_request(detail: str):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=detail)
+
+    if rule.get("device_id") is not None and rule.get("service_id") is not None:
+        bad_request("Indicar device_id o service_id, no ambos (ninguno = todos los dispositivos)")
+    kind = rule.get("kind")
+    if kind in ("threshold", "rate_of_change") and rule.get("sensor_type") is None:
+        bad_request(f"sensor_type es obligatorio para reglas {kind}")
+    hysteresis = rule.get("hysteresis") or 0
+    if kind == "threshold":
+        if rule.get("min_value") is None and rule.get("max_value") is None:
+            bad_request("Una regla threshold necesita min_value y/o max_value")
+        if rule.get("min_value") is not None and rule.get("max_value") is not None \
+                and rule["max_value"] - rule["min_value"] <= 2 * hysteresis:
+            bad_request("max_value - min_value debe ser mayor que 2 × hysteresis")
+    elif kind == "rate_of_change":
+        if not rule.get("max_delta") or rule["max_delta"] <= 0 or not rule.get("per_seconds") or rule["per_seconds"] <= 0:
+            bad_request("Una regla rate_of_change necesita max_delta > 0 y per_seconds > 0")
+        if hysteresis >= rule["max_delta"]:
+            bad_request("hysteresis debe ser menor que max_delta")
+    elif kind == "missing_data":
+        if not rule.get("max_gap_s") or rule["max_gap_s"] <= 0:
+            bad_request("Una regla missing_data necesita max_gap_s > 0")
+        if hysteresis >= rule["max_gap_s"]:
+            bad_request("hysteresis debe ser menor que max_gap_s")
+
+
+class CompiledRule:
+    """Regla lista para evaluar (sin acceso a MongoDB)"""
+
+    __slots__ = ("id", "name", "kind", "sensor_type", "severity", "min_value", "max_value",
+                 "max_delta", "per_seconds", "max_gap_s", "hysteresis", "min_refire_s", "scope")
+
+    def __init__(self, doc: dict):
+        self.id = str(doc["_id"])
+        self.name = doc["name"]
+        self.kind = doc["kind"]
+        self.sensor_type = doc.get("sensor_type")
+        self.severity = doc.get("severity", "warning")
+        self.min_value = doc.get("min_value")
+        self.max_value = doc.get("max_value")
+        self.max_delta = doc.get("max_delta")
+        self.per_seconds = doc.get("per_seconds") or 60
+        self.max_gap_s = doc.get("max_gap_s")
+        self.hysteresis = doc.get("hysteresis") or 0
+        self.min_refire_s = doc.get("min_refire_s") or 0
+        # Alcance de agrupación: servicio, flota (regla global) o ninguno (regla de un dispositivo)
+        if not doc.get("group_alerts", True) or doc.get("device_id") is not None:
+            self.scope = None
+        elif doc.get("service_id") is not None:
+            self.scope = f"service:{doc['service_id']}"
+        else:
+            self.scope = "fleet"
+
+    def check(
+        self, value: float, previous: Optional[Tuple[float, datetime]], timestamp: datetime, is_open: bool
+    ) -> Optional[str]:
+        """Mensaje si la lectura incumple la regla, None si la cumple (con histéresis si está abierta)"""
+        band = self.hysteresis if is_open else 0
+        if self.kind == "threshold":
+            if self.min_value is not None and value < self.min_value + band:
+                return f"{self.sensor_type} {value} < {self.min_value}"
+            if self.max_value is not None and value > self.max_value - band:
+                return f"{self.sensor_type} {value} > {self.max_value}"
+            return None
+        if previous is None:
+            return None
+        elapsed = (timestamp - previous[1]).total_seconds()
+        if elapsed <= 0:
+            return None
+        rate = abs(value - previous[0]) / elapsed * self.per_seconds
+        if rate > self.max_delta - band:
+            return f"{self.sensor_type} cambió {rate:.2f} por {self.per_seconds:g} s (máx. {self.max_delta:g})"
+        return None
+
+    def check_gap(self, gap: float, is_open: bool) -> Optional[str]:
+        """Mensaje si el dispositivo lleva demasiado sin reportar (missing_data)"""
+        if gap > self.max_gap_s - (self.hysteresis if is_open else 0):
+            return f"Sin lecturas desde hace {int(gap)} s (máx. {self.max_gap_s} s)"
+        return None
+
+
+class AlertState:
+    """Estado de una (regla, dispositivo); `updated` decide al fusionar entre workers"""
+
+    __slots__ = ("open", "since", "cleared_at", "group", "updated")
+
+    def __init__(self, open: bool, since: float, cleared_at: float, group: Optional[str], updated: float):
+        self.open = open
+        self.since = since
+        self.cleared_at = cleared_at
+        self.group = group
+        self.updated = updated
+
+    def dumps(self) -> str:
+        return json.dumps([int(self.open), self.since, self.cleared_at, self.group, self.updated])
+
+    @classmethod
+    def loads(cls, raw: str) -> "AlertState":
+        open, since, cleared_at, group, updated = json.loads(raw)
+        return cls(bool(open), since, cleared_at, group, updated)
+
+
+class RuleEngine:
+    """Tabla de reglas compilada y estado de evaluación del worker"""
+
+    _lock = threading.Lock()
+    _table: Dict[Tuple[Optional[int], str], List[CompiledRule]] = {}
+    _rules: Dict[str, CompiledRule] = {}
+    _missing: List[Tuple[CompiledRule, Optional[List[int]]]] = []
+    _last: Dict[Tuple[int, str], Tuple[float, datetime]] = {}
+    _state: Dict[Tuple[str, int], AlertState] = {}
+    _dirty: Set[Tuple[str, int]] = set()
+    _bursts: Dict[Tuple[str, str], Deque[float]] = {}
+    # Cambios de miembros de grupos pendientes de escribir: {(rule_id, scope): {device_id: activo}}
+    _group_changes: Dict[Tuple[str, str], Dict[int, bool]] = {}
+    _version: Optional[tuple] = None
+    _checked_at = 0.0
+    _compiled_at = 0.0
+    _last_sweep = 0.0
+    _task: Optional[asyncio.Task] = None
+
+    # -------------------------------------------------------------------------
+    # Compilación
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def compile(cls) -> int:
+        """Cargar reglas activas y reconstruir la tabla; devuelve cuántas se compilaron"""
+        table: Dict[Tuple[Optional[int], str], List[CompiledRule]] = {}
+        missing: List[Tuple[CompiledRule, Optional[List[int]]]] = []
+        rules: Dict[str, CompiledRule] = {}
+        docs = list(get_alert_rules_collection().find({"enabled": True}))
+        db = SessionLocal()
+        try:
+            for doc in docs:
+                rule = CompiledRule(doc)
+                rules[rule.id] = rule
+                if doc.get("service_id") is not None:
+                    entry = ServiceMembership.service(db, doc["service_id"])
+                    devices = entry["devices"] if entry else []
+                elif doc.get("device_id") is not None:
+                    devices = [doc["device_id"]]
+                else:
+                    devices = None
+                if rule.kind == "missing_data":
+                    missing.append((rule, devices))
+                    continue
+                for device_id in devices if devices is not None else [None]:
+                    table.setdefault((device_id, rule.sensor_type), []).append(rule)
+        finally:
+            db.close()
+
+        with cls._lock:
+            cls._table = table
+            cls._rules = rules
+            cls._missing = missing
+            cls._compiled_at = time.monotonic()
+        logger.info("Reglas de alerta compiladas: %d", len(docs))
+        return len(docs)
+
+    @classmethod
+    def _versions(cls) -> tuple:
+        try:
+            return tuple(RedisManager.get_connection().mget(
+                RULES_VERSION_KEY, MEMBERSHIP_VERSION_KEY, STATE_VERSION_KEY
+            ))
+        except Exception as e:
+            logger.warning(f"No se pudo leer la versión de reglas: {e}")
+            return (None, None, None)
+
+    @classmethod
+    def _maybe_refresh(cls) -> None:
+        now = time.monotonic()
+        if now - cls._checked_at < settings.ALERT_RULES_CHECK_S:
+            return
+        cls._checked_at = now
+        versions = cls._versions()
+        previous, cls._version = cls._version or (None, None, None), versions
+        if not cls._compiled_at or versions[:2] != previous[:2] or now - cls._compiled_at > FULL_RECOMPILE_S:
+            cls.compile()
+            cls._load_state()
+        elif versions[2] != previous[2]:
+            cls._load_state()
+
+    @classmethod
+    def invalidate(cls) -> None:
+        """Avisar a todos los workers que las reglas cambiaron"""
+        try:
+            RedisManager.get_connection().incr(RULES_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"No se pudo publicar el cambio de reglas: {e}")
+        cls._checked_at = 0.0
+
+    # -------------------------------------------------------------------------
+    # Estado de alertas (memoria + checkpoint en Redis)
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def _load_state(cls) -> None:
+        """Fusionar el checkpoint de Redis con el estado local"""
+        try:
+            stored = RedisManager.get_connection().hgetall(STATE_KEY)
+        except Exception as e:
+            logger.warning(f"No se pudo leer el estado de alertas: {e}")
+            return
+        with cls._lock:
+            for field, raw in stored.items():
+                rule_id, device_id = field.rsplit(":", 1)
+                if rule_id not in cls._rules:
+                    continue
+                key = (rule_id, int(device_id))
+                local = cls._state.get(key)
+                remote = AlertState.loads(raw)
+                if local is None or (remote.updated > local.updated and key not in cls._dirty):
+                    cls._state[key] = remote
+
+    @classmethod
+    def checkpoint(cls) -> None:
+        """Guardar estados modificados en Redis y escribir los cambios de grupos en MongoDB"""
+        now = time.time()
+        with cls._lock:
+            dirty = {key: cls._state[key].dumps() for key in cls._dirty if key in cls._state}
+            cls._dirty = set()
+            expired = [
+                key for key, state in cls._state.items()
+                if key[0] not in cls._rules or (
+                    not state.open
+                    and now - state.cleared_at > max(STATE_RETENTION_S, cls._rules[key[0]].min_refire_s)
+                )
+            ]
+            for key in expired:
+                del cls._state[key]
+            group_changes, cls._group_changes = cls._group_changes, {}
+            rules = cls._rules
+
+        if dirty or expired:
+            pipe = RedisManager.get_connection().pipeline(transaction=False)
+            if dirty:
+                pipe.hset(STATE_KEY, mapping={f"{r}:{d}": raw for (r, d), raw in dirty.items()})
+                pipe.incr(STATE_VERSION_KEY)
+            if expired:
+                pipe.hdel(STATE_KEY, *[f"{r}:{d}" for r, d in expired])
+            pipe.execute()
+
+        operations = []
+        for (rule_id, scope), changes in group_changes.items():
+            if rule_id in rules:
+                operations += cls._group_operations(rules[rule_id], scope, changes)
+        if operations:
+            get_alerts_collection().bulk_write(operations, ordered=True)
+
+    @classmethod
+    def _transition(
+        cls, rule: CompiledRule, device_id: int, message: Optional[str], doc: dict, now: float
+    ) -> Optional[UpdateOne]:
+        """Aplicar una evaluación al estado (con el lock tomado); devuelve la escritura necesaria o None"""
+        key = (rule.id, device_id)
+        state = cls._state.get(key)
+        if message:
+            if state is not None and state.open:
+                return None
+            if state is not None and now - state.cleared_at < rule.min_refire_s:
+                alert_transitions.inc(1, "suppressed")
+                return None
+            group = cls._group_for(rule, now)
+            cls._state[key] = AlertState(True, now, 0.0, group, now)
+            cls._dirty.add(key)
+            if group is not None:
+                cls._group_changes.setdefault((rule.id, group), {})[device_id] = True
+                alert_transitions.inc(1, "grouped")
+                return None
+            alert_transitions.inc(1, "opened")
+            return cls._open_operation(rule, device_id, doc, message)
+
+        if state is None or not state.open:
+            return None
+        state.open, state.cleared_at, state.updated = False, now, now
+        cls._dirty.add(key)
+        alert_transitions.inc(1, "resolved")
+        if state.group is not None:
+            cls._group_changes.setdefault((rule.id, state.group), {})[device_id] = False
+            return None
+        return cls._resolve_operation(rule.id, device_id)
+
+    @classmethod
+    def _group_for(cls, rule: CompiledRule, now: float) -> Optional[str]:
+        """Alcance de grupo si la regla está en tormenta (muchas aperturas recientes)"""
+        if rule.scope is None:
+            return None
+        burst = cls._bursts.setdefault((rule.id, rule.scope), deque())
+        while burst and now - burst[0] > settings.ALERT_GROUP_WINDOW_S:
+            burst.popleft()
+        burst.append(now)
+        return rule.scope if len(burst) > settings.ALERT_GROUP_THRESHOLD else None
+
+    # -------------------------------------------------------------------------
+    # Evaluación en la ingesta
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def evaluate(cls, device_id: int, documents: List[dict]) -> None:
+        """Evaluar un lote de lecturas normalizadas; escribe solo transiciones"""
+        try:
+            cls._maybe_refresh()
+        except Exception as e:
+            logger.warning(f"No se pudieron recompilar las reglas de alerta: {e}")
+
+        operations = []
+        now = time.time()
+        with cls._lock:
+            for doc in documents:
+                sensor_type, value, timestamp = doc["sensor_type"], doc["value"], to_utc_naive(doc["timestamp"])
+                rules = cls._table.get((device_id, sensor_type), []) + cls._table.get((None, sensor_type), [])
+                previous = cls._last.get((device_id, sensor_type))
+                for rule in rules:
+                    state = cls._state.get((rule.id, device_id))
+                    message = rule.check(value, previous, timestamp, state is not None and state.open)
+                    operation = cls._transition(rule, device_id, message, doc, now)
+                    if operation is not None:
+                        operations.append(operation)
+                if previous is None or timestamp >= previous[1]:
+                    cls._last[(device_id, sensor_type)] = (value, timestamp)
+
+        if operations:
+            try:
+                get_alerts_collection().bulk_write(operations, ordered=True)
+            except Exception as e:
+                logger.error(f"Error al registrar alertas del dispositivo {device_id}: {e}")
+
+    @classmethod
+    def _open_operation(cls, rule: CompiledRule, device_id: int, doc: dict, message: str) -> UpdateOne:
+        """Una sola alerta abierta por (regla, dispositivo)"""
+        key = {"rule_id": rule.id, "device_id": str(device_id), "resolved": False}
+        return UpdateOne(key, {"$setOnInsert": {
+            **key,
+            "type": "rule",
+            "kind": rule.kind,
+            "rule_name": rule.name,
+            "sensor_type": doc.get("sensor_type", rule.sensor_type),
+            "severity": rule.severity,
+            "value": doc.get("value"),
+            "message": message,
+            "timestamp": doc.get("timestamp", datetime.utcnow()),
+            "detected_at": datetime.utcnow(),
+        }}, upsert=True)
+
+    @classmethod
+    def _resolve_operation(cls, rule_id: str, device_id: int) -> UpdateMany:
+        return UpdateMany(
+            {"rule_id": rule_id, "device_id": str(device_id), "resolved": False},
+            {"$set": {"resolved": True, "resolved_at": datetime.utcnow(), "resolution": "auto"}}
+        )
+
+    @classmethod
+    def _group_operations(cls, rule: CompiledRule, scope: str, changes: Dict[int, bool]) -> list:
+        """Altas/bajas de miembros de la alerta agrupada; se resuelve al quedar sin miembros activos"""
+        key = {"type": "rule_group", "rule_id": rule.id, "scope": scope, "resolved": False}
+        added = [str(device_id) for device_id, active in changes.items() if active]
+        removed = [str(device_id) for device_id, active in changes.items() if not active]
+        now = datetime.utcnow()
+        operations = []
+        if added:
+            operations.append(UpdateOne(key, {
+                "$setOnInsert": {
+                    "kind": rule.kind,
+                    "rule_name": rule.name,
+                    "sensor_type": rule.sensor_type,
+                    "severity": rule.severity,
+                    "message": f"Regla '{rule.name}' activa en varios dispositivos ({scope})",
+                    "timestamp": now,
+                    "detected_at": now,
+                },
+                "$addToSet": {"device_ids": {"$each": added}, "active_device_ids": {"$each": added}},
+                "$set": {"updated_at": now},
+            }, upsert=True))
+        if removed:
+            operations.append(UpdateOne(key, {
+                "$pull": {"active_device_ids": {"$in": removed}}, "$set": {"updated_at": now}
+            }))
+            operations.append(UpdateMany(
+                {**key, "active_device_ids": {"$size": 0}},
+                {"$set": {"resolved": True, "resolved_at": now, "resolution": "auto"}}
+            ))
+        return operations
+
+    # -------------------------------------------------------------------------
+    # Tarea periódica: checkpoint y revisión de datos faltantes
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def start(cls) -> None:
+        """Iniciar checkpoint y revisión de missing_data (llamar desde el lifespan)"""
+        if cls._task is None:
+            cls._task = asyncio.get_running_loop().create_task(cls._run(), name="alert-rules")
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+            try:
+                await asyncio.to_thread(cls.checkpoint)
+            except Exception as e:
+                logger.warning(f"No se pudo guardar el estado de alertas: {e}")
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            await asyncio.sleep(settings.ALERT_STATE_CHECKPOINT_S)
+            try:
+                await asyncio.to_thread(cls.checkpoint)
+            except Exception as e:
+                logger.warning(f"Error al guardar el estado de alertas: {e}")
+
+            if time.monotonic() - cls._last_sweep < settings.ALERT_MISSING_SWEEP_S:
+                continue
+            cls._last_sweep = time.monotonic()
+            try:
+                ttl = max(1, int(settings.ALERT_MISSING_SWEEP_S * 0.9))
+                if RedisManager.get_connection().set(SWEEP_LOCK_KEY, "1", nx=True, ex=ttl):
+                    await asyncio.to_thread(cls.sweep_missing)
+            except Exception as e:
+                logger.warning(f"Error en la revisión de datos faltantes: {e}")
+
+    @classmethod
+    def sweep_missing(cls) -> int:
+        """Abrir/resolver alertas missing_data según la última ingesta; devuelve dispositivos sin datos"""
+        cls._maybe_refresh()
+        cls._load_state()
+        with cls._lock:
+            rules = list(cls._missing)
+        if not rules:
+            return 0
+
+        all_devices: Optional[List[int]] = None
+        if any(devices is None for _, devices in rules):
+            db = SessionLocal()
+            try:
+                all_devices = [row.id for row in db.query(Device.id).filter(Device.is_active.is_(True))]
+            finally:
+                db.close()
+
+        targets = [(rule, devices if devices is not None else all_devices) for rule, devices in rules]
+        device_ids = sorted({device_id for _, devices in targets for device_id in devices})
+        pipe = RedisManager.get_connection().pipeline(transaction=False)
+        for device_id in device_ids:
+            pipe.hget(WATERMARK_KEY.format(device_id), "at")
+        last_seen = {
+            device_id: int(at) / 1000 for device_id, at in zip(device_ids, pipe.execute()) if at is not None
+        }
+
+        now = time.time()
+        operations = []
+        breached = 0
+        with cls._lock:
+            for rule, devices in targets:
+                for device_id in devices:
+                    seen = last_seen.get(device_id)
+                    if seen is None:
+                        continue  # Sin marca (nunca reportó o se perdió): no se puede evaluar
+                    state = cls._state.get((rule.id, device_id))
+                    message = rule.check_gap(now - seen, state is not None and state.open)
+                    breached += message is not None
+                    operation = cls._transition(rule, device_id, message, {
+                        "sensor_type": rule.sensor_type,
+                        "timestamp": datetime.utcfromtimestamp(seen),
+                    }, now)
+                    if operation is not None:
+                        operations.append(operation)
+        if operations:
+            get_alerts_collection().bulk_write(operations, ordered=False)
+        # Publicar el estado ya: el próximo barrido puede tocarle a otro worker
+        cls.checkpoint()
+        return breached
+
+
+def rule_to_dict(doc: dict) -> dict:
+    """Documento de alert_rules como respuesta de API"""
+    result = {key: value for key, value in doc.items() if key != "_id"}
+    result["id"] = str(doc["_id"])
+    return result
+
+
+def ensure_sensor_type(sensor_type: Optional[str]) -> None:
+    if sensor_type is not None and sensor_type not in VALID_SENSOR_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sensor_type debe ser uno de: {', '.join(VALID_SENSOR_TYPES)}"
+        )
@@ -0,0 +1,447 @@
+"""
+Detección de anomalías en series de lecturas (NumPy)
+
+Las lecturas de un lote de dispositivos se cargan en una matriz
+(dispositivos x puntos, rellenada con NaN) y cada método se calcula de una
+vez para todas las filas, sin recorrer punto por punto en Python:
+
+- zscore: desviación respecto a la media/desviación de los `window` puntos
+  anteriores (sumas acumuladas por fila).
+- ewma: desviación respecto a la media y varianza exponenciales de los
+  puntos anteriores (kernel truncado aplicado con FFT sobre el eje temporal).
+- stuck: corridas de valores idénticos consecutivos (ej. DHT11 que repite
+  la última lectura), solo para temperature y humidity.
+
+La desviación se acota por abajo con la resolución del sensor (MIN_STD) para
+que una serie casi constante no produzca puntajes infinitos.
+
+AnomalyJob ejecuta la detección periódicamente sobre todos los dispositivos
+activos y guarda los hallazgos en la colección alerts (upsert idempotente).
+Un lock en Redis garantiza una ejecución por intervalo entre workers.
+"""
+import asyncio
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from pymongo import UpdateOne
+
+from core.config import RedisManager, settings
+from core.metrics import REGISTRY, Counter, Gauge
+from database.mongo import get_alerts_collection, get_sensor_readings_collection, query_comment
+
+logger = logging.getLogger(__name__)
+
+ZSCORE_WINDOW = 60
+ZSCORE_THRESHOLD = 4.0
+EWMA_ALPHA = 0.1
+EWMA_THRESHOLD = 4.0
+EWMA_TRUNCATION = 1e-4  # Peso mínimo del kernel exponencial antes de truncarlo
+MIN_HISTORY = 10  # Puntos previos necesarios para puntuar
+STUCK_MIN_RUN = 30
+STUCK_SENSOR_TYPES = ("temperature", "humidity")
+MAX_POINTS_PER_DEVICE = 20000
+MAX_ANOMALIES_PER_DEVICE = 500
+
+JOB_LOCK_KEY = "anomaly_job:lock"
+
+# Resolución de los sensores del firmware (DHT11: pasos de 1 °C y 1 %HR); ANOMALY_MIN_STD la ajusta
+DEFAULT_MIN_STD = {"temperature": 1.0, "humidity": 1.0, "battery": 1.0}
+
+
+def parse_min_std(spec: str) -> Dict[str, float]:
+    """Interpretar 'temperature=1.0,humidity=1.0' como dict de desviaciones mínimas"""
+    floors: Dict[str, float] = {}
+    for item in spec.split(","):
+        name, sep, value = item.strip().partition("=")
+        if not sep or not name:
+            continue
+        try:
+            floors[name.strip()] = max(float(value), 1e-6)
+        except ValueError:
+            continue
+    return floors
+
+
+MIN_STD = {**DEFAULT_MIN_STD, **parse_min_std(settings.ANOMALY_MIN_STD)}
+
+anomalies_detected = REGISTRY.register(Counter(
+    "anomalies_detected_total",
+    "Anomalías detectadas por el job periódico",
+    ["method"]
+))
+anomaly_job_duration = REGISTRY.register(Gauge(
+    "anomaly_job_last_duration_seconds",
+    "Duración de la última ejecución del job de anomalías"
+))
+
+
+# =============================================================================
+# Carga de series
+# =============================================================================
+
+def load_series(
+    device_ids: List[int],
+    sensor_type: str,
+    start_date: datetime,
+    end_date: datetime,
+) -> dict:
+    """
+    Lecturas de varios dispositivos como matriz rellenada con NaN.
+
+    Devuelve {'device_ids', 'values' (float64), 'timestamps' (datetime64[ms],
+    NaT de relleno), 'lengths'}; cada fila en orden cronológico y limitada a
+    los MAX_POINTS_PER_DEVICE puntos más recientes.
+    """
+    cursor = get_sensor_readings_collection().find(
+        {
+            "device_id": {"$in": [str(device_id) for device_id in device_ids]},
+            "sensor_type": sensor_type,
+            "timestamp": {"$gte": start_date, "$lte": end_date},
+        },
+        {"_id": 0, "device_id": 1, "value": 1, "timestamp": 1},
+        **query_comment()
+    ).batch_size(10000)
+
+    devices, values, timestamps = [], [], []
+    for doc in cursor:
+        devices.append(int(doc["device_id"]))
+        values.append(doc["value"])
+        timestamps.append(doc["timestamp"])
+
+    rows = {device_id: row for row, device_id in enumerate(device_ids)}
+    device_arr = np.fromiter((rows[d] for d in devices), dtype=np.int64, count=len(devices))
+    value_arr = np.asarray(values, dtype=np.float64)
+    ts_arr = np.asarray(timestamps, dtype="datetime64[ms]")
+
+    order = np.lexsort((ts_arr, device_arr))
+    device_arr, value_arr, ts_arr = device_arr[order], value_arr[order], ts_arr[order]
+
+    counts = np.bincount(device_arr, minlength=len(device_ids))
+    offsets = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    position = np.arange(len(device_arr)) - offsets[device_arr]
+    # Conservar los puntos más recientes de cada fila
+    keep = position >= counts[device_arr] - MAX_POINTS_PER_DEVICE
+    lengths = np.minimum(counts, MAX_POINTS_PER_DEVICE)
+    column = position - np.maximum(counts - MAX_POINTS_PER_DEVICE, 0)[device_arr]
+
+    width = int(lengths.max()) if len(lengths) else 0
+    value_mat = np.full((len(device_ids), width), np.nan)
+    ts_mat = np.full((len(device_ids), width), np.datetime64("NaT"), dtype="datetime64[ms]")
+    value_mat[device_arr[keep], column[keep]] = value_arr[keep]
+    ts_mat[device_arr[keep], column[keep]] = ts_arr[keep]
+    return {"device_ids": list(device_ids), "values": value_mat, "timestamps": ts_mat, "lengths": lengths}
+
+
+# =============================================================================
+# Puntajes (matrices dispositivos x puntos; NaN = sin dato)
+# =============================================================================
+
+def _centered(values: np.ndarray):
+    """Valores centrados por fila (mejor precisión en sumas de cuadrados) y máscara"""
+    mask = ~np.isnan(values)
+    filled = np.where(mask, values, 0.0)
+    row_mean = filled.sum(axis=1, keepdims=True) / np.maximum(mask.sum(axis=1, keepdims=True), 1)
+    centered = np.where(mask, filled - row_mean, 0.0)
+    return centered, mask.astype(np.float64)
+
+
+def _history_count(mask: np.ndarray) -> np.ndarray:
+    return np.cumsum(mask, axis=1) - mask
+
+
+def rolling_zscore(values: np.ndarray, window: int, min_std: float) -> np.ndarray:
+    """z-score de cada punto contra los `window` puntos anteriores"""
+    x, mask = _centered(values)
+    zeros = np.zeros((x.shape[0], 1))
+    s1 = np.concatenate((zeros, np.cumsum(x, axis=1)), axis=1)
+    s2 = np.concatenate((zeros, np.cumsum(x * x, axis=1)), axis=1)
+    cnt = np.concatenate((zeros, np.cumsum(mask, axis=1)), axis=1)
+
+    idx = np.arange(x.shape[1])
+    lo = np.maximum(idx - window, 0)
+    n = cnt[:, idx] - cnt[:, lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = (s1[:, idx] - s1[:, lo]) / n
+        var = (s2[:, idx] - s2[:, lo]) / n - mean * mean
+        z = (x - mean) / np.maximum(np.sqrt(np.clip(var, 0, None)), min_std)
+    return np.where((mask > 0) & (n >= MIN_HISTORY), z, np.nan)
+
+
+def _causal_convolve(signal: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+    """Convolución por fila (FFT) recortada a la longitud de la señal"""
+    width = signal.shape[1]
+    size = 1 << int(math.ceil(math.log2(max(width + len(kernel) - 1, 1))))
+    spectrum = np.fft.rfft(signal, size, axis=1) * np.fft.rfft(kernel, size)
+    return np.fft.irfft(spectrum, size, axis=1)[:, :width]
+
+
+def ewma_score(values: np.ndarray, alpha: float, min_std: float) -> np.ndarray:
+    """Desviación de cada punto respecto a la EWMA (media y varianza) de los anteriores"""
+    x, mask = _centered(values)
+    if x.shape[1] == 0:
+        return np.full(x.shape, np.nan)
+    length = min(int(math.ceil(math.log(EWMA_TRUNCATION) / math.log(1 - alpha))), x.shape[1])
+    # kernel[0] = 0: cada punto solo ve los anteriores
+    kernel = np.concatenate(([0.0], alpha * (1 - alpha) ** np.arange(length)))
+
+    weight = _causal_convolve(mask, kernel)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = _causal_convolve(x, kernel) / weight
+        var = _causal_convolve(x * x, kernel) / weight - mean * mean
+        score = (x - mean) / np.maximum(np.sqrt(np.clip(var, 0, None)), min_std)
+    valid = (mask > 0) & (_history_count(mask) >= MIN_HISTORY) & (weight > EWMA_TRUNCATION)
+    return np.where(valid, score, np.nan)
+
+
+def stuck_runs(values: np.ndarray, min_run: int) -> List[tuple]:
+    """(fila, columna inicial, largo) de cada corrida de valores idénticos >= min_run"""
+    if values.size == 0:
+        return []
+    starts = np.ones(values.shape, dtype=bool)
+    # NaN != NaN: el relleno nunca forma parte de una corrida
+    starts[:, 1:] = values[:, 1:] != values[:, :-1]
+    flat_starts = starts.ravel()
+    first = np.flatnonzero(flat_starts)
+    lengths = np.diff(np.append(first, flat_starts.size))
+    selected = (lengths >= min_run) & ~np.isnan(values.ravel()[first])
+    rows, cols = np.divmod(first[selected], values.shape[1])
+    return list(zip(rows.tolist(), cols.tolist(), lengths[selected].tolist()))
+
+
+def detect_anomalies(
+    series: dict,
+    sensor_type: str,
+    window: int = ZSCORE_WINDOW,
+    z_threshold: float = ZSCORE_THRESHOLD,
+    alpha: float = EWMA_ALPHA,
+    ewma_threshold: float = EWMA_THRESHOLD,
+    stuck_min_run: int = STUCK_MIN_RUN,
+) -> Dict[int, List[dict]]:
+    """Anomalías por dispositivo, en orden cronológico (las más recientes si exceden el máximo)"""
+    values, timestamps = series["values"], series["timestamps"]
+    min_std = MIN_STD.get(sensor_type, 0.1)
+    found: Dict[int, List[dict]] = {device_id: [] for device_id in series["device_ids"]}
+    if values.size == 0:
+        return found
+
+    def to_datetime(value) -> datetime:
+        return value.astype("datetime64[ms]").astype(datetime)
+
+    for method, scores, threshold in (
+        ("zscore", rolling_zscore(values, window, min_std), z_threshold),
+        ("ewma", ewma_score(values, alpha, min_std), ewma_threshold),
+    ):
+        with np.errstate(invalid="ignore"):
+            rows, cols = np.nonzero(np.abs(scores) > threshold)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            found[series["device_ids"][row]].append({
+                "method": method,
+                "timestamp": to_datetime(timestamps[row, col]),
+                "value": float(values[row, col]),
+                "score": round(float(scores[row, col]), 3),
+            })
+
+    if sensor_type in STUCK_SENSOR_TYPES:
+        for row, col, length in stuck_runs(values, stuck_min_run):
+            found[series["device_ids"][row]].append({
+                "method": "stuck",
+                "timestamp": to_datetime(timestamps[row, col]),
+                "end": to_datetime(timestamps[row, col + length - 1]),
+                "value": float(values[row, col]),
+                "run_length": int(length),
+            })
+
+    for device_id, items in found.items():
+        items.sort(key=lambda item: item["timestamp"])
+        found[device_id] = items[-MAX_ANOMALIES_PER_DEVICE:]
+    return found
+
+
+# =============================================================================
+# Job periódico
+# =============================================================================
+
+def _severity(anomaly: dict) -> str:
+    if anomaly["method"] == "stuck":
+        return "warning"
+    threshold = ZSCORE_THRESHOLD if anomaly["method"] == "zscore" else EWMA_THRESHOLD
+    return "critical" if abs(anomaly["score"]) >= 2 * threshold else "warning"
+
+
+class AnomalyJob:
+    """Detección periódica sobre todos los dispositivos activos (uno por intervalo entre workers)"""
+
+    _task: Optional[asyncio.Task] = None
+    _last_run: Optional[dict] = None
+
+    @classmethod
+    def start(cls) -> None:
+        """Iniciar el job en el event loop actual (llamar desde el lifespan)"""
+        if cls._task is not None or not settings.ANOMALY_JOB_ENABLED:
+            return
+        if settings.MONGO_BACKEND != "mongodb":
+            # mongomock no es seguro entre hilos (perfil bench)
+            logger.info("Job de anomalías deshabilitado con MONGO_BACKEND=%s", settings.MONGO_BACKEND)
+            return
+        cls._task = asyncio.get_running_loop().create_task(cls._run(), name="anomaly-job")
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                if cls._acquire():
+                    cls._last_run = await asyncio.to_thread(cls.run_once)
+            except Exception as e:
+                logger.warning(f"Error en el job de anomalías: {e}")
+            await asyncio.sleep(settings.ANOMALY_JOB_INTERVAL_S)
+
+    @classmethod
+    def _acquire(cls) -> bool:
+        """Lock por intervalo: el primer worker en tomarlo ejecuta, los demás esperan al siguiente"""
+        ttl = max(1, int(settings.ANOMALY_JOB_INTERVAL_S * 0.9))
+        return bool(RedisManager.get_connection().set(JOB_LOCK_KEY, "1", nx=True, ex=ttl))
+
+    @classmethod
+    def run_once(cls) -> dict:
+        """Analizar la ventana reciente de todos los dispositivos activos y registrar alertas"""
+        from database import SessionLocal
+        from models import Device
+        from core.readings import VALID_SENSOR_TYPES
+
+        started = time.perf_counter()
+        end_date = datetime.utcnow()
+        start_date = end_date - timedelta(hours=settings.ANOMALY_JOB_LOOKBACK_H)
+        db = SessionLocal()
+        try:
+            device_ids = [row.id for row in db.query(Device.id).filter(Device.is_active.is_(True)).order_by(Device.id)]
+        finally:
+            db.close()
+
+        batch = settings.ANOMALY_BATCH_DEVICES
+        counts: Dict[str, int] = {}
+        points = 0
+        for offset in range(0, len(device_ids), batch):
+            batch_ids = device_ids[offset:offset + batch]
+            for sensor_type in VALID_SENSOR_TYPES:
+                series = load_series(batch_ids, sensor_type, start_date, end_date)
+                points += int(series["lengths"].sum())
+                found = detect_anomalies(series, sensor_type)
+                for method, count in cls._record(found, sensor_type, series).items():
+                    counts[method] = counts.get(method, 0) + count
+
+        for method, count in counts.items():
+            anomalies_detected.inc(count, method)
+        duration = time.perf_counter() - started
+        anomaly_job_duration.set(duration)
+        summary = {
+            "at": end_date.isoformat(),
+            "devices": len(device_ids),
+            "points": points,
+            "anomalies": counts,
+            "duration_s": round(duration, 3),
+        }
+        logger.info("Job de anomalías: %s", summary)
+        return summary
+
+    @classmethod
+    def _record(cls, found: Dict[int, List[dict]], sensor_type: str, series: dict) -> Dict[str, int]:
+        """
+        Upsert en alerts (una por dispositivo, sensor, método e inicio); devuelve las nuevas por método.
+
+        Una corrida stuck que continúa una alerta abierta (mismo valor y se
+        solapa con su `end`) extiende esa alerta en lugar de crear otra: el
+        inicio de la corrida dentro de la ventana deslizante avanza en cada
+        ejecución cuando el sensor lleva atascado más que ANOMALY_JOB_LOOKBACK_H.
+        """
+        alerts = get_alerts_collection()
+        open_runs = cls._open_stuck_runs(alerts, found, sensor_type)
+        rows = {device_id: row for row, device_id in enumerate(series["device_ids"])}
+        operations, methods, counts = [], [], {}
+        detected_at = datetime.utcnow()
+        for device_id, anomalies in found.items():
+            for anomaly in anomalies:
+                if anomaly["method"] == "stuck":
+                    existing = _continued_run(open_runs.get(str(device_id), ()), anomaly)
+                    if existing is not None:
+                        # Puntos nuevos de la corrida desde el último `end` registrado
+                        ts_row = series["timestamps"][rows[device_id]]
+                        added = int(np.count_nonzero(
+                            (ts_row > np.datetime64(existing["end"], "ms"))
+                            & (ts_row <= np.datetime64(anomaly["end"], "ms"))
+                        ))
+                        if added:
+                            operations.append(UpdateOne(
+                                {"_id": existing["_id"]},
+                                {"$set": {"end": anomaly["end"]}, "$inc": {"run_length": added}}
+                            ))
+                            methods.append(None)
+                        continue
+                key = {
+                    "device_id": str(device_id),
+                    "sensor_type": sensor_type,
+                    "method": anomaly["method"],
+                    "timestamp": anomaly["timestamp"],
+                }
+                doc = {
+                    **key,
+                    "type": "anomaly",
+                    "value": anomaly["value"],
+                    "score": anomaly.get("score"),
+                    "severity": _severity(anomaly),
+                    "detected_at": detected_at,
+                    "resolved": False,
+                }
+                update = {"$setOnInsert": doc}
+                if anomaly["method"] == "stuck":
+                    update["$set"] = {"end": anomaly["end"], "run_length": anomaly["run_length"]}
+                operations.append(UpdateOne(key, update, upsert=True))
+                methods.append(anomaly["method"])
+        if operations:
+            result = alerts.bulk_write(operations, ordered=False)
+            # Solo cuentan las alertas nuevas (las repetidas ya existían por el upsert)
+            for index in result.upserted_ids:
+                counts[methods[index]] = counts.get(methods[index], 0) + 1
+        return counts
+
+    @classmethod
+    def _open_stuck_runs(cls, alerts, found: Dict[int, List[dict]], sensor_type: str) -> Dict[str, List[dict]]:
+        """Alertas stuck abiertas que terminan dentro de la ventana, por dispositivo"""
+        starts = [a["timestamp"] for items in found.values() for a in items if a["method"] == "stuck"]
+        if not starts:
+            return {}
+        open_runs: Dict[str, List[dict]] = {}
+        for doc in alerts.find(
+            {
+                "type": "anomaly",
+                "method": "stuck",
+                "sensor_type": sensor_type,
+                "resolved": False,
+                "device_id": {"$in": [str(d) for d, items in found.items() if items]},
+                "end": {"$gte": min(starts)},
+            },
+            {"device_id": 1, "value": 1, "timestamp": 1, "end": 1},
+        ):
+            open_runs.setdefault(doc["device_id"], []).append(doc)
+        return open_runs
+
+
+def _continued_run(candidates, anomaly: dict) -> Optional[dict]:
+    """Alerta abierta de la que `anomaly` es continuación (mismo valor, rangos solapados)"""
+    for doc in candidates:
+        if doc["value"] == anomaly["value"] and doc["timestamp"] <= anomaly["end"] and doc["end"] >= anomaly["timestamp"]:
+            return doc
+    return None
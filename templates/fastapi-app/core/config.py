@@ -8,10 +8,31 @@ load_dotenv()
 
 
 class Settings:
+    # Perfil: production | bench (SQLite + Redis y MongoDB en memoria, sin contenedores)
+    APP_PROFILE: str = os.getenv("APP_PROFILE", "production").lower()
+    
     SECRET_KEY: str = os.getenv("SECRET_KEY", "change-this-secret-key")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60))
-    DATABASE_URL: str = os.getenv("DATABASE_URL")
+    
+    # Argon2id (memoria en KiB); calibrar con: python -m benchmarks.argon2_calibrate
+    ARGON2_MEMORY_COST: int = int(os.getenv("ARGON2_MEMORY_COST", 102400))
+    ARGON2_TIME_COST: int = int(os.getenv("ARGON2_TIME_COST", 2))
+    ARGON2_PARALLELISM: int = int(os.getenv("ARGON2_PARALLELISM", 8))
+    DATABASE_URL: str = os.getenv("DATABASE_URL") or (
+        "sqlite:///./bench.db" if APP_PROFILE == "bench" else None
+    )
+    # Pools por worker: async (mysql+aiomysql: auth, usuarios, dispositivos) y síncrono (resto).
+    # Una petición a un router síncrono autenticado usa una conexión de cada uno:
+    # el techo por worker es la suma de ambos (5 + 10 = 15 por defecto)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 3))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 2))
+    DB_SYNC_POOL_SIZE: int = int(os.getenv("DB_SYNC_POOL_SIZE", 5))
+    DB_SYNC_MAX_OVERFLOW: int = int(os.getenv("DB_SYNC_MAX_OVERFLOW", 5))
+    
+    # Backends: redis | fakeredis, mongodb | mongomock (requirements-bench.txt)
+    REDIS_BACKEND: str = os.getenv("REDIS_BACKEND", "fakeredis" if APP_PROFILE == "bench" else "redis").lower()
+    MONGO_BACKEND: str = os.getenv("MONGO_BACKEND", "mongomock" if APP_PROFILE == "bench" else "mongodb").lower()
     
     # Redis
     REDIS_HOST: str = os.getenv("REDIS_HOST", "localhost")
@@ -25,6 +46,79 @@ class Settings:
     MONGO_PASSWORD: str = os.getenv("MONGO_PASSWORD", "")
     MONGO_DATABASE: str = os.getenv("MONGO_DATABASE", "iot_sensors")
     MONGO_AUTH_SOURCE: str = os.getenv("MONGO_AUTH_SOURCE", "admin")
+    
+    # Monitoreo de consultas lentas (milisegundos)
+    SLOW_QUERY_SQL_MS: float = float(os.getenv("SLOW_QUERY_SQL_MS", 100))
+    SLOW_QUERY_MONGO_MS: float = float(os.getenv("SLOW_QUERY_MONGO_MS", 100))
+    QUERY_STATS_MAX_FINGERPRINTS: int = int(os.getenv("QUERY_STATS_MAX_FINGERPRINTS", 500))
+    
+    # Logging (json | text); muestreo por logger: "logger=tasa,logger=tasa"
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "json").lower()
+    LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", "api.v1.routers.sensors.ingest=0.01")
+    LOG_QUEUE_SIZE: int = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+    
+    # Monitor del event loop (lag y detección de llamadas bloqueantes)
+    LOOP_MONITOR_ENABLED: bool = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    LOOP_MONITOR_INTERVAL_MS: float = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", 100))
+    LOOP_BLOCK_THRESHOLD_MS: float = float(os.getenv("LOOP_BLOCK_THRESHOLD_MS", 250))
+    
+    # Muestreo de recursos por worker (RSS, descriptores, hilos, tracemalloc opcional)
+    RUNTIME_STATS_ENABLED: bool = os.getenv("RUNTIME_STATS_ENABLED", "true").lower() == "true"
+    RUNTIME_SAMPLE_INTERVAL_S: float = float(os.getenv("RUNTIME_SAMPLE_INTERVAL_S", 60))
+    RUNTIME_MAX_SAMPLES: int = int(os.getenv("RUNTIME_MAX_SAMPLES", 1440))
+    RUNTIME_COUNT_GC_OBJECTS: bool = os.getenv("RUNTIME_COUNT_GC_OBJECTS", "true").lower() == "true"
+    RUNTIME_TRACEMALLOC: bool = os.getenv("RUNTIME_TRACEMALLOC", "false").lower() == "true"
+    RUNTIME_TRACEMALLOC_FRAMES: int = int(os.getenv("RUNTIME_TRACEMALLOC_FRAMES", 1))
+    
+    # Historial de varios dispositivos (GET /api/v1/fleet/readings)
+    FLEET_MAX_DEVICES: int = int(os.getenv("FLEET_MAX_DEVICES", 100))
+    FLEET_QUERY_CONCURRENCY: int = int(os.getenv("FLEET_QUERY_CONCURRENCY", 8))
+    
+    # Caché de consultas de lecturas: ETag por marca de ingesta + cuerpo en Redis
+    READINGS_CACHE_ENABLED: bool = os.getenv("READINGS_CACHE_ENABLED", "true").lower() == "true"
+    READINGS_CACHE_TTL_S: int = int(os.getenv("READINGS_CACHE_TTL_S", 300))
+    READINGS_CACHE_MAX_BYTES: int = int(os.getenv("READINGS_CACHE_MAX_BYTES", 512 * 1024))
+    
+    # Caché de membresía servicio -> dispositivos (respaldo para cambios fuera del ORM)
+    MEMBERSHIP_CACHE_TTL_S: int = int(os.getenv("MEMBERSHIP_CACHE_TTL_S", 300))
+    
+    # Job periódico de detección de anomalías (resultados en la colección alerts)
+    ANOMALY_JOB_ENABLED: bool = os.getenv("ANOMALY_JOB_ENABLED", "true").lower() == "true"
+    ANOMALY_JOB_INTERVAL_S: float = float(os.getenv("ANOMALY_JOB_INTERVAL_S", 300))
+    ANOMALY_JOB_LOOKBACK_H: float = float(os.getenv("ANOMALY_JOB_LOOKBACK_H", 6))
+    ANOMALY_BATCH_DEVICES: int = int(os.getenv("ANOMALY_BATCH_DEVICES", 50))
+    # Desviación mínima por sensor ("sensor=valor,..."), al menos su resolución (DHT11: 1.0)
+    ANOMALY_MIN_STD: str = os.getenv("ANOMALY_MIN_STD", "temperature=1.0,humidity=1.0,battery=1.0")
+    
+    # Reglas de alerta: frecuencia de revisión de cambios y de datos faltantes (segundos)
+    ALERT_RULES_CHECK_S: float = float(os.getenv("ALERT_RULES_CHECK_S", 5))
+    ALERT_MISSING_SWEEP_S: float = float(os.getenv("ALERT_MISSING_SWEEP_S", 60))
+    # Checkpoint del estado de alertas en Redis y agrupación en tormentas
+    ALERT_STATE_CHECKPOINT_S: float = float(os.getenv("ALERT_STATE_CHECKPOINT_S", 5))
+    ALERT_GROUP_THRESHOLD: int = int(os.getenv("ALERT_GROUP_THRESHOLD", 5))
+    ALERT_GROUP_WINDOW_S: float = float(os.getenv("ALERT_GROUP_WINDOW_S", 60))
+    
+    # Telemetría en vivo (SSE/WebSocket): cola por cliente, límite por worker y heartbeat
+    LIVE_STREAM_ENABLED: bool = os.getenv("LIVE_STREAM_ENABLED", "true").lower() == "true"
+    LIVE_QUEUE_SIZE: int = int(os.getenv("LIVE_QUEUE_SIZE", 100))
+    LIVE_MAX_SUBSCRIBERS: int = int(os.getenv("LIVE_MAX_SUBSCRIBERS", 1000))
+    LIVE_HEARTBEAT_S: float = float(os.getenv("LIVE_HEARTBEAT_S", 15))
+    LIVE_TICKET_TTL_S: int = int(os.getenv("LIVE_TICKET_TTL_S", 30))
+    
+    # Actividad de dispositivos: umbrales online/offline y barrido de alertas offline (segundos)
+    DEVICE_ONLINE_S: float = float(os.getenv("DEVICE_ONLINE_S", 120))
+    DEVICE_OFFLINE_S: float = float(os.getenv("DEVICE_OFFLINE_S", 900))
+    DEVICE_STATUS_SWEEP_S: float = float(os.getenv("DEVICE_STATUS_SWEEP_S", 60))
+    
+    # Guardar el X-Request-ID de la solicitud en cada documento de lectura
+    READINGS_STORE_REQUEST_ID: bool = os.getenv("READINGS_STORE_REQUEST_ID", "true").lower() == "true"
+    
+    # Datos sembrados en el perfil bench
+    BENCH_DEVICES: int = int(os.getenv("BENCH_DEVICES", 100))
+    BENCH_DEVICES_FILE: str = os.getenv("BENCH_DEVICES_FILE", "bench_devices.json")
+    BENCH_ADMIN_EMAIL: str = os.getenv("BENCH_ADMIN_EMAIL", "admin@example.com")
+    BENCH_ADMIN_PASSWORD: str = os.getenv("BENCH_ADMIN_PASSWORD", "Bench-Passw0rd")
 
 
 settings = Settings()
@@ -38,7 +132,11 @@ class RedisManager:
     @classmethod
     def get_connection(cls) -> redis.Redis:
         """Obtener o crear conexión Redis (singleton)"""
-        if cls._instance is None:
+        if cls._instance is None and settings.REDIS_BACKEND == "fakeredis":
+            # Perfil bench: Redis en proceso (un solo worker)
+            import fakeredis
+            cls._instance = fakeredis.FakeRedis(decode_responses=True)
+        elif cls._instance is None:
             cls._instance = redis.Redis(
                 host=settings.REDIS_HOST,
                 port=settings.REDIS_PORT,
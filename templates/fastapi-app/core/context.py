@@ -0,0 +1,125 @@
+"""
+Contexto por solicitud basado en contextvars
+
+El middleware guarda el scope ASGI y el identificador de la solicitud
+(X-Request-ID generado por Nginx) para que componentes sin acceso al
+Request (listeners de SQLAlchemy/PyMongo, logging, SessionLogger,
+métricas) puedan correlacionar su actividad. Los endpoints síncronos
+heredan el contexto al ejecutarse en el threadpool.
+"""
+import asyncio
+import re
+import time
+import uuid
+import weakref
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from core.metrics import http_request_duration
+
+_request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_query_counts: ContextVar[Optional[Dict[str, int]]] = ContextVar("query_counts", default=None)
+
+# Scope por tarea del event loop: permite a otros hilos (watchdog del loop)
+# saber qué solicitud está ejecutando una tarea sin acceder a su contexto
+_task_scopes: "weakref.WeakKeyDictionary[asyncio.Task, dict]" = weakref.WeakKeyDictionary()
+
+REQUEST_ID_HEADER = b"x-request-id"
+_VALID_REQUEST_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+
+def current_route() -> str:
+    """Ruta de la solicitud actual: 'METHOD endpoint' (o '-' fuera de una solicitud)"""
+    scope = _request_scope.get()
+    if scope is None:
+        return "-"
+    return f"{scope.get('method', '')} {_endpoint_name(scope)}"
+
+
+def current_request_id() -> Optional[str]:
+    """Identificador de la solicitud actual (None fuera de una solicitud)"""
+    return _request_id.get()
+
+
+def describe_task(task: Optional[asyncio.Task]) -> Dict[str, Optional[str]]:
+    """Ruta y request ID de la solicitud atendida por una tarea del event loop"""
+    scope = _task_scopes.get(task) if task is not None else None
+    if scope is None:
+        return {"route": "-", "request_id": None}
+    return {
+        "route": f"{scope.get('method', '')} {_endpoint_name(scope)}",
+        "request_id": scope.get("state", {}).get("request_id")
+    }
+
+
+def query_counts() -> Optional[Dict[str, int]]:
+    """Contador de consultas por huella de la solicitud actual"""
+    return _query_counts.get()
+
+
+def _endpoint_name(scope: dict) -> str:
+    endpoint = scope.get("endpoint")
+    return getattr(endpoint, "__name__", None) or scope.get("path", "")
+
+
+def _incoming_request_id(scope: dict) -> str:
+    """Usar X-Request-ID de Nginx si es válido; si no, generar uno"""
+    for name, value in scope.get("headers", ()):
+        if name == REQUEST_ID_HEADER:
+            candidate = value.decode("latin-1")
+            if _VALID_REQUEST_ID.match(candidate):
+                return candidate
+            break
+    return uuid.uuid4().hex
+
+
+class RequestContextMiddleware:
+    """
+    Middleware ASGI que publica scope y request ID en el contexto,
+    devuelve X-Request-ID en la respuesta y registra la duración
+    de la solicitud con el request ID como exemplar.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        request_id = _incoming_request_id(scope)
+        scope.setdefault("state", {})["request_id"] = request_id
+        header_value = request_id.encode("latin-1")
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_with_request_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(REQUEST_ID_HEADER, header_value)]
+            await send(message)
+
+        scope_token = _request_scope.set(scope)
+        id_token = _request_id.set(request_id)
+        counts_token = _query_counts.set({})
+        task = asyncio.current_task()
+        if task is not None:
+            _task_scopes[task] = scope
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            # Sin endpoint (404) se agrupa para no crear una serie por path
+            route = getattr(scope.get("endpoint"), "__name__", None) or "unmatched"
+            http_request_duration.observe(
+                time.perf_counter() - start,
+                scope.get("method", ""), route, str(status_code),
+                exemplar={"request_id": request_id}
+            )
+            if task is not None:
+                _task_scopes.pop(task, None)
+            _query_counts.reset(counts_token)
+            _request_id.reset(id_token)
+            _request_scope.reset(scope_token)
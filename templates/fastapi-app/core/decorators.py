@@ -1,5 +1,6 @@
 """Decoradores de validación"""
 from functools import wraps
+from typing import Dict, List
 from fastapi import HTTPException, status
 from core.validators import Validators
 import time
@@ -64,10 +65,14 @@ def async_safe(func):
     return wrapper
 
 
+# Ventanas de rate_limit por función (inspeccionadas por core/runtime_stats.py)
+RATE_LIMIT_BUCKETS: Dict[str, List[float]] = {}
+
+
 def rate_limit(max_requests: int = 100, time_window: int = 3600):
     """Decorador simple de limitación de tasa"""
     def decorator(func):
-        request_times = []
+        request_times = RATE_LIMIT_BUCKETS.setdefault(f"{func.__module__}.{func.__qualname__}", [])
         
         @wraps(func)
         async def wrapper(*args, **kwargs):
@@ -0,0 +1,192 @@
+"""
+Índice de actividad de dispositivos en Redis
+
+La ingesta y el login de dispositivos actualizan el sorted set
+devices:last_seen (miembro = device_id, score = epoch en segundos). El
+estado de la flota se obtiene con consultas por rango de score, sin
+recorrer sensor_readings:
+
+- online: visto en los últimos DEVICE_ONLINE_S
+- stale: visto hace entre DEVICE_ONLINE_S y DEVICE_OFFLINE_S
+- offline: sin noticias desde hace más de DEVICE_OFFLINE_S
+- never_seen: dispositivos que nunca reportaron (no están en el set; solo conteo)
+
+Un barrido periódico (un worker por intervalo) abre una alerta type=offline
+por cada dispositivo que cruzó DEVICE_OFFLINE_S desde el barrido anterior y
+resuelve las de los que volvieron a reportar.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pymongo import UpdateMany, UpdateOne
+
+from core.config import RedisManager, settings
+from core.metrics import REGISTRY, Gauge
+from database.mongo import get_alerts_collection
+
+logger = logging.getLogger(__name__)
+
+LAST_SEEN_KEY = "devices:last_seen"
+SWEEP_CUTOFF_KEY = "devices:offline_cutoff"
+SWEEP_LOCK_KEY = "devices:offline_sweep"
+STATUSES = ("online", "stale", "offline")
+
+devices_by_status = REGISTRY.register(Gauge(
+    "devices_status",
+    "Dispositivos por estado de actividad en el último barrido",
+    ["status"]
+))
+
+
+class DeviceLiveness:
+    """Última actividad por dispositivo (sorted set) y barrido de desconexiones"""
+
+    _task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def touch(cls, device_id: int) -> None:
+        """Registrar actividad del dispositivo (ingesta o login)"""
+        try:
+            RedisManager.get_connection().zadd(LAST_SEEN_KEY, {str(device_id): time.time()})
+        except Exception as e:
+            logger.warning(f"No se pudo registrar la actividad del dispositivo {device_id}: {e}")
+
+    @classmethod
+    def _cutoffs(cls, now: float):
+        return now - settings.DEVICE_ONLINE_S, now - settings.DEVICE_OFFLINE_S
+
+    @classmethod
+    def fleet_status(cls, limit: int, offset: int = 0) -> Dict[str, dict]:
+        """Conteos y páginas por estado para toda la flota (ZCOUNT / ZRANGEBYSCORE)"""
+        online_from, stale_from = cls._cutoffs(time.time())
+        ranges = {
+            "online": (online_from, "+inf"),
+            "stale": (stale_from, f"({online_from}"),
+            "offline": ("-inf", f"({stale_from}"),
+        }
+        pipe = RedisManager.get_connection().pipeline(transaction=False)
+        for low, high in ranges.values():
+            pipe.zcount(LAST_SEEN_KEY, low, high)
+            pipe.zrevrangebyscore(LAST_SEEN_KEY, high, low, start=offset, num=limit, withscores=True)
+        results = pipe.execute()
+        return {
+            status: {
+                "count": results[2 * i],
+                "devices": [_device_entry(member, score) for member, score in results[2 * i + 1]],
+            }
+            for i, status in enumerate(ranges)
+        }
+
+    @classmethod
+    def scoped_status(cls, device_ids: List[int], limit: int, offset: int = 0) -> Dict[str, dict]:
+        """Igual que fleet_status para un conjunto de dispositivos (ZMSCORE), más never_seen"""
+        online_from, stale_from = cls._cutoffs(time.time())
+        scores = RedisManager.get_connection().zmscore(LAST_SEEN_KEY, [str(d) for d in device_ids]) \
+            if device_ids else []
+        buckets: Dict[str, list] = {status: [] for status in STATUSES}
+        never_seen = 0
+        for device_id, score in zip(device_ids, scores):
+            if score is None:
+                never_seen += 1
+            elif score >= online_from:
+                buckets["online"].append((device_id, score))
+            elif score >= stale_from:
+                buckets["stale"].append((device_id, score))
+            else:
+                buckets["offline"].append((device_id, score))
+        result = {}
+        for status in STATUSES:
+            entries = sorted(buckets[status], key=lambda entry: entry[1], reverse=True)
+            result[status] = {
+                "count": len(entries),
+                "devices": [_device_entry(d, s) for d, s in entries[offset:offset + limit]],
+            }
+        result["never_seen"] = never_seen
+        return result
+
+    # -------------------------------------------------------------------------
+    # Barrido de desconexiones
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def start(cls) -> None:
+        """Iniciar el barrido de desconexiones (llamar desde el lifespan)"""
+        if cls._task is None:
+            cls._task = asyncio.get_running_loop().create_task(cls._run(), name="device-offline-sweep")
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            await asyncio.sleep(settings.DEVICE_STATUS_SWEEP_S)
+            try:
+                ttl = max(1, int(settings.DEVICE_STATUS_SWEEP_S * 0.9))
+                if RedisManager.get_connection().set(SWEEP_LOCK_KEY, "1", nx=True, ex=ttl):
+                    await asyncio.to_thread(cls.sweep)
+            except Exception as e:
+                logger.warning(f"Error en el barrido de dispositivos desconectados: {e}")
+
+    @classmethod
+    def sweep(cls) -> int:
+        """Abrir alertas de los recién desconectados y resolver las de los que volvieron; devuelve alertas abiertas"""
+        redis_conn = RedisManager.get_connection()
+        now = time.time()
+        online_from, cutoff = cls._cutoffs(now)
+        previous = redis_conn.get(SWEEP_CUTOFF_KEY)
+        # Primer barrido: solo los que cruzaron el umbral en el último intervalo (no abrir el histórico)
+        previous = float(previous) if previous else cutoff - settings.DEVICE_STATUS_SWEEP_S
+
+        pipe = redis_conn.pipeline(transaction=False)
+        pipe.zrangebyscore(LAST_SEEN_KEY, previous, f"({cutoff}", withscores=True)
+        pipe.zcount(LAST_SEEN_KEY, online_from, "+inf")
+        pipe.zcount(LAST_SEEN_KEY, cutoff, f"({online_from}")
+        pipe.zcount(LAST_SEEN_KEY, "-inf", f"({cutoff}")
+        newly_offline, online, stale, offline = pipe.execute()
+        devices_by_status.set(online, "online")
+        devices_by_status.set(stale, "stale")
+        devices_by_status.set(offline, "offline")
+
+        alerts = get_alerts_collection()
+        detected_at = datetime.utcnow()
+        operations = []
+        for member, score in newly_offline:
+            key = {"type": "offline", "device_id": member, "resolved": False}
+            operations.append(UpdateOne(key, {"$setOnInsert": {
+                **key,
+                "severity": "warning",
+                "message": f"Sin actividad desde hace más de {int(settings.DEVICE_OFFLINE_S)} s",
+                "timestamp": datetime.utcfromtimestamp(score),
+                "detected_at": detected_at,
+            }}, upsert=True))
+
+        # Alertas abiertas cuyo dispositivo volvió a reportar
+        open_ids = [doc["device_id"] for doc in alerts.find({"type": "offline", "resolved": False}, {"device_id": 1})]
+        if open_ids:
+            scores = redis_conn.zmscore(LAST_SEEN_KEY, open_ids)
+            back = [device_id for device_id, score in zip(open_ids, scores) if score is not None and score >= cutoff]
+            if back:
+                operations.append(UpdateMany(
+                    {"type": "offline", "device_id": {"$in": back}, "resolved": False},
+                    {"$set": {"resolved": True, "resolved_at": detected_at, "resolution": "auto"}}
+                ))
+        if operations:
+            alerts.bulk_write(operations, ordered=True)
+        # Avanzar el corte solo tras escribir las alertas: si Mongo falla, el próximo barrido reintenta el rango
+        redis_conn.set(SWEEP_CUTOFF_KEY, cutoff)
+        return len(newly_offline)
+
+
+def _device_entry(member, score: float) -> dict:
+    return {"device_id": int(member), "last_seen": datetime.utcfromtimestamp(score)}
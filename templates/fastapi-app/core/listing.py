@@ -0,0 +1,82 @@
+"""
+Listados paginados de entidades SQL (dispositivos, usuarios)
+
+Paginación keyset por id ascendente: el cursor es el último id de la
+página, así cada página es un rango sobre el índice en lugar de un OFFSET
+que recorre las filas anteriores. Solo se seleccionan las columnas
+pedidas (`fields`) y las filas se devuelven como dicts planos, sin
+instanciar objetos ORM ni tocar relaciones. El total (COUNT con los mismos
+filtros) solo se calcula si se pide.
+"""
+import base64
+import binascii
+from typing import Iterable, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+MAX_CURSOR_ID = 2 ** 63
+
+
+def parse_fields(fields: Optional[str], allowed: Iterable[str]) -> List[str]:
+    """Campos separados por comas validados contra `allowed`; id siempre se incluye"""
+    allowed = list(allowed)
+    if not fields:
+        return allowed
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos no válidos: {', '.join(unknown)}. Permitidos: {', '.join(allowed)}"
+        )
+    return ["id"] + [name for name in dict.fromkeys(requested) if name != "id"]
+
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(str(last_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        last_id = int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        last_id = -1
+    # Fuera de BIGINT el driver lanza OverflowError (500)
+    if not 0 <= last_id < MAX_CURSOR_ID:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor inválido")
+    return last_id
+
+
+def prefix_filter(column, prefix: str):
+    """LIKE 'prefijo%' con comodines escapados (usa el índice de la columna)"""
+    escaped = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.like(f"{escaped}%", escape="\\")
+
+
+async def keyset_page(
+    db: AsyncSession,
+    model,
+    fields: List[str],
+    conditions: list,
+    cursor: Optional[str],
+    limit: int,
+    include_total: bool = False,
+) -> dict:
+    """{'count', 'next_cursor', 'total', 'items'} de una página ordenada por id"""
+    statement = select(*(getattr(model, name) for name in fields)).where(*conditions)
+    if cursor:
+        statement = statement.where(model.id > decode_cursor(cursor))
+    rows = (await db.execute(statement.order_by(model.id).limit(limit + 1))).all()
+
+    items = [dict(row._mapping) for row in rows[:limit]]
+    total = None
+    if include_total:
+        total = await db.scalar(select(func.count()).select_from(model).where(*conditions))
+    return {
+        "count": len(items),
+        "next_cursor": encode_cursor(items[-1]["id"]) if len(rows) > limit else None,
+        "total": total,
+        "items": items,
+    }
@@ -0,0 +1,227 @@
+"""
+Telemetría en vivo: fan-out de lecturas por Redis pub/sub
+
+La ingesta publica cada lote una sola vez en el canal readings:live
+("<device_id>|<json>"). Cada worker mantiene un hilo suscrito al canal que
+entrega los mensajes al event loop, donde se reparten a los suscriptores
+locales (SSE/WebSocket) según su filtro de dispositivos. Cada suscriptor
+tiene una cola acotada (LIVE_QUEUE_SIZE): si el cliente no consume a tiempo
+se descarta el mensaje más antiguo y se le avisa con un evento `dropped`.
+
+El WebSocket no recibe el JWT: el cliente canjea un ticket de un solo uso
+(POST /live/ticket, válido LIVE_TICKET_TTL_S) para que el token no quede en
+la query string ni en los logs de acceso. La sesión de un stream se revalida
+cada LIVE_HEARTBEAT_S (logout o expiración cierran la conexión).
+"""
+import asyncio
+import logging
+import secrets
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+import orjson
+from fastapi import HTTPException, status
+
+from core.config import RedisManager, settings
+from core.metrics import REGISTRY, Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "readings:live"
+TICKET_PREFIX = "live:ticket:"
+
+live_subscribers = REGISTRY.register(Gauge(
+    "live_subscribers",
+    "Suscriptores de telemetría en vivo conectados a este worker"
+))
+live_dropped = REGISTRY.register(Counter(
+    "live_messages_dropped_total",
+    "Mensajes descartados por suscriptores lentos (cola llena)"
+))
+
+
+class Subscriber:
+    """Cola acotada de un cliente; devices None = toda la flota"""
+
+    __slots__ = ("queue", "devices", "dropped")
+
+    def __init__(self, devices: Optional[List[int]]):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.LIVE_QUEUE_SIZE)
+        self.devices = devices
+        self.dropped = 0
+
+    def offer(self, payload: str) -> None:
+        """Encolar sin bloquear; con la cola llena se descarta el más antiguo"""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            live_dropped.inc(1)
+        self.queue.put_nowait(payload)
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class LiveHub:
+    """Suscriptores locales del worker y escucha del canal de Redis"""
+
+    _by_device: Dict[int, Set[Subscriber]] = {}
+    _fleet: Set[Subscriber] = set()
+    _count = 0
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _thread: Optional[threading.Thread] = None
+    _stop = threading.Event()
+
+    # -------------------------------------------------------------------------
+    # Publicación (ingesta)
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def publish(cls, device_id: int, documents: List[dict]) -> None:
+        """Publicar un lote de lecturas normalizadas (un PUBLISH por lote)"""
+        if not settings.LIVE_STREAM_ENABLED:
+            return
+        payload = orjson.dumps({
+            "type": "reading",
+            "device_id": device_id,
+            "readings": [
+                {
+                    "sensor_type": doc["sensor_type"],
+                    "value": doc["value"],
+                    "unit": doc["unit"],
+                    "timestamp": doc["timestamp"],
+                }
+                for doc in documents
+            ],
+        }).decode()
+        try:
+            RedisManager.get_connection().publish(CHANNEL, f"{device_id}|{payload}")
+        except Exception as e:
+            logger.warning(f"No se pudo publicar la lectura en vivo: {e}")
+
+    # -------------------------------------------------------------------------
+    # Suscripción (solo desde el event loop)
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def ensure_capacity(cls) -> None:
+        if not settings.LIVE_STREAM_ENABLED:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Telemetría en vivo deshabilitada")
+        if cls._count >= settings.LIVE_MAX_SUBSCRIBERS:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Máximo de suscriptores en vivo alcanzado, reintentar más tarde"
+            )
+
+    @classmethod
+    def subscribe(cls, devices: Optional[List[int]]) -> Subscriber:
+        subscriber = Subscriber(devices)
+        if devices is None:
+            cls._fleet.add(subscriber)
+        else:
+            for device_id in devices:
+                cls._by_device.setdefault(device_id, set()).add(subscriber)
+        cls._count += 1
+        live_subscribers.set(cls._count)
+        return subscriber
+
+    @classmethod
+    def unsubscribe(cls, subscriber: Subscriber) -> None:
+        if subscriber.devices is None:
+            cls._fleet.discard(subscriber)
+        else:
+            for device_id in subscriber.devices:
+                subscribers = cls._by_device.get(device_id)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del cls._by_device[device_id]
+        cls._count -= 1
+        live_subscribers.set(cls._count)
+
+    # -------------------------------------------------------------------------
+    # Tickets de WebSocket y revalidación de sesión
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def issue_ticket(cls, principal: dict) -> str:
+        """Ticket de un solo uso con el principal y su sesión (Redis, LIVE_TICKET_TTL_S)"""
+        ticket = secrets.token_urlsafe(32)
+        data = {"type": principal["type"], "id": principal["data"].id, "session": principal["session"]}
+        RedisManager.get_connection().set(
+            TICKET_PREFIX + ticket, orjson.dumps(data).decode(), ex=settings.LIVE_TICKET_TTL_S
+        )
+        return ticket
+
+    @classmethod
+    def redeem_ticket(cls, ticket: str) -> Optional[dict]:
+        """Consumir el ticket (GETDEL: un segundo uso no encuentra nada); None si no existe o expiró"""
+        raw = RedisManager.get_connection().getdel(TICKET_PREFIX + ticket)
+        return orjson.loads(raw) if raw else None
+
+    @classmethod
+    def session_active(cls, session: dict) -> bool:
+        """El token no expiró y sigue siendo la sesión activa en Redis (sin logout)"""
+        from core.services import SessionService
+        exp = session.get("exp")
+        if exp is not None and time.time() >= exp:
+            return False
+        try:
+            return SessionService.verify_token_session(session["user_id"], session["user_type"], session["jti"])
+        except Exception as e:
+            # Redis caído: no cortar streams por un error transitorio
+            logger.warning(f"No se pudo revalidar la sesión del stream: {e}")
+            return True
+
+    @classmethod
+    def _dispatch(cls, message: str) -> None:
+        device_id, payload = message.split("|", 1)
+        for subscriber in cls._by_device.get(int(device_id), ()):
+            subscriber.offer(payload)
+        for subscriber in cls._fleet:
+            subscriber.offer(payload)
+
+    # -------------------------------------------------------------------------
+    # Escucha del canal (hilo por worker)
+    # -------------------------------------------------------------------------
+
+    @classmethod
+    def start(cls) -> None:
+        """Iniciar la escucha de Redis (llamar desde el lifespan)"""
+        if not settings.LIVE_STREAM_ENABLED or cls._thread is not None:
+            return
+        cls._loop = asyncio.get_running_loop()
+        cls._stop.clear()
+        cls._thread = threading.Thread(target=cls._listen, name="live-stream", daemon=True)
+        cls._thread.start()
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._thread is not None:
+            cls._stop.set()
+            await asyncio.to_thread(cls._thread.join, 5)
+            cls._thread = None
+
+    @classmethod
+    def _listen(cls) -> None:
+        while not cls._stop.is_set():
+            pubsub = None
+            try:
+                pubsub = RedisManager.get_connection().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                while not cls._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    # Sin suscriptores locales no se pasa nada al event loop
+                    if message is not None and cls._count:
+                        cls._loop.call_soon_threadsafe(cls._dispatch, message["data"])
+            except Exception as e:
+                logger.warning(f"Escucha de telemetría en vivo interrumpida: {e}")
+                cls._stop.wait(1.0)
+            finally:
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
@@ -0,0 +1,155 @@
+"""
+Monitor de latencia del event loop y detector de llamadas bloqueantes
+
+Una tarea asyncio duerme en intervalos fijos y mide cuánto tarda en
+despertar (lag). Un hilo watchdog vigila el latido de esa tarea: si el
+loop lleva más del umbral sin atenderla, captura la pila del hilo del
+loop (la corrutina que está bloqueando) junto con la ruta y el request ID
+de la solicitud en curso, y la registra en el log al liberarse el loop.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Deque, List, Optional
+
+from core.config import settings
+from core.context import describe_task
+from core.metrics import REGISTRY, Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_FRAMES = 40
+MAX_RECENT_EVENTS = 50
+
+loop_lag = REGISTRY.register(Histogram(
+    "event_loop_lag_seconds",
+    "Retraso del event loop al despertar la tarea de monitoreo",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+))
+loop_lag_last = REGISTRY.register(Gauge(
+    "event_loop_lag_last_seconds",
+    "Último retraso medido del event loop"
+))
+loop_blocked = REGISTRY.register(Counter(
+    "event_loop_blocked_total",
+    "Bloqueos del event loop por encima del umbral"
+))
+
+
+class LoopMonitor:
+    """Tarea de medición de lag + hilo watchdog (uno por worker)"""
+
+    _task: Optional[asyncio.Task] = None
+    _watchdog: Optional[threading.Thread] = None
+    _stop = threading.Event()
+    _lock = threading.Lock()
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    _loop_thread_id: Optional[int] = None
+    _heartbeat = 0.0
+    _pending: Optional[dict] = None
+    _events: Deque[dict] = deque(maxlen=MAX_RECENT_EVENTS)
+
+    @classmethod
+    def start(cls) -> None:
+        """Iniciar el monitor en el event loop actual (llamar desde el lifespan)"""
+        if cls._task is not None or not settings.LOOP_MONITOR_ENABLED:
+            return
+        cls._loop = asyncio.get_running_loop()
+        cls._loop_thread_id = threading.get_ident()
+        cls._heartbeat = time.monotonic()
+        cls._stop.clear()
+        cls._task = cls._loop.create_task(cls._measure(), name="loop-monitor")
+        cls._watchdog = threading.Thread(target=cls._watch, name="loop-watchdog", daemon=True)
+        cls._watchdog.start()
+        logger.info(
+            "Monitor del event loop iniciado (intervalo %s ms, umbral %s ms)",
+            settings.LOOP_MONITOR_INTERVAL_MS, settings.LOOP_BLOCK_THRESHOLD_MS
+        )
+
+    @classmethod
+    async def stop(cls) -> None:
+        """Detener la tarea y el watchdog"""
+        cls._stop.set()
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+        if cls._watchdog is not None:
+            cls._watchdog.join(timeout=1)
+            cls._watchdog = None
+
+    @classmethod
+    async def _measure(cls) -> None:
+        interval = settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        threshold = settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        while True:
+            expected = time.monotonic() + interval
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            cls._heartbeat = now
+            loop_lag.observe(lag)
+            loop_lag_last.set(lag)
+            if lag >= threshold:
+                cls._report(lag)
+
+    @classmethod
+    def _watch(cls) -> None:
+        """Hilo watchdog: capturar la pila del loop mientras está bloqueado"""
+        threshold = settings.LOOP_BLOCK_THRESHOLD_MS / 1000
+        check_every = min(threshold / 2, settings.LOOP_MONITOR_INTERVAL_MS / 1000)
+        while not cls._stop.wait(check_every):
+            stalled = time.monotonic() - cls._heartbeat
+            if stalled < threshold + settings.LOOP_MONITOR_INTERVAL_MS / 1000:
+                continue
+            with cls._lock:
+                if cls._pending is not None:
+                    continue
+            frame = sys._current_frames().get(cls._loop_thread_id)
+            if frame is None:
+                continue
+            task = asyncio.current_task(cls._loop)
+            event = describe_task(task)
+            event["stack"] = traceback.format_stack(frame)[-MAX_STACK_FRAMES:]
+            with cls._lock:
+                cls._pending = event
+
+    @classmethod
+    def _report(cls, lag: float) -> None:
+        with cls._lock:
+            event = cls._pending or {"route": "-", "request_id": None, "stack": []}
+            cls._pending = None
+        event["lag_ms"] = round(lag * 1000, 1)
+        event["at"] = time.time()
+        loop_blocked.inc()
+        cls._events.append(event)
+        logger.warning(
+            "Event loop bloqueado %.1f ms en %s (request %s)%s",
+            event["lag_ms"], event["route"], event["request_id"] or "-",
+            ("\n" + "".join(event["stack"])) if event["stack"] else " (sin pila capturada)",
+            extra={"blocked_route": event["route"], "lag_ms": event["lag_ms"]}
+        )
+
+    @classmethod
+    def recent(cls, limit: int = 20) -> List[dict]:
+        """Bloqueos recientes de este worker (más reciente primero)"""
+        return list(cls._events)[-limit:][::-1]
+
+    @classmethod
+    def status(cls) -> dict:
+        return {
+            "pid": os.getpid(),
+            "running": cls._task is not None,
+            "interval_ms": settings.LOOP_MONITOR_INTERVAL_MS,
+            "threshold_ms": settings.LOOP_BLOCK_THRESHOLD_MS,
+            "since_heartbeat_ms": round((time.monotonic() - cls._heartbeat) * 1000, 1) if cls._task else None,
+            "blocked_events": len(cls._events)
+        }
@@ -0,0 +1,164 @@
+"""
+Métricas en formato Prometheus/OpenMetrics sin dependencias externas
+
+Cada worker mantiene su propio registro; la exposición incluye la
+etiqueta `pid` para distinguir workers. Los histogramas guardan el último
+exemplar por bucket (request_id de la solicitud que lo generó), visible
+en formato OpenMetrics.
+"""
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """Histograma acumulativo con exemplars por bucket"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        self._series: Dict[LabelValues, dict] = {}
+
+    def observe(self, value: float, *labels: str, exemplar: Optional[Dict[str, str]] = None) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = {
+                    "counts": [0] * len(self.buckets),
+                    "sum": 0.0,
+                    "count": 0,
+                    "exemplars": [None] * len(self.buckets)
+                }
+                self._series[labels] = series
+            series["sum"] += value
+            series["count"] += 1
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    if exemplar:
+                        series["exemplars"][i] = (exemplar, value, time.time())
+                    break
+
+    def render(self, openmetrics: bool) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("pid",)
+        pid = str(os.getpid())
+        with self._lock:
+            snapshot = [(labels, dict(s, counts=list(s["counts"]), exemplars=list(s["exemplars"])))
+                        for labels, s in self._series.items()]
+        for labels, series in snapshot:
+            values = labels + (pid,)
+            cumulative = 0
+            for i, bound in enumerate(self.buckets):
+                cumulative += series["counts"][i]
+                label_str = _format_labels(names + ("le",), values + (_format_value(bound),))
+                line = f"{self.name}_bucket{label_str} {cumulative}"
+                exemplar = series["exemplars"][i]
+                if openmetrics and exemplar is not None:
+                    ex_labels, ex_value, ex_ts = exemplar
+                    line += f" # {_format_labels(tuple(ex_labels), tuple(ex_labels.values()))} {ex_value} {ex_ts:.3f}"
+                lines.append(line)
+            lines.append(f"{self.name}_sum{_format_labels(names, values)} {series['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(names, values)} {series['count']}")
+        return lines
+
+
+class Gauge:
+    """Valor instantáneo por conjunto de etiquetas"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[LabelValues, float] = {}
+
+    def set(self, value: float, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self, openmetrics: bool) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        names = self.labelnames + ("pid",)
+        pid = str(os.getpid())
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(names, labels + (pid,))} {_format_value(value)}")
+        return lines
+
+
+class Counter(Gauge):
+    """Contador monótono (el nombre debe terminar en _total)"""
+
+    def set(self, value: float, *labels: str) -> None:
+        raise TypeError("Un Counter solo puede incrementarse")
+
+    def render(self, openmetrics: bool) -> List[str]:
+        lines = super().render(openmetrics)
+        # OpenMetrics declara la familia sin el sufijo _total
+        family = self.name[:-len("_total")] if openmetrics and self.name.endswith("_total") else self.name
+        lines[0] = f"# HELP {family} {self.documentation}"
+        lines[1] = f"# TYPE {family} counter"
+        return lines
+
+
+class MetricsRegistry:
+    """Registro de métricas del worker"""
+
+    def __init__(self):
+        self._metrics: List = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self, openmetrics: bool = False) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render(openmetrics))
+        if openmetrics:
+            lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+http_request_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds",
+    "Duración de solicitudes HTTP por endpoint",
+    labelnames=("method", "route", "status")
+))
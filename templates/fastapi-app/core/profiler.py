@@ -0,0 +1,266 @@
+"""
+Profiler de muestreo bajo demanda - Diagnóstico en producción
+
+Muestrea periódicamente las pilas de todos los hilos del worker
+(sys._current_frames) desde un hilo propio, sin dependencias externas.
+El resultado se exporta en formato speedscope (https://www.speedscope.app)
+o en formato "collapsed" compatible con flamegraph.pl.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Límites de seguridad para no degradar el worker
+MAX_PROFILE_SECONDS = 60
+MAX_PROFILE_REQUESTS = 50
+MIN_INTERVAL_MS = 1
+MAX_STACK_DEPTH = 128
+
+# Hojas de pila que indican un hilo en espera (threadpool ocioso, loop en select)
+IDLE_LEAVES = {
+    "Condition.wait", "Event.wait", "Thread.join", "Queue.get", "SimpleQueue.get",
+    "EpollSelector.select", "SelectSelector.select", "KqueueSelector.select"
+}
+IDLE_MAX_DEPTH = 12
+
+Frame = Tuple[str, str, int]
+
+
+class ProfilerBusyError(RuntimeError):
+    """Ya hay una sesión de perfilado activa en este worker"""
+
+
+class SamplingProfiler:
+    """Muestreador de pilas de hilos en un hilo de fondo"""
+
+    def __init__(self, interval_ms: float = 5.0, name: str = "worker"):
+        self.interval = max(interval_ms, MIN_INTERVAL_MS) / 1000.0
+        self.name = name
+        self.samples: Dict[int, Counter] = {}
+        self.thread_names: Dict[int, str] = {}
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Iniciar muestreo"""
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> "SamplingProfiler":
+        """Detener muestreo y esperar al hilo"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.started_at is not None:
+            self.duration = time.perf_counter() - self.started_at
+        return self
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                stack = self._extract_stack(frame)
+                if not stack:
+                    continue
+                self.samples.setdefault(ident, Counter())[stack] += 1
+                self.thread_names.setdefault(ident, names.get(ident, str(ident)))
+            self.sample_count += 1
+
+    @staticmethod
+    def _extract_stack(frame) -> Tuple[Frame, ...]:
+        """Pila de la raíz a la hoja, identificando cada función por archivo y línea inicial"""
+        stack: List[Frame] = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            name = getattr(code, "co_qualname", code.co_name)
+            stack.append((name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        stack.reverse()
+        return tuple(stack)
+
+    @staticmethod
+    def _idle(stack: Tuple[Frame, ...]) -> bool:
+        """Hilos esperando trabajo (sin interés para el análisis)"""
+        return stack[-1][0] in IDLE_LEAVES and len(stack) <= IDLE_MAX_DEPTH
+
+    def collapsed(self) -> str:
+        """Formato folded: 'hilo;f1;f2;f3 N' por línea"""
+        lines = []
+        for ident, counter in self.samples.items():
+            thread_name = self.thread_names.get(ident, str(ident))
+            for stack, count in counter.items():
+                if self._idle(stack):
+                    continue
+                frames = ";".join(f"{name} ({os.path.basename(path)}:{line})" for name, path, line in stack)
+                lines.append(f"{thread_name};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+
+def to_speedscope(profilers: List[SamplingProfiler], name: str) -> dict:
+    """Exportar uno o varios perfiles a un documento speedscope (un perfil por hilo)"""
+    frame_index: Dict[Frame, int] = {}
+    frames: List[dict] = []
+    profiles: List[dict] = []
+
+    def index_of(frame: Frame) -> int:
+        idx = frame_index.get(frame)
+        if idx is None:
+            idx = len(frames)
+            frame_index[frame] = idx
+            frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+        return idx
+
+    for profiler in profilers:
+        for ident, counter in profiler.samples.items():
+            samples = []
+            weights = []
+            for stack, count in counter.items():
+                if profiler._idle(stack):
+                    continue
+                samples.append([index_of(f) for f in stack])
+                weights.append(count * profiler.interval)
+            if not samples:
+                continue
+            profiles.append({
+                "type": "sampled",
+                "name": f"{profiler.name} / {profiler.thread_names.get(ident, ident)}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights
+            })
+
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "iot-platform-sampling-profiler",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": profiles
+    }
+
+
+class ProfilerManager:
+    """Estado de perfilado del worker: una sola sesión a la vez"""
+
+    _lock = threading.Lock()
+    _busy = False
+
+    # Modo "siguientes K solicitudes"
+    _route_prefix: Optional[str] = None
+    _remaining = 0
+    _requested = 0
+    _interval_ms = 5.0
+    _captured: List[SamplingProfiler] = []
+    _armed_at: Optional[float] = None
+
+    @classmethod
+    def acquire(cls) -> None:
+        """Reservar el profiler o lanzar ProfilerBusyError"""
+        with cls._lock:
+            if cls._busy:
+                raise ProfilerBusyError("Ya existe una sesión de perfilado activa en este worker")
+            cls._busy = True
+
+    @classmethod
+    def release(cls) -> None:
+        with cls._lock:
+            cls._busy = False
+
+    @classmethod
+    def arm_requests(cls, route_prefix: str, count: int, interval_ms: float) -> None:
+        """Perfilar las siguientes `count` solicitudes cuyo path empiece por `route_prefix`"""
+        cls.acquire()
+        with cls._lock:
+            cls._route_prefix = route_prefix
+            cls._remaining = count
+            cls._requested = count
+            cls._interval_ms = interval_ms
+            cls._captured = []
+            cls._armed_at = time.time()
+        logger.info(f"Profiler armado para {count} solicitudes en {route_prefix}")
+
+    @classmethod
+    def cancel_requests(cls) -> None:
+        """Desarmar el modo por solicitudes y liberar el profiler"""
+        with cls._lock:
+            was_armed = cls._route_prefix is not None
+            cls._route_prefix = None
+            cls._remaining = 0
+            if was_armed:
+                cls._busy = False
+
+    @classmethod
+    def claim_request(cls, path: str) -> Optional[SamplingProfiler]:
+        """Si la solicitud coincide con la ruta armada, devolver un profiler para ella"""
+        if cls._route_prefix is None:
+            return None
+        with cls._lock:
+            if cls._route_prefix is None or cls._remaining <= 0 or not path.startswith(cls._route_prefix):
+                return None
+            cls._remaining -= 1
+            number = cls._requested - cls._remaining
+            interval_ms = cls._interval_ms
+        return SamplingProfiler(interval_ms=interval_ms, name=f"{path} #{number}")
+
+    @classmethod
+    def complete_request(cls, profiler: SamplingProfiler) -> None:
+        with cls._lock:
+            cls._captured.append(profiler)
+            if cls._remaining <= 0 and len(cls._captured) >= cls._requested and cls._route_prefix is not None:
+                cls._route_prefix = None
+                cls._busy = False
+                logger.info(f"Profiler: {len(cls._captured)} solicitudes capturadas")
+
+    @classmethod
+    def request_status(cls) -> dict:
+        with cls._lock:
+            return {
+                "pid": os.getpid(),
+                "armed": cls._route_prefix is not None,
+                "route_prefix": cls._route_prefix,
+                "requested": cls._requested,
+                "captured": len(cls._captured),
+                "armed_at": cls._armed_at
+            }
+
+    @classmethod
+    def captured(cls) -> List[SamplingProfiler]:
+        with cls._lock:
+            return list(cls._captured)
+
+
+class ProfilerMiddleware:
+    """Middleware ASGI que perfila las solicitudes seleccionadas por ProfilerManager"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        profiler = ProfilerManager.claim_request(scope.get("path", ""))
+        if profiler is None:
+            return await self.app(scope, receive, send)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            ProfilerManager.complete_request(profiler)
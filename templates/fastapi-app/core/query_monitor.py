@@ -0,0 +1,217 @@
+"""
+Monitoreo de consultas lentas - SQLAlchemy y PyMongo
+
+Registra latencia, filas devueltas y ruta de origen de cada sentencia,
+agregadas por huella normalizada (literales reemplazados por '?').
+Las sentencias que superan el umbral configurado se registran en el log.
+El contador por solicitud permite detectar patrones N+1.
+"""
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from pymongo import monitoring
+
+from core.config import settings
+from core.context import current_route, query_counts
+
+logger = logging.getLogger(__name__)
+
+MAX_ROUTES_PER_FINGERPRINT = 10
+
+_SQL_STRING = re.compile(r"'(?:[^']|'')*'")
+_SQL_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SQL_PARAM = re.compile(r"%\([^)]+\)s|%s|\?|:\w+")
+_SQL_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+# Comandos de PyMongo que no aportan información de rendimiento
+_MONGO_IGNORED = {"ping", "hello", "ismaster", "isMaster", "buildinfo", "saslStart", "saslContinue", "endSessions"}
+
+
+def sql_fingerprint(statement: str) -> str:
+    """Normalizar sentencia SQL: literales y parámetros a '?', listas IN colapsadas"""
+    text = _SQL_STRING.sub("?", statement)
+    text = _SQL_PARAM.sub("?", text)
+    text = _SQL_NUMBER.sub("?", text)
+    text = _SQL_IN_LIST.sub("IN (?+)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _shape(value: Any) -> Any:
+    """Reemplazar valores por '?' conservando operadores y claves"""
+    if isinstance(value, dict):
+        return {k: _shape(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        if value and all(isinstance(v, dict) for v in value):
+            return [_shape(v) for v in value]
+        return "?+" if value else "?"
+    return "?"
+
+
+def mongo_fingerprint(command_name: str, command: dict) -> str:
+    """Huella de un comando MongoDB: colección, filtro, orden y pipeline sin valores"""
+    collection = command.get(command_name)
+    parts = [f"{command_name} {collection}"]
+    for key in ("filter", "q", "query"):
+        if key in command:
+            parts.append(f"{key}={_shape(command[key])}")
+    if "sort" in command:
+        parts.append(f"sort={dict(command['sort'])}")
+    if "pipeline" in command:
+        parts.append(f"pipeline={[list(stage.keys())[0] for stage in command['pipeline']]}")
+        if command["pipeline"] and "$match" in command["pipeline"][0]:
+            parts.append(f"match={_shape(command['pipeline'][0]['$match'])}")
+    if "updates" in command or "deletes" in command:
+        ops = command.get("updates") or command.get("deletes") or []
+        if ops:
+            parts.append(f"q={_shape(ops[0].get('q', {}))}")
+    return " ".join(parts)
+
+
+class QueryStats:
+    """Agregado de consultas por huella (thread-safe, tamaño acotado)"""
+
+    _lock = threading.Lock()
+    _stats: Dict[Tuple[str, str], dict] = {}
+    _dropped = 0
+
+    @classmethod
+    def record(cls, backend: str, fingerprint: str, elapsed_ms: float, rows: Optional[int], route: str) -> None:
+        counts = query_counts()
+        per_request = 0
+        if counts is not None:
+            key = f"{backend}:{fingerprint}"
+            per_request = counts.get(key, 0) + 1
+            counts[key] = per_request
+
+        with cls._lock:
+            entry = cls._stats.get((backend, fingerprint))
+            if entry is None:
+                if len(cls._stats) >= settings.QUERY_STATS_MAX_FINGERPRINTS:
+                    cls._dropped += 1
+                    return
+                entry = {
+                    "backend": backend,
+                    "fingerprint": fingerprint,
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "slow_count": 0,
+                    "max_per_request": 0,
+                    "routes": {}
+                }
+                cls._stats[(backend, fingerprint)] = entry
+
+            entry["count"] += 1
+            entry["total_ms"] += elapsed_ms
+            if elapsed_ms > entry["max_ms"]:
+                entry["max_ms"] = elapsed_ms
+            if rows is not None and rows > 0:
+                entry["rows"] += rows
+            if per_request > entry["max_per_request"]:
+                entry["max_per_request"] = per_request
+            routes = entry["routes"]
+            if route in routes or len(routes) < MAX_ROUTES_PER_FINGERPRINT:
+                routes[route] = routes.get(route, 0) + 1
+
+            threshold = settings.SLOW_QUERY_SQL_MS if backend == "sql" else settings.SLOW_QUERY_MONGO_MS
+            slow = elapsed_ms >= threshold
+            if slow:
+                entry["slow_count"] += 1
+
+        if slow:
+            logger.warning(
+                "Consulta lenta [%s] %.1f ms filas=%s ruta=%s: %s",
+                backend, elapsed_ms, rows, route, fingerprint
+            )
+
+    @classmethod
+    def top(cls, limit: int = 20, backend: Optional[str] = None, order_by: str = "total_ms") -> dict:
+        """Resumen top-N ordenado por tiempo total, máximo, cantidad o repeticiones por solicitud"""
+        with cls._lock:
+            entries = [dict(e, routes=dict(e["routes"])) for e in cls._stats.values()
+                       if backend is None or e["backend"] == backend]
+            dropped = cls._dropped
+
+        for e in entries:
+            e["avg_ms"] = round(e["total_ms"] / e["count"], 3) if e["count"] else 0.0
+            e["total_ms"] = round(e["total_ms"], 3)
+            e["max_ms"] = round(e["max_ms"], 3)
+
+        entries.sort(key=lambda e: e[order_by], reverse=True)
+        return {
+            "fingerprints": len(entries),
+            "dropped": dropped,
+            "thresholds_ms": {"sql": settings.SLOW_QUERY_SQL_MS, "mongo": settings.SLOW_QUERY_MONGO_MS},
+            "top": entries[:limit]
+        }
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._stats = {}
+            cls._dropped = 0
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Registrar listeners de cursor en el engine de SQLAlchemy"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts: List[float] = conn.info.get("query_start") or []
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        rows = cursor.rowcount if cursor.rowcount is not None and cursor.rowcount >= 0 else None
+        QueryStats.record("sql", sql_fingerprint(statement), elapsed_ms, rows, current_route())
+
+
+class MongoCommandMonitor(monitoring.CommandListener):
+    """Listener de comandos PyMongo con latencia por huella"""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[Any, int], Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name in _MONGO_IGNORED:
+            return
+        fingerprint = mongo_fingerprint(event.command_name, event.command)
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (fingerprint, current_route())
+
+    def succeeded(self, event):
+        self._finish(event, event.reply)
+
+    def failed(self, event):
+        self._finish(event, None)
+
+    def _finish(self, event, reply: Optional[dict]) -> None:
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        fingerprint, route = pending
+        QueryStats.record("mongo", fingerprint, event.duration_micros / 1000, self._rows(reply), route)
+
+    @staticmethod
+    def _rows(reply: Optional[dict]) -> Optional[int]:
+        """Documentos devueltos (find/aggregate/getMore) o afectados (insert/update/delete)"""
+        if not reply:
+            return None
+        cursor = reply.get("cursor")
+        if isinstance(cursor, dict):
+            batch = cursor.get("firstBatch", cursor.get("nextBatch"))
+            return len(batch) if batch is not None else None
+        n = reply.get("n")
+        return n if isinstance(n, int) else None
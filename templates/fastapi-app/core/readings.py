@@ -0,0 +1,320 @@
+"""
+Consultas de lecturas de sensores (MongoDB)
+
+Agregaciones por ventana de tiempo ejecutadas en la base de datos con
+$dateTrunc + $group (MongoDB 7.0: $percentile como acumulador). Con el
+backend mongomock (perfil bench), que no soporta esos operadores, se
+calcula lo mismo en Python sobre las lecturas filtradas.
+
+Últimos valores por dispositivo y tipo de sensor: $sort + $group con
+$first sobre el índice (device_id, sensor_type, timestamp).
+
+Historial de varios dispositivos: un cursor por dispositivo (cada uno
+recorre el índice device_id + timestamp con su propio límite) ejecutados
+en paralelo en un pool compartido.
+
+Respuestas de historial: proyección mínima y filas como dicts planos
+(reading_rows) serializadas con orjson, sin construir un modelo Pydantic
+por lectura ni revalidar la respuesta completa.
+"""
+import contextvars
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from core.config import settings
+from database.mongo import get_sensor_readings_collection, query_comment
+
+VALID_SENSOR_TYPES = ["temperature", "humidity", "battery"]
+
+# Unidades de ventana: sufijo -> (unidad de $dateTrunc, segundos)
+BUCKET_UNITS = {
+    "s": ("second", 1),
+    "m": ("minute", 60),
+    "h": ("hour", 3600),
+    "d": ("day", 86400),
+    "w": ("week", 7 * 86400),
+}
+MAX_BUCKETS = 5000
+_BUCKET_RE = re.compile(r"^(\d{1,4})([smhdw])$")
+
+READING_PROJECTION = {"_id": 0, "sensor_type": 1, "value": 1, "unit": 1, "location": 1, "timestamp": 1}
+
+# Cursores de historial en paralelo (compartido por las solicitudes del worker)
+_fleet_executor = ThreadPoolExecutor(max_workers=settings.FLEET_QUERY_CONCURRENCY, thread_name_prefix="fleet-query")
+
+
+def validate_sensor_type(sensor_type: Optional[str]) -> None:
+    """Validar sensor_type contra los tipos normalizados"""
+    if sensor_type is not None and sensor_type not in VALID_SENSOR_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"sensor_type debe ser uno de: {', '.join(VALID_SENSOR_TYPES)}"
+        )
+
+
+def parse_bucket(bucket: str) -> Tuple[str, int, int]:
+    """Convertir '15m', '1h', '1d' en (unidad, binSize, segundos por ventana)"""
+    match = _BUCKET_RE.match(bucket or "")
+    if not match or int(match.group(1)) == 0:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="bucket debe tener el formato <n><unidad> con unidad s, m, h, d o w (ej: 15m, 1h, 1d)"
+        )
+    size = int(match.group(1))
+    unit, seconds = BUCKET_UNITS[match.group(2)]
+    return unit, size, size * seconds
+
+
+def to_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """Normalizar a UTC sin zona (como se guardan los timestamps en MongoDB)"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def timestamp_filter(start_date: Optional[datetime], end_date: Optional[datetime]) -> Dict[str, datetime]:
+    """Condición de rango sobre timestamp ($gte/$lte)"""
+    condition = {}
+    if start_date:
+        condition["$gte"] = start_date
+    if end_date:
+        condition["$lte"] = end_date
+    return condition
+
+
+def parse_device_ids(values: Iterable[str]) -> List[int]:
+    """IDs de dispositivo desde parámetros repetidos o separados por comas (sin duplicados)"""
+    device_ids: List[int] = []
+    for value in values:
+        for part in value.split(","):
+            part = part.strip()
+            if not part:
+                continue
+            # isdigit() acepta dígitos Unicode ('²') que int() rechaza; 18 dígitos caben en BIGINT
+            if not (part.isascii() and part.isdigit() and len(part) <= 18):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"device_ids debe contener enteros separados por comas: '{part}'"
+                )
+            if int(part) not in device_ids:
+                device_ids.append(int(part))
+    if not device_ids:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="device_ids no puede estar vacío")
+    if len(device_ids) > settings.FLEET_MAX_DEVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo {settings.FLEET_MAX_DEVICES} dispositivos por consulta"
+        )
+    return device_ids
+
+
+def readings_filter(
+    device_id: int,
+    sensor_type: Optional[str] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> dict:
+    """Filtro de lecturas de un dispositivo (mismo criterio que get_device_readings)"""
+    query_filter = {"device_id": str(device_id)}
+    if sensor_type:
+        query_filter["sensor_type"] = sensor_type
+    if start_date or end_date:
+        query_filter["timestamp"] = timestamp_filter(start_date, end_date)
+    return query_filter
+
+
+def find_readings(collection, query_filter: dict, limit: int):
+    """Cursor de lecturas con proyección mínima, más recientes primero, en un solo lote"""
+    cursor = collection.find(query_filter, READING_PROJECTION, **query_comment())
+    return cursor.sort("timestamp", -1).limit(limit).batch_size(limit)
+
+
+def reading_rows(docs: Iterable[dict]) -> List[dict]:
+    """Documentos proyectados con el formato de SensorReadingItem (value como float)"""
+    return [
+        {
+            "sensor_type": doc["sensor_type"],
+            "value": float(doc["value"]),
+            "unit": doc["unit"],
+            "location": doc.get("location"),
+            "timestamp": doc["timestamp"],
+        }
+        for doc in docs
+    ]
+
+
+def fetch_devices_readings(
+    device_ids: List[int],
+    sensor_type: Optional[str],
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    limit: int,
+) -> Dict[int, List[dict]]:
+    """Últimas `limit` lecturas de cada dispositivo, más recientes primero"""
+    collection = get_sensor_readings_collection()
+
+    def fetch(device_id: int) -> List[dict]:
+        return reading_rows(find_readings(collection, readings_filter(device_id, sensor_type, start_date, end_date), limit))
+
+    # mongomock no es seguro entre hilos: consultas secuenciales en el perfil bench
+    if settings.MONGO_BACKEND != "mongodb" or len(device_ids) == 1:
+        return {device_id: fetch(device_id) for device_id in device_ids}
+
+    # Cada tarea hereda el contexto de la solicitud (request ID en `comment`, conteo de consultas)
+    futures = {
+        device_id: _fleet_executor.submit(contextvars.copy_context().run, fetch, device_id)
+        for device_id in device_ids
+    }
+    return {device_id: future.result() for device_id, future in futures.items()}
+
+
+def latest_readings(device_ids: List[int], sensor_type: Optional[str] = None) -> Dict[int, Dict[str, dict]]:
+    """Última lectura de cada tipo de sensor por dispositivo"""
+    match = {"device_id": {"$in": [str(device_id) for device_id in device_ids]}}
+    if sensor_type:
+        match["sensor_type"] = sensor_type
+    # El $sort coincide con el índice (device_id, sensor_type, timestamp): el $group con
+    # $first lee una entrada por grupo (DISTINCT_SCAN) en lugar de todo el historial
+    pipeline = [
+        {"$match": match},
+        {"$sort": {"device_id": 1, "sensor_type": 1, "timestamp": -1}},
+        {"$group": {
+            "_id": {"device_id": "$device_id", "sensor_type": "$sensor_type"},
+            "value": {"$first": "$value"},
+            "unit": {"$first": "$unit"},
+            "location": {"$first": "$location"},
+            "timestamp": {"$first": "$timestamp"},
+        }},
+    ]
+    latest: Dict[int, Dict[str, dict]] = {device_id: {} for device_id in device_ids}
+    for doc in get_sensor_readings_collection().aggregate(pipeline, **query_comment()):
+        latest[int(doc["_id"]["device_id"])][doc["_id"]["sensor_type"]] = {
+            "value": float(doc["value"]),
+            "unit": doc["unit"],
+            "location": doc.get("location"),
+            "timestamp": doc["timestamp"],
+        }
+    return latest
+
+
+def aggregate_readings(
+    device_id: int,
+    sensor_type: str,
+    bucket: str,
+    start_date: datetime,
+    end_date: datetime,
+) -> List[dict]:
+    """Estadísticas por ventana: count, min, max, mean, stddev, p50, p95"""
+    return aggregate_devices_readings([device_id], sensor_type, bucket, start_date, end_date)[device_id]
+
+
+def aggregate_devices_readings(
+    device_ids: List[int],
+    sensor_type: str,
+    bucket: str,
+    start_date: datetime,
+    end_date: datetime,
+) -> Dict[int, List[dict]]:
+    """Estadísticas por ventana de cada dispositivo en una sola agregación"""
+    unit, bin_size, bucket_seconds = parse_bucket(bucket)
+    if end_date <= start_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="end_date debe ser posterior a start_date")
+    if (end_date - start_date).total_seconds() / bucket_seconds > MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El rango genera más de {MAX_BUCKETS} ventanas; usar un bucket mayor"
+        )
+
+    if not device_ids:
+        return {}
+
+    match = {
+        "device_id": str(device_ids[0]) if len(device_ids) == 1 else {"$in": [str(d) for d in device_ids]},
+        "sensor_type": sensor_type,
+        "timestamp": timestamp_filter(start_date, end_date),
+    }
+    collection = get_sensor_readings_collection()
+    results: Dict[int, List[dict]] = {device_id: [] for device_id in device_ids}
+
+    if settings.MONGO_BACKEND != "mongodb":
+        cursor = collection.find(match, {"_id": 0, "device_id": 1, "value": 1, "timestamp": 1})
+        docs: Dict[int, List[dict]] = {}
+        for doc in cursor:
+            docs.setdefault(int(doc["device_id"]), []).append(doc)
+        for device_id, device_docs in docs.items():
+            results[device_id] = _aggregate_in_python(device_docs, unit, bin_size, bucket_seconds)
+        return results
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "device_id": "$device_id",
+                "start": {"$dateTrunc": {"date": "$timestamp", "unit": unit, "binSize": bin_size}},
+            },
+            "count": {"$sum": 1},
+            "min": {"$min": "$value"},
+            "max": {"$max": "$value"},
+            "mean": {"$avg": "$value"},
+            "stddev": {"$stdDevPop": "$value"},
+            "percentiles": {"$percentile": {"input": "$value", "p": [0.5, 0.95], "method": "approximate"}},
+        }},
+        {"$sort": {"_id.device_id": 1, "_id.start": 1}},
+    ]
+    for doc in collection.aggregate(pipeline, allowDiskUse=True, **query_comment()):
+        results[int(doc["_id"]["device_id"])].append({
+            "start": doc["_id"]["start"],
+            "count": doc["count"],
+            "min": float(doc["min"]),
+            "max": float(doc["max"]),
+            "mean": doc["mean"],
+            "stddev": doc["stddev"],
+            "p50": float(doc["percentiles"][0]),
+            "p95": float(doc["percentiles"][1]),
+        })
+    return results
+
+
+def _truncate(timestamp: datetime, unit: str, bin_size: int, bucket_seconds: int) -> datetime:
+    """Equivalente a $dateTrunc (UTC; semanas desde el domingo como MongoDB)"""
+    if unit == "week":
+        day = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        sunday = day - timedelta(days=(day.weekday() + 1) % 7)
+        reference = datetime(2000, 1, 2)  # Domingo
+        weeks = (sunday - reference).days // 7
+        return reference + timedelta(weeks=weeks - weeks % bin_size)
+    epoch_seconds = int((timestamp - datetime(2000, 1, 1)).total_seconds())
+    return datetime(2000, 1, 1) + timedelta(seconds=epoch_seconds - epoch_seconds % bucket_seconds)
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    """Percentil por rango más cercano (como method: approximate)"""
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(p * len(ordered)) - 1))]
+
+
+def _aggregate_in_python(cursor, unit: str, bin_size: int, bucket_seconds: int) -> List[dict]:
+    groups: Dict[datetime, List[float]] = {}
+    for doc in cursor:
+        key = _truncate(doc["timestamp"], unit, bin_size, bucket_seconds)
+        groups.setdefault(key, []).append(doc["value"])
+
+    buckets = []
+    for start in sorted(groups):
+        values = sorted(groups[start])
+        mean = sum(values) / len(values)
+        buckets.append({
+            "start": start,
+            "count": len(values),
+            "min": float(values[0]),
+            "max": float(values[-1]),
+            "mean": mean,
+            "stddev": math.sqrt(sum((v - mean) ** 2 for v in values) / len(values)),
+            "p50": float(_percentile(values, 0.5)),
+            "p95": float(_percentile(values, 0.95)),
+        })
+    return buckets
@@ -0,0 +1,161 @@
+"""
+Caché HTTP de consultas de lecturas (ETag / Last-Modified)
+
+Cada ingesta avanza una marca de agua por dispositivo en Redis
+(readings:watermark:<id>, campos v = versión y at = ms de la última
+ingesta). El ETag de una consulta es un hash de la ruta, los parámetros
+normalizados y la versión de cada dispositivo consultado: mientras no
+lleguen lecturas nuevas no cambia, y If-None-Match se responde con 304
+sin consultar MongoDB. Con READINGS_CACHE_ENABLED el cuerpo serializado
+se guarda además en Redis bajo el ETag (las claves viejas expiran solas).
+Una petición con Cache-Control: no-cache consulta MongoDB de todos modos
+(benchmarks). La cabecera X-Cache indica HIT (304 o cuerpo cacheado),
+MISS o BYPASS.
+
+Si una marca se pierde (expulsión LRU de Redis) se reinicia con el reloj
+en ms, mayor que cualquier versión anterior, así que un ETag viejo no
+vuelve a ser válido. Si Redis no responde, las consultas se sirven sin
+caché.
+"""
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from fastapi import Request, Response, status
+
+from core.config import RedisManager, settings
+from core.metrics import REGISTRY, Counter
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_KEY = "readings:watermark:{}"
+BODY_KEY = "readings:cache:{}"
+CACHE_CONTROL = "private, no-cache"
+
+readings_cache_results = REGISTRY.register(
+    Counter("readings_cache_results_total", "Consultas de lecturas por resultado de caché", ["result"])
+)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Comparación débil de If-None-Match (RFC 9110)"""
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+class ReadingsCache:
+    """Marcas de agua de ingesta y validadores/caché de respuestas de lecturas"""
+
+    @classmethod
+    def mark_ingest(cls, device_id: int) -> None:
+        """Avanzar la marca del dispositivo (llamar después de insertar lecturas)"""
+        now = _now_ms()
+        key = WATERMARK_KEY.format(device_id)
+        try:
+            pipe = RedisManager.get_connection().pipeline(transaction=False)
+            pipe.hsetnx(key, "v", now)
+            pipe.hincrby(key, "v", 1)
+            pipe.hset(key, "at", now)
+            pipe.execute()
+        except Exception as e:
+            logger.warning("No se pudo actualizar la marca de ingesta del dispositivo %s: %s", device_id, e)
+
+    @classmethod
+    def watermarks(cls, device_ids: List[int]) -> Optional[List[Tuple[int, int]]]:
+        """(versión, ms de última ingesta) por dispositivo; None si Redis no responde"""
+        now = _now_ms()
+        try:
+            pipe = RedisManager.get_connection().pipeline(transaction=False)
+            for device_id in device_ids:
+                key = WATERMARK_KEY.format(device_id)
+                pipe.hsetnx(key, "v", now)
+                pipe.hsetnx(key, "at", now)
+                pipe.hmget(key, "v", "at")
+            results = pipe.execute()
+        except Exception as e:
+            logger.warning("Caché de lecturas no disponible: %s", e)
+            return None
+        return [(int(v), int(at)) for v, at in results[2::3]]
+
+    @classmethod
+    def lookup(
+        cls,
+        request: Request,
+        device_ids: List[int],
+        params: Dict[str, object],
+    ) -> Tuple[Optional[Response], Optional[Dict[str, str]]]:
+        """
+        Resolver una consulta antes de ir a MongoDB.
+
+        Devuelve (respuesta, validadores): respuesta es un 304 o el cuerpo
+        cacheado, o None si hay que consultar; validadores se pasan a
+        respond() (None si Redis no está disponible).
+        """
+        bypass = "no-cache" in request.headers.get("cache-control", "").lower()
+        marks = cls.watermarks(device_ids)
+        if marks is None:
+            return None, None
+
+        fingerprint = json.dumps(
+            [request.url.path, params, device_ids, [version for version, _ in marks]],
+            sort_keys=True, default=str, separators=(",", ":")
+        )
+        etag = '"{}"'.format(hashlib.sha256(fingerprint.encode()).hexdigest()[:32])
+        last_modified = datetime.fromtimestamp(max((at for _, at in marks), default=0) / 1000, tz=timezone.utc)
+        validators = {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified.replace(microsecond=0), usegmt=True),
+            "Cache-Control": CACHE_CONTROL,
+        }
+
+        # Solo If-None-Match: el ETag incluye los parámetros resueltos (ventanas deslizantes de
+        # /aggregate y /anomalies), mientras que Last-Modified solo refleja la última ingesta
+        if_none_match = request.headers.get("if-none-match")
+        if bypass:
+            readings_cache_results.inc(1, "bypass")
+            return None, {**validators, "X-Cache": "BYPASS"}
+
+        if if_none_match and _etag_matches(if_none_match, etag):
+            readings_cache_results.inc(1, "not_modified")
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={**validators, "X-Cache": "HIT"}), validators
+
+        if settings.READINGS_CACHE_ENABLED:
+            try:
+                body = RedisManager.get_connection().get(BODY_KEY.format(etag.strip('"')))
+            except Exception as e:
+                logger.warning("No se pudo leer la caché de lecturas: %s", e)
+                body = None
+            if body is not None:
+                readings_cache_results.inc(1, "hit")
+                return Response(
+                    content=body, media_type="application/json", headers={**validators, "X-Cache": "HIT"}
+                ), validators
+
+        readings_cache_results.inc(1, "miss")
+        return None, {**validators, "X-Cache": "MISS"}
+
+    @classmethod
+    def respond(cls, payload: dict, validators: Optional[Dict[str, str]]) -> Response:
+        """Serializar con orjson, guardar en caché y adjuntar los validadores"""
+        body = orjson.dumps(payload)
+        if validators is None:
+            return Response(content=body, media_type="application/json")
+
+        if settings.READINGS_CACHE_ENABLED and len(body) <= settings.READINGS_CACHE_MAX_BYTES:
+            try:
+                RedisManager.get_connection().set(
+                    BODY_KEY.format(validators["ETag"].strip('"')), body.decode(), ex=settings.READINGS_CACHE_TTL_S
+                )
+            except Exception as e:
+                logger.warning("No se pudo guardar la caché de lecturas: %s", e)
+        return Response(content=body, media_type="application/json", headers=validators)
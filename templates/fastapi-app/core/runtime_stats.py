@@ -0,0 +1,272 @@
+"""
+Muestreo de recursos del proceso y detección de crecimiento sostenido
+
+Una tarea asyncio toma cada RUNTIME_SAMPLE_INTERVAL_S una muestra de RSS,
+descriptores abiertos (y cuántos son sockets), hilos, ocupación del
+threadpool de AnyIO, objetos rastreados por el GC, memoria de tracemalloc
+(si está activo) y el tamaño de estructuras internas registradas con
+track(). El historial es acotado (RUNTIME_MAX_SAMPLES) y por worker.
+
+Detección de fugas: la serie se divide en ventanas y se toma el mínimo de
+cada una (el piso que deja el GC). Si los pisos crecen en todas las
+ventanas y el aumento total supera el umbral, la métrica se marca como
+sospechosa. Con tracemalloc activo, snapshot_baseline() fija una
+instantánea y top_growth() lista las líneas que más memoria acumularon.
+"""
+import asyncio
+import gc
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from core.config import settings
+from core.metrics import REGISTRY, Gauge
+
+logger = logging.getLogger(__name__)
+
+TREND_WINDOWS = 6
+# Crecimiento mínimo para marcar una métrica: (relativo, absoluto)
+GROWTH_THRESHOLDS = {
+    "rss_bytes": (0.10, 16 * 1024 * 1024),
+    "traced_bytes": (0.10, 8 * 1024 * 1024),
+    "open_fds": (0.25, 10),
+    "sockets": (0.25, 10),
+    "threads": (0.25, 4),
+    "gc_objects": (0.10, 50000),
+}
+DEFAULT_THRESHOLD = (0.25, 100)
+
+process_rss = REGISTRY.register(Gauge("process_resident_memory_bytes", "Memoria residente del worker"))
+process_fds = REGISTRY.register(Gauge("process_open_fds", "Descriptores de archivo abiertos"))
+process_threads = REGISTRY.register(Gauge("process_threads", "Hilos del worker"))
+threadpool_busy = REGISTRY.register(Gauge("threadpool_busy_threads", "Hilos del threadpool de AnyIO en uso"))
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except OSError:
+        return None
+
+
+def _fd_counts() -> Dict[str, Optional[int]]:
+    try:
+        fds = os.listdir("/proc/self/fd")
+    except OSError:
+        return {"open_fds": None, "sockets": None}
+    sockets = 0
+    for fd in fds:
+        try:
+            if os.readlink(f"/proc/self/fd/{fd}").startswith("socket:"):
+                sockets += 1
+        except OSError:
+            continue
+    return {"open_fds": len(fds), "sockets": sockets}
+
+
+def _threadpool_usage() -> Dict[str, Optional[int]]:
+    """Tokens prestados del limitador por defecto de AnyIO (run_in_threadpool)"""
+    try:
+        from anyio import to_thread
+        limiter = to_thread.current_default_thread_limiter()
+        return {"threadpool_busy": limiter.borrowed_tokens, "threadpool_size": int(limiter.total_tokens)}
+    except Exception:
+        return {"threadpool_busy": None, "threadpool_size": None}
+
+
+def analyze_trend(values: List[float], metric: str, windows: int = TREND_WINDOWS) -> dict:
+    """Pisos por ventana y si el crecimiento es sostenido y significativo"""
+    points = [v for v in values if v is not None]
+    if len(points) < windows * 2:
+        return {"samples": len(points), "suspect": False, "reason": "muestras insuficientes"}
+
+    size = len(points) // windows
+    floors = [min(points[i * size:(i + 1) * size]) for i in range(windows)]
+    growth = floors[-1] - floors[0]
+    relative, absolute = GROWTH_THRESHOLDS.get(metric, DEFAULT_THRESHOLD)
+    monotonic = all(b > a for a, b in zip(floors, floors[1:]))
+    significant = growth >= absolute and (floors[0] <= 0 or growth / floors[0] >= relative)
+    return {
+        "samples": len(points),
+        "floors": floors,
+        "growth": growth,
+        "growth_pct": round(growth / floors[0] * 100, 1) if floors[0] else None,
+        "monotonic": monotonic,
+        "suspect": monotonic and significant,
+    }
+
+
+class RuntimeStats:
+    """Historial de muestras de recursos del worker (classmethods, uno por proceso)"""
+
+    _task: Optional[asyncio.Task] = None
+    _lock = threading.Lock()
+    _samples: Deque[dict] = deque(maxlen=settings.RUNTIME_MAX_SAMPLES)
+    _trackers: Dict[str, Callable[[], Optional[int]]] = {}
+    _baseline: Optional[tracemalloc.Snapshot] = None
+    _baseline_at: Optional[float] = None
+    _started_at: Optional[float] = None
+
+    @classmethod
+    def track(cls, name: str, size: Callable[[], Optional[int]]) -> None:
+        """Registrar una estructura interna cuyo tamaño se muestrea"""
+        cls._trackers[name] = size
+
+    @classmethod
+    def start(cls) -> None:
+        """Iniciar el muestreo en el event loop actual (llamar desde el lifespan)"""
+        if cls._task is not None or not settings.RUNTIME_STATS_ENABLED:
+            return
+        if settings.RUNTIME_TRACEMALLOC and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.RUNTIME_TRACEMALLOC_FRAMES)
+        _register_default_trackers()
+        cls._started_at = time.time()
+        cls._task = asyncio.get_running_loop().create_task(cls._run(), name="runtime-stats")
+        logger.info(
+            "Muestreo de recursos iniciado (cada %s s, tracemalloc %s)",
+            settings.RUNTIME_SAMPLE_INTERVAL_S, "activo" if tracemalloc.is_tracing() else "inactivo"
+        )
+
+    @classmethod
+    async def stop(cls) -> None:
+        if cls._task is not None:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+
+    @classmethod
+    async def _run(cls) -> None:
+        while True:
+            try:
+                cls.sample()
+            except Exception as e:
+                logger.warning(f"Error al muestrear recursos: {e}")
+            await asyncio.sleep(settings.RUNTIME_SAMPLE_INTERVAL_S)
+
+    @classmethod
+    def sample(cls) -> dict:
+        """Tomar una muestra, actualizar los gauges y guardarla en el historial"""
+        entry = {
+            "at": time.time(),
+            "rss_bytes": _rss_bytes(),
+            "threads": threading.active_count(),
+            "gc_objects": len(gc.get_objects()) if settings.RUNTIME_COUNT_GC_OBJECTS else None,
+        }
+        entry.update(_fd_counts())
+        entry.update(_threadpool_usage())
+        if tracemalloc.is_tracing():
+            entry["traced_bytes"], entry["traced_peak_bytes"] = tracemalloc.get_traced_memory()
+        entry["tracked"] = {}
+        for name, size in list(cls._trackers.items()):
+            try:
+                entry["tracked"][name] = size()
+            except Exception:
+                entry["tracked"][name] = None
+
+        if entry["rss_bytes"] is not None:
+            process_rss.set(entry["rss_bytes"])
+        if entry["open_fds"] is not None:
+            process_fds.set(entry["open_fds"])
+        process_threads.set(entry["threads"])
+        if entry["threadpool_busy"] is not None:
+            threadpool_busy.set(entry["threadpool_busy"])
+
+        with cls._lock:
+            cls._samples.append(entry)
+        return entry
+
+    @classmethod
+    def samples(cls, limit: Optional[int] = None) -> List[dict]:
+        with cls._lock:
+            samples = list(cls._samples)
+        return samples[-limit:] if limit else samples
+
+    @classmethod
+    def trends(cls) -> Dict[str, dict]:
+        """Análisis de crecimiento de cada métrica del historial"""
+        samples = cls.samples()
+        metrics = ["rss_bytes", "traced_bytes", "open_fds", "sockets", "threads", "gc_objects"]
+        result = {m: analyze_trend([s.get(m) for s in samples], m) for m in metrics}
+        for name in cls._trackers:
+            key = f"tracked.{name}"
+            result[key] = analyze_trend([s["tracked"].get(name) for s in samples], key)
+        return result
+
+    @classmethod
+    def snapshot_baseline(cls) -> float:
+        """Fijar la instantánea de tracemalloc contra la que se compara top_growth()"""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc no está activo (RUNTIME_TRACEMALLOC=true)")
+        cls._baseline = tracemalloc.take_snapshot()
+        cls._baseline_at = time.time()
+        return cls._baseline_at
+
+    @classmethod
+    def top_growth(cls, limit: int = 20) -> List[dict]:
+        """Líneas con mayor crecimiento de memoria desde la línea base"""
+        if not tracemalloc.is_tracing() or cls._baseline is None:
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        stats = snapshot.compare_to(cls._baseline, "lineno")
+        return [
+            {
+                "location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff_bytes": stat.size_diff,
+                "size_bytes": stat.size,
+                "count_diff": stat.count_diff,
+            }
+            for stat in stats[:limit]
+            if stat.size_diff > 0
+        ]
+
+    @classmethod
+    def status(cls) -> dict:
+        trends = cls.trends()
+        return {
+            "pid": os.getpid(),
+            "running": cls._task is not None,
+            "started_at": cls._started_at,
+            "interval_s": settings.RUNTIME_SAMPLE_INTERVAL_S,
+            "tracemalloc": tracemalloc.is_tracing(),
+            "baseline_at": cls._baseline_at,
+            "current": cls.samples(1)[0] if cls._samples else None,
+            "trends": trends,
+            "suspects": [name for name, trend in trends.items() if trend.get("suspect")],
+        }
+
+
+def _register_default_trackers() -> None:
+    """Estructuras de larga vida que crecen con el tráfico"""
+    from core.decorators import RATE_LIMIT_BUCKETS
+    from core.loop_monitor import LoopMonitor
+    from core.query_monitor import QueryStats
+
+    RuntimeStats.track("rate_limit_entries", lambda: sum(len(b) for b in RATE_LIMIT_BUCKETS.values()))
+    RuntimeStats.track("query_fingerprints", lambda: len(QueryStats._stats))
+    RuntimeStats.track("loop_block_events", lambda: len(LoopMonitor._events))
+
+    def sql_pool_checked_out() -> Optional[int]:
+        from database import engine
+        checkedout = getattr(engine.pool, "checkedout", None)
+        return checkedout() if checkedout else None
+
+    def redis_connections() -> Optional[int]:
+        from core.config import RedisManager
+        pool = getattr(RedisManager._instance, "connection_pool", None)
+        return getattr(pool, "_created_connections", None)
+
+    RuntimeStats.track("sql_pool_checked_out", sql_pool_checked_out)
+    RuntimeStats.track("redis_connections", redis_connections)
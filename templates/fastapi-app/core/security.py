@@ -2,7 +2,7 @@
 Módulo de Seguridad - JWT, Hash de Contraseñas (Argon2), Gestión de Sesiones
 """
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 import logging
 import uuid
 from passlib.context import CryptContext
@@ -12,13 +12,13 @@ from core.config import settings
 
 logger = logging.getLogger(__name__)
 
-# ARGON2 - Sin límite de 72 caracteres
+# ARGON2 - Sin límite de 72 caracteres (parámetros en settings, ver benchmarks/argon2_calibrate.py)
 pwd_context = CryptContext(
     schemes=["argon2"],
     deprecated="auto",
-    argon2__memory_cost=102400,
-    argon2__time_cost=2,
-    argon2__parallelism=8
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM
 )
 
 
@@ -38,6 +38,20 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Indicar si el hash usa parámetros distintos a los configurados (memoria, tiempo, paralelismo, versión)"""
+    return pwd_context.needs_update(hashed_password)
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verificar contraseña y devolver un hash nuevo si los parámetros cambiaron"""
+    if not verify_password(plain_password, hashed_password):
+        return False, None
+    if password_needs_rehash(hashed_password):
+        return True, get_password_hash(plain_password)
+    return True, None
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crear JWT con JTI único para seguimiento de sesión"""
     to_encode = data.copy()
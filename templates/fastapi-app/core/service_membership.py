@@ -0,0 +1,207 @@
+"""
+Membresía servicio → dispositivos (servicio_dispositivo) con caché en Redis
+
+Las consultas de lecturas por servicio o por gerente resuelven primero qué
+dispositivos abarcan. La resolución se guarda en un hash de Redis
+compartido por todos los workers (membership, un campo por servicio o
+gerente) y se borra completo cuando un commit cambia asignaciones
+(Service.dispositivos, Service.gerente_id, Device.servicios o altas/bajas de
+servicios y dispositivos). Los cambios hechos fuera del ORM (SQL directo)
+se reflejan al expirar el hash (MEMBERSHIP_CACHE_TTL_S).
+"""
+import json
+import logging
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from core.config import RedisManager, settings
+from core.readings import parse_device_ids
+from database import AsyncORMSession, SessionLocal
+from models import Device, Service
+from models.relationships import servicio_dispositivo
+
+logger = logging.getLogger(__name__)
+
+MEMBERSHIP_KEY = "membership"
+# Versión de la membresía: otros componentes (reglas de alerta) recompilan al cambiar
+MEMBERSHIP_VERSION_KEY = "membership:version"
+_CHANGED = "membership_changed"
+
+
+class ServiceMembership:
+    """Dispositivos de un servicio o de los servicios de un gerente (con caché)"""
+
+    @classmethod
+    def _cached(cls, field: str) -> Optional[dict]:
+        try:
+            raw = RedisManager.get_connection().hget(MEMBERSHIP_KEY, field)
+        except Exception as e:
+            logger.warning(f"Caché de membresía no disponible: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    @classmethod
+    def _store(cls, field: str, entry: dict) -> None:
+        try:
+            pipe = RedisManager.get_connection().pipeline(transaction=False)
+            pipe.hset(MEMBERSHIP_KEY, field, json.dumps(entry))
+            pipe.expire(MEMBERSHIP_KEY, settings.MEMBERSHIP_CACHE_TTL_S, nx=True)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"No se pudo guardar la membresía en caché: {e}")
+
+    @classmethod
+    def service(cls, db: Session, service_id: int) -> Optional[dict]:
+        """{'gerente_id', 'devices'} del servicio; None si no existe"""
+        field = f"service:{service_id}"
+        entry = cls._cached(field)
+        if entry is not None:
+            return entry
+
+        row = db.query(Service.id, Service.gerente_id).filter(Service.id == service_id).first()
+        if row is None:
+            return None
+        devices = [
+            device_id for (device_id,) in (
+                db.query(servicio_dispositivo.c.dispositivo_id)
+                .filter(
+                    servicio_dispositivo.c.servicio_id == service_id,
+                    servicio_dispositivo.c.dispositivo_id.isnot(None)
+                )
+                .distinct()
+                .order_by(servicio_dispositivo.c.dispositivo_id)
+            )
+        ]
+        entry = {"gerente_id": row.gerente_id, "devices": devices}
+        cls._store(field, entry)
+        return entry
+
+    @classmethod
+    def manager(cls, db: Session, manager_id: int) -> List[int]:
+        """Dispositivos de todos los servicios a cargo del gerente"""
+        field = f"manager:{manager_id}"
+        entry = cls._cached(field)
+        if entry is not None:
+            return entry["devices"]
+
+        devices = [
+            device_id for (device_id,) in (
+                db.query(servicio_dispositivo.c.dispositivo_id)
+                .join(Service, Service.id == servicio_dispositivo.c.servicio_id)
+                .filter(Service.gerente_id == manager_id, servicio_dispositivo.c.dispositivo_id.isnot(None))
+                .distinct()
+                .order_by(servicio_dispositivo.c.dispositivo_id)
+            )
+        ]
+        cls._store(field, {"devices": devices})
+        return devices
+
+    @classmethod
+    def invalidate(cls) -> None:
+        try:
+            pipe = RedisManager.get_connection().pipeline(transaction=False)
+            pipe.delete(MEMBERSHIP_KEY)
+            pipe.incr(MEMBERSHIP_VERSION_KEY)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"No se pudo invalidar la caché de membresía: {e}")
+
+
+def resolve_fleet_scope(
+    db: Session,
+    principal: Dict,
+    device_ids: Optional[List[str]] = None,
+    service_id: Optional[int] = None,
+    manager_id: Optional[int] = None,
+    enforce_limit: bool = True,
+) -> List[int]:
+    """
+    Dispositivos de una consulta de flota: lista explícita, servicio o gerente.
+
+    Los usuarios consultan cualquier alcance; un gerente solo sus servicios
+    y los dispositivos asignados a ellos. Con enforce_limit=False no se
+    aplica FLEET_MAX_DEVICES (suscripciones en vivo, sin consulta a MongoDB).
+    """
+    if sum(scope is not None for scope in (device_ids, service_id, manager_id)) != 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Indicar exactamente uno de: device_ids, service_id, manager_id"
+        )
+    is_manager = principal["type"] == "manager"
+    own_id = principal["data"].id
+
+    if service_id is not None:
+        entry = ServiceMembership.service(db, service_id)
+        if entry is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Servicio con ID {service_id} no encontrado")
+        if is_manager and entry["gerente_id"] != own_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="El servicio no está a cargo de este gerente")
+        ids = entry["devices"]
+    elif manager_id is not None:
+        if is_manager and manager_id != own_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Solo se pueden consultar los servicios propios")
+        ids = ServiceMembership.manager(db, manager_id)
+    else:
+        ids = parse_device_ids(device_ids)
+        if is_manager:
+            allowed = set(ServiceMembership.manager(db, own_id))
+            foreign = [device_id for device_id in ids if device_id not in allowed]
+            if foreign:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail=f"Dispositivos fuera de los servicios del gerente: {', '.join(map(str, foreign))}"
+                )
+        found = {row.id for row in db.query(Device.id).filter(Device.id.in_(ids)).all()}
+        missing = [device_id for device_id in ids if device_id not in found]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Dispositivos no encontrados: {', '.join(map(str, missing))}"
+            )
+
+    if enforce_limit and len(ids) > settings.FLEET_MAX_DEVICES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"El alcance abarca {len(ids)} dispositivos (máximo {settings.FLEET_MAX_DEVICES} por consulta)"
+        )
+    return ids
+
+
+# =============================================================================
+# Invalidación al confirmar cambios de asignación
+# =============================================================================
+
+@event.listens_for(AsyncORMSession, "after_flush")
+@event.listens_for(SessionLocal, "after_flush")
+def _detect_assignment_changes(session: Session, flush_context) -> None:
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, (Service, Device)):
+            session.info[_CHANGED] = True
+            return
+    for obj in session.dirty:
+        if isinstance(obj, Service):
+            attrs = ("dispositivos", "gerente_id")
+        elif isinstance(obj, Device):
+            attrs = ("servicios",)
+        else:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[name].history.has_changes() for name in attrs):
+            session.info[_CHANGED] = True
+            return
+
+
+@event.listens_for(AsyncORMSession, "after_commit")
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop(_CHANGED, False):
+        ServiceMembership.invalidate()
+
+
+@event.listens_for(AsyncORMSession, "after_rollback")
+@event.listens_for(SessionLocal, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_CHANGED, None)
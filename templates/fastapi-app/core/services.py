@@ -1,8 +1,11 @@
 """
 Servicios de Autenticación y Sesión
 """
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from datetime import timedelta
 import logging
 
@@ -40,7 +43,7 @@ class SessionService:
                 return
             
             RedisManager.save_active_token(user_id, user_type, jti, expires_in_seconds)
-            logger.info(f"Sesión guardada para {user_type} ID {user_id}")
+            logger.info("Sesión guardada para %s ID %s", user_type, user_id)
         except Exception as e:
             logger.error(f"Error al guardar sesión en Redis: {e}")
     
@@ -52,7 +55,7 @@ class SessionService:
         
         jti = RedisManager.get_active_token(user_id, user_type)
         RedisManager.delete_active_token(user_id, user_type)
-        logger.info(f"Sesión invalidada para {user_type} ID {user_id}")
+        logger.info("Sesión invalidada para %s ID %s", user_type, user_id)
         
         if jti:
             SessionLogger.log_logout(
@@ -74,22 +77,20 @@ class AuthService:
     """Servicios de autenticación"""
     
     @staticmethod
-    def auth_by_password(
+    async def auth_by_password(
         entity, 
         entity_type: str, 
         email: str, 
         password: str, 
-        db: Session,
+        db: AsyncSession,
         request_ip: str = None,
         request_user_agent: str = None
     ):
         """Autenticación genérica por contraseña con aplicación de sesión única"""
-        from core.security import verify_password, create_access_token, extract_jti_from_token
+        from core.security import verify_and_update_password, create_access_token, extract_jti_from_token
         from core.session_logger import SessionLogger
         from datetime import datetime
         
-        obj = db.query(entity).filter(entity.email == email).first()
-        
         password_field_map = {
             "user": "pasusuario",
             "admin": "pasadmin",
@@ -97,22 +98,46 @@ class AuthService:
         }
         password_field = password_field_map.get(entity_type)
         
+        # Credencial y rol en la misma consulta (sin cargas perezosas en AsyncSession)
+        result = await db.execute(
+            select(entity)
+            .options(joinedload(getattr(entity, password_field)), joinedload(entity.rol))
+            .where(entity.email == email)
+            .limit(1)
+        )
+        obj = result.scalars().first()
+        
         if not obj or not getattr(obj, password_field, None):
             raise HTTPException(status_code=401, detail="Credenciales inválidas")
         
         password_obj = getattr(obj, password_field)
-        if not verify_password(password, password_obj.hashed_password):
+        # Argon2 consume ~100 MiB y decenas de ms de CPU: fuera del event loop
+        valid, new_hash = await run_in_threadpool(
+            verify_and_update_password, password, password_obj.hashed_password
+        )
+        if not valid:
             raise HTTPException(status_code=401, detail="Credenciales inválidas")
         
+        # Rehash transparente a los parámetros Argon2 actuales
+        if new_hash:
+            try:
+                password_obj.hashed_password = new_hash
+                await db.commit()
+                logger.info(f"Hash de contraseña actualizado a parámetros actuales: {entity_type} {obj.id}")
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f"No se pudo actualizar el hash de {entity_type} {obj.id}: {e}")
+        
         if hasattr(obj, 'is_active') and not obj.is_active:
             raise HTTPException(status_code=400, detail="Usuario desactivado")
         
-        # Verificar sesión única
+        # Verificar sesión única (Redis y CSV síncronos: en el threadpool, fuera del event loop)
         try:
-            SessionService.check_active_session(obj.id, entity_type)
+            await run_in_threadpool(SessionService.check_active_session, obj.id, entity_type)
         except HTTPException as e:
             if e.status_code == status.HTTP_409_CONFLICT:
-                SessionLogger.log_login_rejected(
+                await run_in_threadpool(
+                    SessionLogger.log_login_rejected,
                     user_id=obj.id,
                     user_type=entity_type,
                     email=email,
@@ -128,10 +153,13 @@ class AuthService:
             expires_delta=access_token_expires
         )
         
-        SessionService.save_session(obj.id, entity_type, access_token, expires_in_seconds=3600)
+        await run_in_threadpool(
+            SessionService.save_session, obj.id, entity_type, access_token, expires_in_seconds=3600
+        )
         
         expires_at_dt = datetime.utcnow() + access_token_expires
-        SessionLogger.log_login(
+        await run_in_threadpool(
+            SessionLogger.log_login,
             user_id=obj.id,
             user_type=entity_type,
             email=email,
@@ -161,11 +189,11 @@ class AuthService:
         return response
 
     @staticmethod
-    def auth_by_puzzle_device(
+    async def auth_by_puzzle_device(
         device_id: int, 
         api_key: str, 
         puzzle_response: dict, 
-        db: Session,
+        db: AsyncSession,
         request_ip: str = None,
         request_user_agent: str = None
     ):
@@ -177,20 +205,21 @@ class AuthService:
         from models.pas_dispositivo import PasDispositivo
         from datetime import datetime
         
-        db_device = db.query(Device).filter(Device.id == device_id).first()
+        db_device = await db.get(Device, device_id)
         if not db_device or not db_device.pasdispositivo_id:
             raise HTTPException(status_code=401, detail="Credenciales de dispositivo inválidas")
         
-        pas_disp = db.query(PasDispositivo).filter(PasDispositivo.id == db_device.pasdispositivo_id).first()
+        pas_disp = await db.get(PasDispositivo, db_device.pasdispositivo_id)
         if not pas_disp or pas_disp.api_key != api_key:
             raise HTTPException(status_code=401, detail="Credenciales de dispositivo inválidas")
         
-        # Verificar sesión única
+        # Verificar sesión única (Redis y CSV síncronos: en el threadpool, fuera del event loop)
         try:
-            SessionService.check_active_session(device_id, "device")
+            await run_in_threadpool(SessionService.check_active_session, device_id, "device")
         except HTTPException as e:
             if e.status_code == status.HTTP_409_CONFLICT:
-                SessionLogger.log_login_rejected(
+                await run_in_threadpool(
+                    SessionLogger.log_login_rejected,
                     user_id=device_id,
                     user_type="device",
                     email="",
@@ -206,8 +235,10 @@ class AuthService:
                 detail="puzzle_response requerido. El dispositivo debe generar y enviar el rompecabezas criptográfico."
             )
         
-        crypto_manager = CryptoManager(db)
-        verification = crypto_manager.verificar_rompecabezas_dispositivo(puzzle_response)
+        # CryptoManager usa la API síncrona del ORM: se ejecuta sobre la sesión interna
+        verification = await db.run_sync(
+            lambda session: CryptoManager(session).verificar_rompecabezas_dispositivo(puzzle_response)
+        )
         
         if not verification.get('valido'):
             error_msg = verification.get('error', 'Falló la autenticación criptográfica')
@@ -219,10 +250,17 @@ class AuthService:
             expires_delta=access_token_expires
         )
         
-        SessionService.save_session(device_id, "device", access_token, expires_in_seconds=86400)
+        from core.device_liveness import DeviceLiveness
+        
+        def record_session():
+            SessionService.save_session(device_id, "device", access_token, expires_in_seconds=86400)
+            DeviceLiveness.touch(device_id)
+        
+        await run_in_threadpool(record_session)
         
         expires_at_dt = datetime.utcnow() + access_token_expires
-        SessionLogger.log_login(
+        await run_in_threadpool(
+            SessionLogger.log_login,
             user_id=device_id,
             user_type="device",
             email="",
@@ -9,6 +9,8 @@ from pathlib import Path
 from typing import Optional
 import logging
 
+from core.context import current_request_id
+
 logger = logging.getLogger(__name__)
 
 
@@ -17,11 +19,12 @@ class SessionLogger:
     
     _lock = threading.Lock()
     _csv_path = None
+    _headers_checked = False
     
     HEADERS = [
         "timestamp", "event", "user_id", "user_type",
         "email", "jti", "ip_address", "user_agent",
-        "expires_at", "reason", "endpoint"
+        "expires_at", "reason", "endpoint", "request_id"
     ]
     
     @classmethod
@@ -36,7 +39,18 @@ class SessionLogger:
     
     @classmethod
     def _ensure_headers(cls, csv_path: Path) -> None:
-        """Asegurar que el CSV tiene encabezados"""
+        """Asegurar que el CSV tiene encabezados (rota archivos con encabezado anterior)"""
+        if not cls._headers_checked and csv_path.exists() and csv_path.stat().st_size > 0:
+            cls._headers_checked = True
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                current = next(csv.reader(f), [])
+            if current != cls.HEADERS:
+                rotated = csv_path.with_name(f"{csv_path.stem}_{datetime.utcnow():%Y%m%d%H%M%S}{csv_path.suffix}")
+                try:
+                    csv_path.rename(rotated)
+                    logger.warning("CSV de sesiones con encabezado anterior movido a %s", rotated)
+                except FileNotFoundError:
+                    pass  # Otro worker ya lo rotó
         if not csv_path.exists() or csv_path.stat().st_size == 0:
             with open(csv_path, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.DictWriter(f, fieldnames=cls.HEADERS)
@@ -49,6 +63,7 @@ class SessionLogger:
         
         with cls._lock:
             try:
+                event_data.setdefault("request_id", current_request_id() or "")
                 cls._ensure_headers(csv_path)
                 with open(csv_path, 'a', newline='', encoding='utf-8') as f:
                     writer = csv.DictWriter(f, fieldnames=cls.HEADERS)
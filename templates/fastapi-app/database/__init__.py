@@ -1,18 +1,70 @@
 """Paquete de configuración de base de datos"""
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from typing import Generator
-import os
-from dotenv import load_dotenv
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from typing import AsyncGenerator, Generator
+from core.config import settings
+from core.query_monitor import instrument_engine
 
-load_dotenv()
+DATABASE_URL = settings.DATABASE_URL
 
-DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True, echo=False)
+def _engine_options(url: str) -> dict:
+    """Opciones del engine según el backend (SQLite en el perfil bench)"""
+    if url.startswith("sqlite"):
+        # Los endpoints síncronos usan la conexión desde el threadpool
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_pre_ping": True,
+        "pool_size": settings.DB_SYNC_POOL_SIZE,
+        "max_overflow": settings.DB_SYNC_MAX_OVERFLOW,
+    }
+
+
+def async_database_url(url: str) -> str:
+    """URL equivalente con driver async (aiomysql / aiosqlite)"""
+    if url.startswith("mysql+pymysql://"):
+        return "mysql+aiomysql://" + url[len("mysql+pymysql://"):]
+    if url.startswith("mysql://"):
+        return "mysql+aiomysql://" + url[len("mysql://"):]
+    if url.startswith("sqlite:///"):
+        return "sqlite+aiosqlite:///" + url[len("sqlite:///"):]
+    return url
+
+
+def _async_engine_options(url: str) -> dict:
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_pre_ping": True,
+        "pool_recycle": 3600,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+    }
+
+
+engine = create_engine(DATABASE_URL, echo=False, **_engine_options(DATABASE_URL))
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Engine async para los routers que no deben ocupar el threadpool (auth, usuarios, dispositivos)
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+async_engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, **_async_engine_options(ASYNC_DATABASE_URL))
+instrument_engine(async_engine.sync_engine)
+
+
+class AsyncORMSession(Session):
+    """Sesión síncrona interna de AsyncSession (destino de los eventos ORM)"""
+
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    sync_session_class=AsyncORMSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 
 def get_db() -> Generator:
     """Dependencia de sesión de base de datos"""
@@ -21,3 +73,9 @@ def get_db() -> Generator:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """Dependencia de sesión async de base de datos"""
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -7,6 +7,8 @@ from pymongo.collection import Collection
 from typing import Optional
 import logging
 from core.config import settings
+from core.context import current_request_id
+from core.query_monitor import MongoCommandMonitor
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +22,12 @@ class MongoDBManager:
     @classmethod
     def get_client(cls) -> MongoClient:
         """Obtener o crear cliente MongoDB"""
-        if cls._client is None:
+        if cls._client is None and settings.MONGO_BACKEND == "mongomock":
+            # Perfil bench: MongoDB en memoria (sin command monitoring)
+            import mongomock
+            cls._client = mongomock.MongoClient()
+            logger.info("MongoDB en memoria (mongomock)")
+        elif cls._client is None:
             try:
                 from urllib.parse import quote_plus
                 
@@ -37,7 +44,8 @@ class MongoDBManager:
                     mongo_uri,
                     serverSelectionTimeoutMS=5000,
                     connectTimeoutMS=5000,
-                    socketTimeoutMS=5000
+                    socketTimeoutMS=5000,
+                    event_listeners=[MongoCommandMonitor()]
                 )
                 
                 cls._client.admin.command('ping')
@@ -74,6 +82,14 @@ class MongoDBManager:
             logger.info("Conexion MongoDB cerrada")
 
 
+def query_comment() -> dict:
+    """Argumento `comment` con el request ID (mongomock no lo admite)"""
+    request_id = current_request_id()
+    if request_id is None or settings.MONGO_BACKEND != "mongodb":
+        return {}
+    return {"comment": request_id}
+
+
 def get_sensor_readings_collection() -> Collection:
     """Obtener colección de lecturas de sensores"""
     return MongoDBManager.get_collection("sensor_readings")
@@ -89,12 +105,19 @@ def get_alerts_collection() -> Collection:
     return MongoDBManager.get_collection("alerts")
 
 
+def get_alert_rules_collection() -> Collection:
+    """Obtener colección de reglas de alerta"""
+    return MongoDBManager.get_collection("alert_rules")
+
+
 def create_indexes():
     """Crear índices de MongoDB para consultas optimizadas"""
     try:
         # Índices de sensor_readings
         sensor_readings = get_sensor_readings_collection()
         sensor_readings.create_index([("device_id", 1), ("timestamp", -1)])
+        # Últimos valores y agregaciones por tipo de sensor (consultas por servicio)
+        sensor_readings.create_index([("device_id", 1), ("sensor_type", 1), ("timestamp", -1)])
         sensor_readings.create_index([("sensor_type", 1)])
         sensor_readings.create_index([("timestamp", -1)])
         
@@ -106,6 +129,16 @@ def create_indexes():
         alerts = get_alerts_collection()
         alerts.create_index([("device_id", 1), ("resolved", 1)])
         alerts.create_index([("timestamp", -1)])
+        # Upsert idempotente del job de anomalías
+        alerts.create_index([("device_id", 1), ("sensor_type", 1), ("method", 1), ("timestamp", 1)])
+        # Listado paginado (keyset sobre timestamp, _id) y alerta abierta por regla/dispositivo
+        alerts.create_index([("device_id", 1), ("timestamp", -1), ("_id", -1)])
+        alerts.create_index([("resolved", 1), ("timestamp", -1), ("_id", -1)])
+        alerts.create_index([("rule_id", 1), ("device_id", 1), ("resolved", 1)])
+        # Alertas agrupadas por servicio (filtro por dispositivo miembro)
+        alerts.create_index([("device_ids", 1), ("timestamp", -1), ("_id", -1)])
+        # Alertas offline abiertas (barrido de actividad de dispositivos)
+        alerts.create_index([("type", 1), ("resolved", 1)])
         
         logger.info("Índices de MongoDB creados exitosamente")
         
@@ -0,0 +1,109 @@
+"""
+Datos iniciales del perfil bench (SQLite)
+
+Crea el esquema con los modelos de SQLAlchemy y siembra roles, permisos,
+un admin_master y N dispositivos, reflejando mysql-init.sql.tpl. Las
+credenciales de los dispositivos se escriben en BENCH_DEVICES_FILE con el
+formato de fleet_simulator.py (device_id, api_key, encryption_key_hex).
+
+Uso sin contenedores (un solo worker: Redis y MongoDB viven en el proceso):
+    pip install -r requirements.txt -r requirements-bench.txt
+    APP_PROFILE=bench uvicorn app:app --port 5000 --workers 1
+"""
+import json
+import logging
+import secrets
+from pathlib import Path
+
+from core.config import settings
+from core.security import get_password_hash
+from database import Base, SessionLocal, engine
+from models import Admin, Device, PasAdmin, PasDispositivo, Permission, Role
+
+logger = logging.getLogger(__name__)
+
+# Mismos datos que mysql-init.sql.tpl
+ROLES = [
+    (1, "admin_master", "Administrador maestro con permisos completos"),
+    (2, "admin_normal", "Administrador con permisos limitados"),
+    (3, "user", "Usuario final con acceso básico"),
+    (4, "manager", "Gerente con permisos operativos"),
+]
+
+PERMISSIONS = [
+    (1, "create_user"), (2, "edit_user"), (3, "delete_user"), (4, "create_service"),
+    (5, "assign_device"), (6, "view_reports"), (7, "view_all_users"), (8, "create_manager"),
+    (9, "edit_manager"), (10, "delete_manager"), (11, "create_admin"), (12, "manage_roles"),
+    (13, "grant_permissions"), (14, "create_device"), (15, "edit_device"), (16, "delete_device"),
+    (17, "view_diagnostics"), (18, "manage_alerts"),
+]
+
+ROLE_PERMISSIONS = {
+    1: [p for p, _ in PERMISSIONS],
+    2: [4, 5, 6, 7, 18],
+    3: [6, 7],
+    4: [1, 4, 5, 6, 7, 18],
+}
+
+
+def init_bench_database() -> None:
+    """Crear esquema y sembrar datos si la base está vacía"""
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        if db.query(Role).first() is not None:
+            logger.info("Base de datos bench ya inicializada")
+            return
+
+        permissions = {pid: Permission(id=pid, name=name) for pid, name in PERMISSIONS}
+        db.add_all(permissions.values())
+        for rid, nombre, description in ROLES:
+            role = Role(id=rid, nombre=nombre, description=description)
+            role.permissions = [permissions[pid] for pid in ROLE_PERMISSIONS[rid]]
+            db.add(role)
+
+        pas_admin = PasAdmin(hashed_password=get_password_hash(settings.BENCH_ADMIN_PASSWORD))
+        db.add(pas_admin)
+        db.flush()
+        admin = Admin(nombre="Admin Bench", email=settings.BENCH_ADMIN_EMAIL, rol_id=1, pasadmin_id=pas_admin.id)
+        db.add(admin)
+        db.flush()
+
+        fleet = []
+        for i in range(settings.BENCH_DEVICES):
+            pas = PasDispositivo(encryption_key=secrets.token_bytes(32))
+            db.add(pas)
+            db.flush()
+            device = Device(
+                nombre=f"bench-{i:05d}",
+                device_type="temperatura",
+                is_active=True,
+                admin_id=admin.id,
+                pasdispositivo_id=pas.id
+            )
+            db.add(device)
+            db.flush()
+            fleet.append({
+                "device_id": device.id,
+                "api_key": pas.api_key,
+                "encryption_key_hex": pas.encryption_key.hex()
+            })
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    Path(settings.BENCH_DEVICES_FILE).write_text(json.dumps(fleet, indent=2), encoding="utf-8")
+    logger.info(
+        "Base de datos bench sembrada: %d dispositivos (credenciales en %s), admin %s",
+        len(fleet), settings.BENCH_DEVICES_FILE, settings.BENCH_ADMIN_EMAIL
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init_bench_database()
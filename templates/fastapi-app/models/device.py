@@ -1,5 +1,5 @@
 """Modelo de Dispositivo"""
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -7,11 +7,15 @@ from database import Base
 
 class Device(Base):
     __tablename__ = "dispositivo"
+    # Filtros del listado paginado (GET /devices); InnoDB añade id a cada índice
+    __table_args__ = (
+        Index("ix_dispositivo_device_type_is_active", "device_type", "is_active"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(100), nullable=True, index=True)
     device_type = Column(String(50), nullable=False)
-    is_active = Column(Boolean, default=True)
+    is_active = Column(Boolean, default=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     admin_id = Column(Integer, ForeignKey("admin.id"), nullable=True)
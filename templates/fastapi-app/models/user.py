@@ -11,7 +11,7 @@ class User(Base):
     id = Column(Integer, primary_key=True, index=True)
     nombre = Column(String(50), nullable=False, index=True)
     email = Column(String(100), unique=True, nullable=False, index=True)
-    is_active = Column(Boolean, default=True)
+    is_active = Column(Boolean, default=True, index=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     rol_id = Column(Integer, ForeignKey("rol.id"), nullable=True)
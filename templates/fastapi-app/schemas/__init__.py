@@ -2,12 +2,18 @@
 from .auth import UserLogin, DeviceLogin, Token
 from .user import UserBase, UserCreate, UserResponse, ManagerBase, ManagerCreate, ManagerResponse
 from .device import DeviceBase, DeviceCreate, DeviceResponse
-from .sensor import SensorReading, SensorReadingResponse, SensorReadingsHistoryResponse
+from .sensor import (
+    SensorReading, SensorReadingResponse, SensorReadingsHistoryResponse, SensorReadingsAggregateResponse,
+    FleetReadingsResponse, FleetLatestResponse, FleetAggregateResponse, FleetAnomaliesResponse
+)
+from .alert import AlertRuleCreate, AlertRuleResponse, AlertResponse, AlertListResponse
 
 __all__ = [
     "UserLogin", "DeviceLogin", "Token",
     "UserBase", "UserCreate", "UserResponse",
     "ManagerBase", "ManagerCreate", "ManagerResponse",
     "DeviceBase", "DeviceCreate", "DeviceResponse",
-    "SensorReading", "SensorReadingResponse", "SensorReadingsHistoryResponse"
+    "SensorReading", "SensorReadingResponse", "SensorReadingsHistoryResponse", "SensorReadingsAggregateResponse",
+    "FleetReadingsResponse", "FleetLatestResponse", "FleetAggregateResponse", "FleetAnomaliesResponse",
+    "AlertRuleCreate", "AlertRuleResponse", "AlertResponse", "AlertListResponse"
 ]
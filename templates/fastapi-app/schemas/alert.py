@@ -0,0 +1,65 @@
+"""Schemas de Alertas y Reglas de Alerta"""
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+from datetime import datetime
+
+
+class AlertRuleCreate(BaseModel):
+    """
+    Regla de alerta evaluada en la ingesta.
+
+    Alcance: device_id, service_id o ninguno (todos los dispositivos).
+    """
+    name: str = Field(..., max_length=100)
+    kind: Literal["threshold", "rate_of_change", "missing_data"]
+    sensor_type: Optional[Literal["temperature", "humidity", "battery"]] = None
+    device_id: Optional[int] = None
+    service_id: Optional[int] = None
+    min_value: Optional[float] = Field(None, description="threshold: alerta si value < min_value")
+    max_value: Optional[float] = Field(None, description="threshold: alerta si value > max_value")
+    max_delta: Optional[float] = Field(None, description="rate_of_change: cambio máximo por per_seconds")
+    per_seconds: float = Field(60, gt=0, description="rate_of_change: ventana de normalización del cambio")
+    max_gap_s: Optional[int] = Field(None, description="missing_data: segundos máximos sin lecturas")
+    hysteresis: float = Field(0, ge=0, description="Margen que el valor debe recuperar para resolver la alerta")
+    min_refire_s: int = Field(0, ge=0, description="Segundos mínimos entre una resolución y la siguiente alerta")
+    group_alerts: bool = Field(True, description="Agrupar alertas del servicio/flota durante una tormenta")
+    severity: Literal["info", "warning", "critical"] = "warning"
+    enabled: bool = True
+
+
+class AlertRuleResponse(AlertRuleCreate):
+    """Regla de alerta guardada"""
+    id: str
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+
+
+class AlertResponse(BaseModel):
+    """Alerta de regla (type=rule), agrupada (type=rule_group) o de anomalía (type=anomaly)"""
+    id: str
+    type: str
+    device_id: Optional[int] = None
+    scope: Optional[str] = None
+    device_ids: Optional[List[int]] = None
+    active_device_ids: Optional[List[int]] = None
+    sensor_type: Optional[str] = None
+    severity: Optional[str] = None
+    timestamp: datetime
+    value: Optional[float] = None
+    message: Optional[str] = None
+    rule_id: Optional[str] = None
+    rule_name: Optional[str] = None
+    kind: Optional[str] = None
+    method: Optional[str] = None
+    score: Optional[float] = None
+    detected_at: Optional[datetime] = None
+    resolved: bool = False
+    resolved_at: Optional[datetime] = None
+    resolution: Optional[str] = None
+
+
+class AlertListResponse(BaseModel):
+    """Página de alertas (paginación por cursor)"""
+    alerts_count: int
+    next_cursor: Optional[str] = None
+    alerts: List[AlertResponse]
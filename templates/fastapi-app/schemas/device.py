@@ -1,6 +1,6 @@
 """Schemas de Dispositivo"""
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 
 
@@ -26,6 +26,28 @@ class DeviceResponse(DeviceBase):
         from_attributes = True
 
 
+class DeviceLastSeen(BaseModel):
+    """Dispositivo y su última actividad"""
+    device_id: int
+    last_seen: datetime
+
+
+class DeviceStatusGroup(BaseModel):
+    """Conteo y página de dispositivos en un estado"""
+    count: int
+    devices: List[DeviceLastSeen]
+
+
+class DeviceStatusResponse(BaseModel):
+    """Estado de actividad de la flota (o de un servicio)"""
+    online_threshold_s: float
+    offline_threshold_s: float
+    online: DeviceStatusGroup
+    stale: DeviceStatusGroup
+    offline: DeviceStatusGroup
+    never_seen: int
+
+
 class DeviceUpdate(BaseModel):
     """Schema para actualizar dispositivos"""
     nombre: Optional[str] = None
@@ -1,6 +1,6 @@
 """Schemas de Datos de Sensores para MongoDB"""
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Dict, Optional, List
 from datetime import datetime
 
 
@@ -55,3 +55,105 @@ class SensorReadingsHistoryResponse(BaseModel):
     device_id: int
     readings_count: int
     readings: List[SensorReadingItem]
+
+
+class SensorReadingBucket(BaseModel):
+    """Estadísticas de una ventana de tiempo"""
+    start: datetime
+    count: int
+    min: float
+    max: float
+    mean: float
+    stddev: float
+    p50: float
+    p95: float
+
+
+class SensorReadingsAggregateResponse(BaseModel):
+    """Respuesta de agregación por ventanas"""
+    device_id: int
+    sensor_type: str
+    bucket: str
+    start_date: datetime
+    end_date: datetime
+    buckets_count: int
+    buckets: List[SensorReadingBucket]
+
+
+class DeviceReadings(BaseModel):
+    """Lecturas de un dispositivo dentro de una consulta de flota"""
+    device_id: int
+    readings_count: int
+    readings: List[SensorReadingItem]
+
+
+class FleetReadingsResponse(BaseModel):
+    """Respuesta para historial de varios dispositivos"""
+    devices_count: int
+    readings_count: int
+    devices: List[DeviceReadings]
+
+
+class LatestReading(BaseModel):
+    """Última lectura de un tipo de sensor"""
+    value: float
+    unit: str
+    location: Optional[str]
+    timestamp: datetime
+
+
+class DeviceLatestReadings(BaseModel):
+    """Últimos valores de un dispositivo por tipo de sensor"""
+    device_id: int
+    sensors: Dict[str, LatestReading]
+
+
+class FleetLatestResponse(BaseModel):
+    """Últimos valores de los dispositivos de una consulta de flota"""
+    devices_count: int
+    devices: List[DeviceLatestReadings]
+
+
+class DeviceReadingBuckets(BaseModel):
+    """Ventanas de un dispositivo dentro de una agregación de flota"""
+    device_id: int
+    buckets_count: int
+    buckets: List[SensorReadingBucket]
+
+
+class FleetAggregateResponse(BaseModel):
+    """Respuesta de agregación por ventanas de varios dispositivos"""
+    sensor_type: str
+    bucket: str
+    start_date: datetime
+    end_date: datetime
+    devices_count: int
+    devices: List[DeviceReadingBuckets]
+
+
+class AnomalyItem(BaseModel):
+    """Punto o corrida anómala (zscore, ewma o stuck)"""
+    method: str
+    timestamp: datetime
+    value: float
+    score: Optional[float] = None
+    end: Optional[datetime] = None
+    run_length: Optional[int] = None
+
+
+class DeviceAnomalies(BaseModel):
+    """Anomalías de un dispositivo"""
+    device_id: int
+    points_analyzed: int
+    anomalies_count: int
+    anomalies: List[AnomalyItem]
+
+
+class FleetAnomaliesResponse(BaseModel):
+    """Respuesta de detección de anomalías de varios dispositivos"""
+    sensor_type: str
+    start_date: datetime
+    end_date: datetime
+    devices_count: int
+    anomalies_count: int
+    devices: List[DeviceAnomalies]
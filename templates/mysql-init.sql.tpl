@@ -134,6 +134,8 @@ CREATE TABLE `usuario` (
   UNIQUE KEY `email` (`email`),
   KEY `rol_id` (`rol_id`),
   KEY `pasusuario_id` (`pasusuario_id`),
+  KEY `ix_usuario_nombre` (`nombre`),
+  KEY `ix_usuario_is_active` (`is_active`),
   CONSTRAINT `users_ibfk_1` FOREIGN KEY (`rol_id`) REFERENCES `rol` (`id`),
   CONSTRAINT `users_ibfk_2` FOREIGN KEY (`pasusuario_id`) REFERENCES `pasusuario` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -151,6 +153,9 @@ CREATE TABLE `dispositivo` (
   PRIMARY KEY (`id`),
   KEY `admin_id` (`admin_id`),
   KEY `pasdispositivo_id` (`pasdispositivo_id`),
+  KEY `ix_dispositivo_nombre` (`nombre`),
+  KEY `ix_dispositivo_is_active` (`is_active`),
+  KEY `ix_dispositivo_device_type_is_active` (`device_type`,`is_active`),
   CONSTRAINT `dispositivos_ibfk_1` FOREIGN KEY (`admin_id`) REFERENCES `admin` (`id`),
   CONSTRAINT `dispositivos_ibfk_2` FOREIGN KEY (`pasdispositivo_id`) REFERENCES `pasdispositivo` (`id`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
@@ -271,7 +276,9 @@ INSERT INTO `permiso` (`id`, `name`, `description`) VALUES
 (13, 'grant_permissions', 'Otorgar permisos a otros roles'),
 (14, 'create_device', 'Crear dispositivos IoT'),
 (15, 'edit_device', 'Editar dispositivos'),
-(16, 'delete_device', 'Eliminar dispositivos');
+(16, 'delete_device', 'Eliminar dispositivos'),
+(17, 'view_diagnostics', 'Acceder a herramientas de diagnóstico y perfilado'),
+(18, 'manage_alerts', 'Gestionar reglas de alertas');
 
 -- =============================================================================
 -- DATOS: Asignaciones Rol-Permiso
@@ -280,15 +287,16 @@ INSERT INTO `permiso` (`id`, `name`, `description`) VALUES
 -- admin_master: TODOS los permisos
 INSERT INTO `rol_permiso` (`role_id`, `permiso_id`) VALUES
 (1, 1), (1, 2), (1, 3), (1, 4), (1, 5), (1, 6), (1, 7), (1, 8),
-(1, 9), (1, 10), (1, 11), (1, 12), (1, 13), (1, 14), (1, 15), (1, 16);
+(1, 9), (1, 10), (1, 11), (1, 12), (1, 13), (1, 14), (1, 15), (1, 16),
+(1, 17), (1, 18);
 
 -- admin_normal: operaciones básicas
 INSERT INTO `rol_permiso` (`role_id`, `permiso_id`) VALUES
-(2, 4), (2, 5), (2, 6), (2, 7);
+(2, 4), (2, 5), (2, 6), (2, 7), (2, 18);
 
 -- manager: operacional + crear usuarios
 INSERT INTO `rol_permiso` (`role_id`, `permiso_id`) VALUES
-(4, 1), (4, 4), (4, 5), (4, 6), (4, 7);
+(4, 1), (4, 4), (4, 5), (4, 6), (4, 7), (4, 18);
 
 -- user: solo visualización
 INSERT INTO `rol_permiso` (`role_id`, `permiso_id`) VALUES
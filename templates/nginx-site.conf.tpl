@@ -6,6 +6,23 @@
 limit_req_zone $binary_remote_addr zone=api_limit:10m rate=10r/s;
 limit_req_zone $binary_remote_addr zone=auth_limit:10m rate=5r/m;
 
+# Formato combined + tiempo de respuesta y X-Request-ID (correlación con logs de FastAPI).
+# El request ID va al final entre comillas: los filtros de fail2ban siguen aplicando.
+log_format iot_api '$remote_addr - $remote_user [$time_local] "$request" '
+                   '$status $body_bytes_sent "$http_referer" "$http_user_agent" '
+                   'rt=$request_time urt=$upstream_response_time "$request_id"';
+
+# Igual que iot_api pero sin query string (tickets de WebSocket en /api/v1/live/)
+log_format iot_api_noargs '$remote_addr - $remote_user [$time_local] "$request_method $uri $server_protocol" '
+                          '$status $body_bytes_sent "$http_referer" "$http_user_agent" '
+                          'rt=$request_time urt=$upstream_response_time "$request_id"';
+
+# Connection para WebSocket: "upgrade" si el cliente lo pide, vacío (keepalive) si no
+map $http_upgrade $connection_upgrade {
+    default upgrade;
+    ''      '';
+}
+
 upstream fastapi_backend {
     server fastapi:5000 fail_timeout=30s max_fails=3;
     keepalive 32;
@@ -24,7 +41,7 @@ server {
     send_timeout 10;
     
     # Logs
-    access_log /var/log/nginx/iot-api-access.log combined;
+    access_log /var/log/nginx/iot-api-access.log iot_api;
     error_log /var/log/nginx/iot-api-error.log warn;
     
     # Encabezados de Seguridad
@@ -63,8 +80,10 @@ server {
         proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
         proxy_set_header X-Forwarded-Proto $scheme;
         
+        proxy_set_header X-Request-ID $request_id;
+        
         proxy_pass http://fastapi_backend;
-        access_log /var/log/nginx/iot-api-health.log;
+        access_log /var/log/nginx/iot-api-health.log iot_api;
     }
     
     # Endpoints de autenticación (limitación de tasa más estricta)
@@ -75,6 +94,7 @@ server {
         proxy_set_header X-Real-IP $remote_addr;
         proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
         proxy_set_header X-Forwarded-Proto $scheme;
+        proxy_set_header X-Request-ID $request_id;
         
         proxy_pass http://fastapi_backend;
         proxy_http_version 1.1;
@@ -96,6 +116,29 @@ server {
         proxy_set_header Connection "";
     }
     
+    # Telemetría en vivo (SSE y WebSocket): sin buffering y conexiones largas
+    location /api/v1/live/ {
+        limit_req zone=api_limit burst=10 nodelay;
+        access_log /var/log/nginx/iot-api-access.log iot_api_noargs;
+        
+        proxy_set_header Host $host;
+        proxy_set_header X-Real-IP $remote_addr;
+        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto $scheme;
+        proxy_set_header X-Request-ID $request_id;
+        
+        proxy_pass http://fastapi_backend;
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade $http_upgrade;
+        proxy_set_header Connection $connection_upgrade;
+        
+        proxy_buffering off;
+        proxy_cache off;
+        proxy_read_timeout 1h;
+        proxy_send_timeout 1h;
+        send_timeout 1h;
+    }
+    
     # Web Flasher - Herramienta de provisionamiento ESP32
     location /flasher/ {
         alias /usr/share/nginx/web-flasher/;
@@ -117,6 +160,17 @@ server {
         return 404;
     }
     
+    # Métricas de FastAPI (solo red interna de Docker)
+    location = /metrics {
+        allow 172.20.0.0/16;
+        deny all;
+        access_log off;
+        
+        proxy_set_header Host $host;
+        proxy_set_header X-Request-ID $request_id;
+        proxy_pass http://fastapi_backend;
+    }
+    
     # Estado de Nginx (solo interno)
     location /nginx_status {
         stub_status on;